@@ -4,7 +4,7 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_mail import Mail
 from dotenv import load_dotenv
-from mongoengine import connect
+from app.utils.db import connect_mongoengine
 
 # Load environment variables
 load_dotenv()
@@ -13,49 +13,98 @@ load_dotenv()
 jwt = JWTManager()
 mail = Mail()
 
-def create_app():
-    """Initialize the Flask application."""
+def configure(config):
+    """Populate a Flask (or Quart) config object from the environment."""
+    config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "default-jwt-secret-key")
+    config["SECRET_KEY"] = os.getenv("SECRET_KEY", "default-flask-secret-key")
+    # Short-lived; clients renew it with a refresh token (see app/models/refresh_token.py)
+    config["JWT_ACCESS_TOKEN_EXPIRES"] = int(os.getenv("JWT_ACCESS_TOKEN_MINUTES", 15)) * 60
+    config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE", "False").lower() == "true"
+    config['MONGODB_SETTINGS'] = {
+        'db': 'mango_disease_db',
+        'host': 'localhost',
+        'port': 27017
+    }
+    
+    # Configure email
+    config["MAIL_SERVER"] = os.getenv("MAIL_SERVER")
+    config["MAIL_PORT"] = int(os.getenv("MAIL_PORT", 587))
+    config["MAIL_USE_TLS"] = os.getenv("MAIL_USE_TLS", "True").lower() == "true"
+    config["MAIL_USERNAME"] = os.getenv("MAIL_USERNAME")
+    config["MAIL_PASSWORD"] = os.getenv("MAIL_PASSWORD")
+    config["MAIL_DEFAULT_SENDER"] = os.getenv("MAIL_DEFAULT_SENDER")
+    config["MAIL_TIMEOUT"] = float(os.getenv("MAIL_TIMEOUT", 10))
+    # The deliverability check is a DNS lookup; disable it for offline load tests
+    config["EMAIL_CHECK_DELIVERABILITY"] = os.getenv("EMAIL_CHECK_DELIVERABILITY", "True").lower() == "true"
+
+def create_app(with_api=True):
+    """Initialize the Flask application.
+    
+    With ``with_api=False`` only the status and admin routes are registered,
+    for processes that serve inference alone (see app/services/inference.py).
+    """
     app = Flask(__name__)
     
     # Configure CORS
     CORS(app, resources={r"/*": {"origins": "*"}})
     
     # Configure app
-    app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "default-jwt-secret-key")
-    app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "default-flask-secret-key")
-    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = 86400  # 24 hours
-    app.config['MONGODB_SETTINGS'] = {
-        'db': 'mango_disease_db',
-        'host': 'localhost',
-        'port': 27017
-    }
+    configure(app.config)
     
-    # Configure email
-    app.config["MAIL_SERVER"] = os.getenv("MAIL_SERVER")
-    app.config["MAIL_PORT"] = int(os.getenv("MAIL_PORT", 587))
-    app.config["MAIL_USE_TLS"] = os.getenv("MAIL_USE_TLS", "True").lower() == "true"
-    app.config["MAIL_USERNAME"] = os.getenv("MAIL_USERNAME")
-    app.config["MAIL_PASSWORD"] = os.getenv("MAIL_PASSWORD")
-    app.config["MAIL_DEFAULT_SENDER"] = os.getenv("MAIL_DEFAULT_SENDER")
+    # Refuse bodies larger than one image upload before they are parsed;
+    # /sync and prediction jobs raise the limit with @body_limit
+    from app.services.image_service import ImageService
+    from app.utils.body_limit import BodyLimitRequest
+    app.request_class = BodyLimitRequest
+    app.config['MAX_CONTENT_LENGTH'] = ImageService.max_request_bytes()
+    
+    # Serialize ObjectId and datetime values in every JSON response
+    from app.utils.api_utils import MongoJSONProvider
+    app.json_provider_class = MongoJSONProvider
+    app.json = MongoJSONProvider(app)
+    
+    # gzip/brotli responses and gzip request bodies for sync and predict uploads
+    from app.utils.compression import init_compression
+    init_compression(app)
+    
+    # Opt-in sampled request capture for replay; wraps the gzip middleware so bodies stay as sent
+    from app.utils.traffic_capture import init_traffic_capture
+    init_traffic_capture(app)
+    
+    # 503 instead of hanging while MongoDB is unhealthy (see app/utils/resilience.py)
+    from app.utils.resilience import init_resilience
+    init_resilience(app)
+    
+    # Request counts for the memory growth rate at /api/admin/memory
+    from app.services.memory_monitor import init_memory_monitor
+    init_memory_monitor(app)
     
     # Initialize extensions
     jwt.init_app(app)
     mail.init_app(app)
     
-    # Connect to MongoDB using mongoengine
-    connect('mango_disease_db', host='localhost', port=27017)
+    # Connect to MongoDB using mongoengine (connections are opened lazily)
+    connect_mongoengine()
     
-    # Import routes after app is created
-    from app.routes.auth_routes import auth
-    from app.routes.user_routes import users
-    from app.routes.disease_reports import disease_reports
+    from app.routes.status_routes import status
+    from app.routes.admin_routes import admin
+    app.register_blueprint(status, url_prefix='/api')
+    app.register_blueprint(admin, url_prefix='/api/admin')
     
-    # Register blueprints
-    app.register_blueprint(auth, url_prefix='/api/auth')
-    app.register_blueprint(users, url_prefix='/api/users')
-    app.register_blueprint(disease_reports, url_prefix='/api/disease-reports')
+    if with_api:
+        # Import routes after app is created
+        from app.routes.auth_routes import auth
+        from app.routes.user_routes import users
+        from app.routes.disease_reports import disease_reports
+        from app.routes.image_routes import images
+        
+        # Register blueprints
+        app.register_blueprint(auth, url_prefix='/api/auth')
+        app.register_blueprint(users, url_prefix='/api/users')
+        app.register_blueprint(disease_reports, url_prefix='/api/disease-reports')
+        app.register_blueprint(images, url_prefix='/api/images')
     
-    # Note: The prediction endpoint is registered directly in app.py
-    # This creates the Flask app that will host both the API endpoints and the ML model prediction route
+    # Note: The prediction endpoint is added separately by init_inference()
+    # in app/services/inference.py, so API-only processes never import TensorFlow
     
-    return app 
\ No newline at end of file
+    return app
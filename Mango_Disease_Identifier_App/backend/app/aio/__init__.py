@@ -0,0 +1,53 @@
+"""Asyncio (ASGI) deployment mode for the non-inference APIs.
+
+Serves the same auth, users and disease-reports endpoints as the Flask app,
+but on Quart with the motor driver, so one process can keep thousands of
+requests in flight while they wait on MongoDB or SMTP. bcrypt and image
+storage run in a thread pool. Inference stays on the Flask/gunicorn app.
+"""
+from quart import Quart
+from app import configure
+
+
+def create_async_app():
+    """Initialize the Quart application."""
+    app = Quart(__name__)
+    configure(app.config)
+
+    @app.after_request
+    async def add_cors_headers(response):
+        response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["Access-Control-Allow-Headers"] = "Authorization, Content-Type"
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+        return response
+
+    @app.before_request
+    async def check_dependencies():
+        from quart import request
+        from app.utils.resilience import BLUEPRINT_DEPENDENCIES, CircuitOpenError, get_breaker, unavailable_response
+        for dependency in BLUEPRINT_DEPENDENCIES.get(request.blueprint, ()):
+            breaker = get_breaker(dependency)
+            if not breaker.allow():
+                return unavailable_response(CircuitOpenError(dependency, breaker.retry_after()))
+
+    @app.before_serving
+    async def open_connections():
+        from app.aio.db import init_async_db
+        init_async_db()
+
+    @app.after_serving
+    async def close_connections():
+        from app.aio.db import close_async_db
+        from app.aio.executors import shutdown_executor
+        close_async_db()
+        shutdown_executor()
+
+    from app.aio.routes.auth_routes import auth
+    from app.aio.routes.user_routes import users
+    from app.aio.routes.disease_reports import disease_reports
+
+    app.register_blueprint(auth, url_prefix='/api/auth')
+    app.register_blueprint(users, url_prefix='/api/users')
+    app.register_blueprint(disease_reports, url_prefix='/api/disease-reports')
+
+    return app
@@ -0,0 +1,28 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.utils.db import get_mongo_uri, mongo_client_options, REPORTS_DB_NAME, REPORTS_DB_HOST, REPORTS_DB_PORT
+
+# Motor clients bind to the running event loop, so they are created in
+# before_serving rather than at import time
+motor_client = None
+reports_client = None
+
+def init_async_db():
+    """Open the non-blocking MongoDB clients for the current event loop."""
+    global motor_client, reports_client
+    motor_client = AsyncIOMotorClient(get_mongo_uri(), **mongo_client_options())
+    reports_client = AsyncIOMotorClient(REPORTS_DB_HOST, REPORTS_DB_PORT, **mongo_client_options())
+
+def close_async_db():
+    global motor_client, reports_client
+    for client in (motor_client, reports_client):
+        if client is not None:
+            client.close()
+    motor_client = None
+    reports_client = None
+
+def get_async_db():
+    """Database holding the users and otps collections."""
+    return motor_client.get_default_database()
+
+def get_reports_collection():
+    return reports_client[REPORTS_DB_NAME].disease_reports
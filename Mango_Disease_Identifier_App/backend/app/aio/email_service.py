@@ -0,0 +1,52 @@
+from email.message import EmailMessage
+import functools
+import os
+import aiosmtplib
+from quart import current_app
+from app.services.email_service import EmailService
+from app.utils.resilience import call_async
+
+def is_transient_smtp_error(error):
+    """Connection problems, timeouts and 4xx replies; a later attempt may succeed."""
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return 400 <= error.code < 500
+    return isinstance(error, (aiosmtplib.SMTPConnectError, aiosmtplib.SMTPTimeoutError,
+                              aiosmtplib.SMTPServerDisconnected, OSError))
+
+class AsyncEmailService:
+    """Non-blocking counterpart of EmailService using aiosmtplib."""
+
+    @staticmethod
+    async def send_email(to, subject, template):
+        """Send an email without blocking the event loop, through the "smtp" circuit breaker."""
+        config = current_app.config
+        msg = EmailMessage()
+        msg["Subject"] = subject
+        msg["From"] = config["MAIL_DEFAULT_SENDER"]
+        msg["To"] = to
+        msg.set_content(template, subtype="html")
+
+        send = functools.partial(
+            aiosmtplib.send,
+            msg,
+            hostname=config["MAIL_SERVER"],
+            port=config["MAIL_PORT"],
+            start_tls=config["MAIL_USE_TLS"],
+            username=config["MAIL_USERNAME"],
+            password=config["MAIL_PASSWORD"],
+            timeout=config["MAIL_TIMEOUT"],
+        )
+        # Same retry budget and breaker as EmailService.send_email
+        await call_async(
+            "smtp", send,
+            retries=int(os.getenv("SMTP_RETRIES", 2)),
+            retry_on=is_transient_smtp_error,
+            timeout=float(os.getenv("SMTP_DEADLINE_SECONDS", 20)),
+            base_delay=0.5,
+        )
+
+    @staticmethod
+    async def send_otp_email(to, otp_code):
+        """Send an OTP verification email."""
+        subject, template = EmailService.build_otp_email(otp_code)
+        await AsyncEmailService.send_email(to, subject, template)
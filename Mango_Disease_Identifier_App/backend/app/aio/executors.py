@@ -0,0 +1,19 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# bcrypt releases the GIL while hashing, so a thread pool is enough to keep
+# password checks off the event loop without blocking other requests
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("ASYNC_EXECUTOR_THREADS", os.cpu_count() or 4)),
+    thread_name_prefix="aio-blocking",
+)
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a CPU-bound or blocking call in the executor and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+def shutdown_executor():
+    _executor.shutdown(wait=False)
@@ -0,0 +1,146 @@
+import datetime
+from bson import ObjectId
+from app.models.user import User
+from app.models.otp import OTP
+from app.models.refresh_token import RefreshToken
+from app.aio.db import get_async_db
+from app.aio.executors import run_blocking
+
+class AsyncUser:
+    """Motor-backed counterpart of app.models.user.User."""
+
+    @staticmethod
+    def get_collection():
+        return get_async_db().users
+
+    @staticmethod
+    async def create_user(email, password, name=None):
+        """Create a new user, hashing the password off the event loop."""
+        hashed_password = await run_blocking(User.hash_password, password)
+        user = User.new_user_document(email, hashed_password, name)
+        result = await AsyncUser.get_collection().insert_one(user)
+        user["_id"] = result.inserted_id
+        return user
+
+    @staticmethod
+    async def get_user_by_email(email):
+        return await AsyncUser.get_collection().find_one({"email": email})
+
+    @staticmethod
+    async def get_user_by_id(user_id):
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        return await AsyncUser.get_collection().find_one({"_id": user_id})
+
+    @staticmethod
+    async def _set(user_id, fields):
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        fields["updated_at"] = datetime.datetime.utcnow()
+        await AsyncUser.get_collection().update_one({"_id": user_id}, {"$set": fields})
+
+    @staticmethod
+    async def activate_user(user_id):
+        await AsyncUser._set(user_id, {"is_active": True})
+
+    @staticmethod
+    async def update_last_login(user_id):
+        await AsyncUser._set(user_id, {"last_login": datetime.datetime.utcnow()})
+
+    @staticmethod
+    async def update_profile(user_id, name=None, email=None):
+        update_data = {}
+        if name:
+            update_data["name"] = name
+        if email:
+            update_data["email"] = email
+        await AsyncUser._set(user_id, update_data)
+
+    @staticmethod
+    async def check_password(user, password):
+        return await run_blocking(User.check_password, user, password)
+
+    @staticmethod
+    async def change_password(user_id, new_password):
+        hashed_password = await run_blocking(User.hash_password, new_password)
+        await AsyncUser._set(user_id, {"password": hashed_password})
+
+class AsyncOTP:
+    """Motor-backed counterpart of app.models.otp.OTP."""
+
+    @staticmethod
+    def get_collection():
+        return get_async_db().otps
+
+    @staticmethod
+    async def create_otp(email, purpose="verification"):
+        await AsyncOTP.get_collection().delete_many({"email": email, "purpose": purpose})
+        otp_data = OTP.new_otp_document(email, purpose)
+        await AsyncOTP.get_collection().insert_one(otp_data)
+        return otp_data["code"]
+
+    @staticmethod
+    async def verify_otp(email, otp_code, purpose="verification"):
+        # Find and consume the OTP in one round trip
+        otp_data = await AsyncOTP.get_collection().find_one_and_update(
+            OTP.active_otp_query(email, otp_code, purpose),
+            {"$set": {"is_used": True}},
+        )
+        return otp_data is not None
+
+class AsyncRefreshToken:
+    """Motor-backed counterpart of app.models.refresh_token.RefreshToken."""
+
+    @staticmethod
+    def get_collection():
+        return get_async_db().refresh_tokens
+
+    @staticmethod
+    async def issue(user_id, family_id=None):
+        raw_token, token_data = RefreshToken.new_token_document(user_id, family_id)
+        await AsyncRefreshToken.get_collection().insert_one(token_data)
+        return raw_token
+
+    @staticmethod
+    async def rotate(raw_token):
+        token_data = await AsyncRefreshToken.get_collection().find_one_and_update(
+            RefreshToken.claim_query(raw_token),
+            RefreshToken.revoke_update("rotated"),
+        )
+        if not token_data:
+            return await AsyncRefreshToken._retry_or_revoke(raw_token)
+        user_id = str(token_data["user_id"])
+        return user_id, await AsyncRefreshToken.issue(user_id, token_data["family_id"])
+
+    @staticmethod
+    async def _retry_or_revoke(raw_token):
+        """See RefreshToken._retry_or_revoke."""
+        collection = AsyncRefreshToken.get_collection()
+        token_data = await collection.find_one({"token_hash": RefreshToken.hash_token(raw_token)})
+        if RefreshToken.is_retry(token_data):
+            if await collection.find_one(RefreshToken.live_family_query(token_data), {"_id": 1}) is None:
+                return None
+            user_id = str(token_data["user_id"])
+            return user_id, await AsyncRefreshToken.issue(user_id, token_data["family_id"])
+        if RefreshToken.is_reuse(token_data):
+            await collection.update_many(
+                RefreshToken.live_family_query(token_data),
+                RefreshToken.revoke_update("reuse"),
+            )
+        return None
+
+    @staticmethod
+    async def revoke(raw_token, reason="logout"):
+        await AsyncRefreshToken.get_collection().update_one(
+            {"token_hash": RefreshToken.hash_token(raw_token), "revoked_at": None},
+            RefreshToken.revoke_update(reason),
+        )
+
+    @staticmethod
+    async def revoke_all_for_user(user_id, reason="password_changed"):
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        await AsyncRefreshToken.get_collection().update_many(
+            {"user_id": user_id, "revoked_at": None},
+            RefreshToken.revoke_update(reason),
+        )
@@ -0,0 +1,248 @@
+from pymongo.errors import DuplicateKeyError
+from quart import Blueprint, request, jsonify, current_app
+from email_validator import validate_email, EmailNotValidError
+from app.aio.jwt_auth import create_access_token, jwt_required, get_jwt_identity
+from app.aio.models import AsyncUser, AsyncOTP, AsyncRefreshToken
+from app.aio.email_service import AsyncEmailService
+from app.aio.executors import run_blocking
+
+auth = Blueprint("auth", __name__)
+
+async def _send_otp(email, purpose="verification"):
+    otp_code = await AsyncOTP.create_otp(email, purpose=purpose)
+    await AsyncEmailService.send_otp_email(email, otp_code)
+
+async def session_tokens(user_id):
+    """A new access token and refresh token for a fresh sign-in."""
+    return {
+        "token": create_access_token(user_id),
+        "refresh_token": await AsyncRefreshToken.issue(user_id),
+        "expires_in": current_app.config["JWT_ACCESS_TOKEN_EXPIRES"]
+    }
+
+def _user_payload(user):
+    return {
+        "id": str(user["_id"]),
+        "email": user["email"],
+        "name": user["name"]
+    }
+
+@auth.route("/signup", methods=["POST"])
+async def signup():
+    """Register a new user."""
+    data = await request.get_json()
+    
+    if not data or not data.get("email") or not data.get("password"):
+        return jsonify({"success": False, "message": "Email and password are required"}), 400
+    
+    email = data.get("email")
+    
+    try:
+        # Deliverability checks do a DNS lookup, so run them off the event loop
+        email = (await run_blocking(
+            validate_email, email, check_deliverability=current_app.config["EMAIL_CHECK_DELIVERABILITY"]
+        )).email
+    except EmailNotValidError:
+        return jsonify({"success": False, "message": "Invalid email address"}), 400
+    
+    if await AsyncUser.get_user_by_email(email):
+        return jsonify({"success": False, "message": "Email already registered"}), 409
+    
+    try:
+        user = await AsyncUser.create_user(email, data.get("password"), data.get("name"))
+    except DuplicateKeyError:
+        return jsonify({"success": False, "message": "Email already registered"}), 409
+    
+    try:
+        await _send_otp(email)
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Failed to send verification email: {str(e)}"}), 500
+    
+    return jsonify({
+        "success": True,
+        "message": "Registration successful. Verification code sent to your email.",
+        "user_id": str(user["_id"])
+    }), 201
+
+@auth.route("/verify-otp", methods=["POST"])
+async def verify_otp():
+    """Verify OTP for email verification."""
+    data = await request.get_json()
+    
+    if not data or not data.get("email") or not data.get("otp"):
+        return jsonify({"success": False, "message": "Email and OTP are required"}), 400
+    
+    email = data.get("email")
+    
+    user = await AsyncUser.get_user_by_email(email)
+    if not user:
+        return jsonify({"success": False, "message": "User not found"}), 404
+    
+    if not await AsyncOTP.verify_otp(email, data.get("otp")):
+        return jsonify({"success": False, "message": "Invalid or expired OTP"}), 400
+    
+    await AsyncUser.activate_user(user["_id"])
+    
+    return jsonify({
+        "success": True,
+        "message": "Email verified successfully",
+        **await session_tokens(str(user["_id"])),
+        "user": _user_payload(user)
+    }), 200
+
+@auth.route("/login", methods=["POST"])
+async def login():
+    """Login a user."""
+    data = await request.get_json()
+    
+    if not data or not data.get("email") or not data.get("password"):
+        return jsonify({"success": False, "message": "Email and password are required"}), 400
+    
+    email = data.get("email")
+    
+    user = await AsyncUser.get_user_by_email(email)
+    if not user or not await AsyncUser.check_password(user, data.get("password")):
+        return jsonify({"success": False, "message": "Invalid email or password"}), 401
+    
+    if not user.get("is_active", False):
+        try:
+            await _send_otp(email)
+        except Exception as e:
+            return jsonify({"success": False, "message": f"Failed to send verification email: {str(e)}"}), 500
+        
+        return jsonify({
+            "success": False,
+            "message": "Account not verified. New verification code sent to your email.",
+            "requires_verification": True
+        }), 403
+    
+    await AsyncUser.update_last_login(user["_id"])
+    
+    return jsonify({
+        "success": True,
+        "message": "Login successful",
+        **await session_tokens(str(user["_id"])),
+        "user": _user_payload(user)
+    }), 200
+
+@auth.route("/resend-otp", methods=["POST"])
+async def resend_otp():
+    """Resend OTP for email verification."""
+    data = await request.get_json()
+    
+    if not data or not data.get("email"):
+        return jsonify({"success": False, "message": "Email is required"}), 400
+    
+    email = data.get("email")
+    
+    if not await AsyncUser.get_user_by_email(email):
+        return jsonify({"success": False, "message": "User not found"}), 404
+    
+    try:
+        await _send_otp(email)
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Failed to send verification email: {str(e)}"}), 500
+    
+    return jsonify({
+        "success": True,
+        "message": "Verification code sent to your email"
+    }), 200
+
+@auth.route("/forgot-password", methods=["POST"])
+async def forgot_password():
+    """Send password reset OTP."""
+    data = await request.get_json()
+    
+    if not data or not data.get("email"):
+        return jsonify({"success": False, "message": "Email is required"}), 400
+    
+    email = data.get("email")
+    
+    # For security reasons, don't reveal if email exists or not
+    if await AsyncUser.get_user_by_email(email):
+        try:
+            await _send_otp(email, purpose="password_reset")
+        except Exception as e:
+            return jsonify({"success": False, "message": f"Failed to send reset email: {str(e)}"}), 500
+    
+    return jsonify({
+        "success": True,
+        "message": "If your email is registered, you will receive a password reset code"
+    }), 200
+
+@auth.route("/reset-password", methods=["POST"])
+async def reset_password():
+    """Reset password with OTP."""
+    data = await request.get_json()
+    
+    if not data or not data.get("email") or not data.get("otp") or not data.get("new_password"):
+        return jsonify({"success": False, "message": "Email, OTP, and new password are required"}), 400
+    
+    email = data.get("email")
+    
+    user = await AsyncUser.get_user_by_email(email)
+    if not user:
+        return jsonify({"success": False, "message": "User not found"}), 404
+    
+    if not await AsyncOTP.verify_otp(email, data.get("otp"), purpose="password_reset"):
+        return jsonify({"success": False, "message": "Invalid or expired OTP"}), 400
+    
+    await AsyncUser.change_password(user["_id"], data.get("new_password"))
+    await AsyncRefreshToken.revoke_all_for_user(user["_id"])
+    
+    return jsonify({
+        "success": True,
+        "message": "Password reset successful"
+    }), 200
+
+@auth.route("/refresh", methods=["POST"])
+async def refresh():
+    """Exchange a refresh token for a new access token and refresh token."""
+    data = await request.get_json(silent=True)
+    
+    if not data or not data.get("refresh_token"):
+        return jsonify({"success": False, "message": "Refresh token is required"}), 400
+    
+    rotated = await AsyncRefreshToken.rotate(data.get("refresh_token"))
+    if not rotated:
+        return jsonify({"success": False, "message": "Invalid or expired refresh token"}), 401
+    
+    user_id, refresh_token = rotated
+    return jsonify({
+        "success": True,
+        "token": create_access_token(user_id),
+        "refresh_token": refresh_token,
+        "expires_in": current_app.config["JWT_ACCESS_TOKEN_EXPIRES"]
+    }), 200
+
+@auth.route("/logout", methods=["POST"])
+async def logout():
+    """Revoke a refresh token; the access token expires on its own."""
+    data = await request.get_json(silent=True)
+    
+    if not data or not data.get("refresh_token"):
+        return jsonify({"success": False, "message": "Refresh token is required"}), 400
+    
+    await AsyncRefreshToken.revoke(data.get("refresh_token"))
+    
+    return jsonify({
+        "success": True,
+        "message": "Logged out"
+    }), 200
+
+@auth.route("/me", methods=["GET"])
+@jwt_required
+async def get_current_user():
+    """Get current user profile."""
+    user = await AsyncUser.get_user_by_id(get_jwt_identity())
+    if not user:
+        return jsonify({"success": False, "message": "User not found"}), 404
+    
+    return jsonify({
+        "success": True,
+        "user": {
+            **_user_payload(user),
+            "is_active": user.get("is_active", False),
+            "created_at": user.get("created_at")
+        }
+    }), 200
@@ -0,0 +1,354 @@
+import json
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from quart import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from app.aio.db import get_reports_collection
+from app.aio.executors import run_blocking
+from app.aio.jwt_auth import jwt_required, get_jwt_identity
+from app.models.disease_report import DiseaseReport, DISEASE_DISTRIBUTION_PIPELINE, LOCATION_DISTRIBUTION_PIPELINE
+from app.services.blob_store import blob_store
+from app.services.duplicate_detector import duplicate_detector
+from app.services.image_service import ImageService, ImageValidationError
+from app.services.perceptual_hash import phash, to_signed
+from app.services.report_export import ReportExportService, ExportUnavailable
+from app.services.report_query import ReportQueryService, InvalidQuery
+from app.services.report_sync import ReportSyncService, InvalidSyncToken
+from app.services.sync_stream import SyncPayloadError, SyncStreamService, chunk_size, parser_for
+
+disease_reports = Blueprint('disease_reports', __name__)
+
+async def _get_payload(form_field):
+    """Read the report payload from a JSON body or a multipart form field."""
+    if request.mimetype == 'multipart/form-data':
+        form = await request.form
+        return json.loads(form.get(form_field, 'null'))
+    return await request.get_json()
+
+def _store_image(file):
+    data = ImageService.read_upload(file)
+    _, img = ImageService.validate_image(data)
+    img.draft('L', (64, 64))
+    return blob_store.put(data), phash(img)
+
+async def _uploaded_image(field_name):
+    if request.mimetype != 'multipart/form-data' or not field_name:
+        return None, None
+    file = (await request.files).get(field_name)
+    if not file:
+        return None, None
+    # Hashing, header parsing and the disk write all block, so keep them off the loop
+    return await run_blocking(_store_image, file)
+
+async def _insert_report(report):
+    """Validate a report with its mongoengine schema and insert it through motor."""
+    report.updated_at = datetime.utcnow()
+    report.validate()
+    result = await get_reports_collection().insert_one(report.to_mongo().to_dict())
+    report.id = result.inserted_id
+    return report
+
+def _from_doc(doc):
+    return DiseaseReport._from_son(doc)
+
+async def _find_duplicate(user, location, image_phash):
+    """Async counterpart of DuplicateReportDetector.find_duplicate using motor."""
+    if not duplicate_detector.enabled:
+        return None
+    collection = get_reports_collection()
+    query, projection = duplicate_detector.rows_query(user)
+    duplicate_detector.ingest(user, await collection.find(query, projection).to_list(None))
+    ids = duplicate_detector.candidates(user, location, image_phash)
+    if not ids:
+        return None
+    live = {doc['_id'] async for doc in collection.find({'_id': {'$in': ids}, 'deleted': {'$ne': True}}, {'_id': 1})}
+    return next((report_id for report_id in ids if report_id in live), None)
+
+async def _save_report(report, user, image_phash):
+    """Insert a report unless it is a near-duplicate under the merge policy; returns (report, merged)."""
+    if image_phash is not None:
+        report.image_phash = to_signed(image_phash)
+        original_id = await _find_duplicate(user, report.location, image_phash)
+        if original_id is not None:
+            if duplicate_detector.policy == 'merge':
+                return _from_doc(await get_reports_collection().find_one({'_id': original_id})), True
+            report.duplicate_of = original_id
+
+    await _insert_report(report)
+    if image_phash is not None and report.duplicate_of is None:
+        duplicate_detector.remember(user, report.location, image_phash, report.id)
+    return report, False
+
+@disease_reports.route('/', methods=['POST'])
+@jwt_required
+async def create_report():
+    try:
+        data = await _get_payload('report')
+        user = ObjectId(get_jwt_identity())
+        image_digest, image_phash = await _uploaded_image('image')
+        report = DiseaseReport.from_payload(data, user, image_digest)
+        report, merged = await _save_report(report, user, image_phash)
+        return jsonify(report.to_dict()), 200 if merged else 201
+
+    except ImageValidationError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@disease_reports.route('/', methods=['GET'])
+@jwt_required
+async def get_reports():
+    try:
+        cursor = get_reports_collection().find({'user': ObjectId(get_jwt_identity()), 'deleted': {'$ne': True}}).sort('timestamp', -1)
+        return jsonify([_from_doc(doc).to_dict() async for doc in cursor])
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@disease_reports.route('/<report_id>', methods=['GET'])
+@jwt_required
+async def get_report(report_id):
+    try:
+        doc = await get_reports_collection().find_one({
+            '_id': ObjectId(report_id),
+            'user': ObjectId(get_jwt_identity()),
+            'deleted': {'$ne': True}
+        })
+        if doc is None:
+            return jsonify({'error': 'Report not found'}), 404
+        return jsonify(_from_doc(doc).to_dict())
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@disease_reports.route('/<report_id>', methods=['DELETE'])
+@jwt_required
+async def delete_report(report_id):
+    try:
+        # Same tombstone as DiseaseReport.mark_deleted, in one round trip
+        now = datetime.utcnow()
+        doc = await get_reports_collection().find_one_and_update(
+            {'_id': ObjectId(report_id), 'user': ObjectId(get_jwt_identity()), 'deleted': {'$ne': True}},
+            {'$set': {'deleted': True, 'deleted_at': now, 'updated_at': now}},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            return jsonify({'error': 'Report not found'}), 404
+        duplicate_detector.forget(doc['user'], doc['location'], doc['_id'])
+        return jsonify({'success': True, 'id': str(doc['_id'])})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@disease_reports.route('/export', methods=['GET'])
+@jwt_required
+async def export_reports():
+    """Stream all of the user's reports as NDJSON, CSV or Parquet."""
+    try:
+        fmt = request.args.get('format', 'ndjson')
+        mimetype, extension = ReportExportService.check_format(fmt)
+        query, sort = ReportExportService.build_query(request.args, get_jwt_identity())
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
+    except ExportUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+
+    # The Flask export, on the pymongo collection behind motor's: reading a batch
+    # and encoding it both block, so each chunk is produced in the executor
+    chunks = ReportExportService.export(get_reports_collection().delegate, fmt, query, sort)
+
+    async def generate():
+        try:
+            while True:
+                chunk = await run_blocking(next, chunks, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            await run_blocking(chunks.close)
+
+    response = Response(generate(), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="disease-reports.{extension}"'
+    })
+    # Large exports take longer than RESPONSE_TIMEOUT
+    response.timeout = None
+    return response
+
+@disease_reports.route('/changes', methods=['GET'])
+@jwt_required
+async def get_changes():
+    """Delta sync: reports created, updated or deleted since a sync token."""
+    try:
+        limit = min(max(int(request.args.get('limit', 500)), 1), 1000)
+        secret_key = current_app.config['SECRET_KEY']
+        user_id = get_jwt_identity()
+        token = request.args.get('since')
+        query = ReportSyncService.changes_query(secret_key, user_id, token)
+        # Fetch one extra row to learn whether another page follows
+        docs = await get_reports_collection().find(query).sort(ReportSyncService.SORT).to_list(limit + 1)
+        changed, deleted, sync_token, has_more = ReportSyncService.page(
+            secret_key, user_id, token, [_from_doc(doc) for doc in docs], limit
+        )
+        return jsonify({
+            'reports': changed,
+            'deleted': deleted,
+            'syncToken': sync_token,
+            'hasMore': has_more
+        })
+
+    except InvalidSyncToken as e:
+        # The client should drop its token and resync from scratch
+        return jsonify({'error': str(e), 'resync': True}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@disease_reports.route('/search', methods=['GET'])
+@jwt_required
+async def search_reports():
+    """Filter, search and sort the user's reports using the compound indexes."""
+    try:
+        query, sort, skip, limit = ReportQueryService.build(get_jwt_identity(), request.args)
+        docs = await get_reports_collection().find(query).sort(sort).skip(skip).to_list(limit + 1)
+        reports = [_from_doc(doc) for doc in docs]
+
+        return jsonify({
+            'reports': [report.to_dict() for report in reports[:limit]],
+            'page': skip // limit + 1,
+            'limit': limit,
+            'hasMore': len(reports) > limit
+        })
+
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _stream_requested():
+    """NDJSON bodies, and JSON arrays sent with ?stream=true, are parsed incrementally."""
+    return request.mimetype == 'application/x-ndjson' or (
+        request.mimetype == 'application/json' and request.args.get('stream', '').lower() in ('1', 'true')
+    )
+
+async def _insert_chunk(collection, items, user):
+    results, documents = SyncStreamService.build_chunk(items, user)
+    failed = {}
+    if documents:
+        try:
+            await collection.insert_many([doc for *_, doc in documents], ordered=False)
+        except BulkWriteError as e:
+            failed = SyncStreamService.write_errors(e)
+    return SyncStreamService.complete_chunk(results, documents, failed)
+
+def _stream_sync(user):
+    """Async counterpart of the Flask streaming sync (see app/services/sync_stream.py)."""
+    parser = parser_for(request.mimetype)
+    collection = get_reports_collection()
+    size = chunk_size()
+
+    processed = succeeded = 0
+
+    async def process(items):
+        nonlocal processed, succeeded
+        results = await _insert_chunk(collection, items, user)
+        processed += len(results)
+        succeeded += sum(1 for result in results if result['success'])
+        return SyncStreamService.result_lines(results)
+
+    @stream_with_context
+    async def generate():
+        pending = []
+        try:
+            try:
+                async for data in request.body:
+                    pending.extend(parser.feed(data))
+                    while len(pending) >= size:
+                        items, pending = pending[:size], pending[size:]
+                        yield await process(items)
+                pending.extend(parser.close())
+            except SyncPayloadError:
+                # Reports before a syntax error are still saved
+                if pending:
+                    yield await process(pending)
+                raise
+            if pending:
+                yield await process(pending)
+        except Exception as e:
+            yield SyncStreamService.summary_line(processed, succeeded, getattr(e, 'description', None) or str(e))
+            return
+        yield SyncStreamService.summary_line(processed, succeeded)
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@disease_reports.route('/sync', methods=['POST'])
+@jwt_required
+async def sync_reports():
+    if _stream_requested():
+        return _stream_sync(ObjectId(get_jwt_identity()))
+    try:
+        data = await _get_payload('reports')
+        user = ObjectId(get_jwt_identity())
+        results = []
+
+        # Handle both array and object formats
+        reports_data = data if isinstance(data, list) else data.get('reports', [])
+
+        for report_data in reports_data:
+            try:
+                image_digest, image_phash = await _uploaded_image(
+                    report_data.get('imageField') or f"image_{report_data.get('id')}"
+                )
+                report = DiseaseReport.from_payload(
+                    report_data,
+                    user,
+                    image_digest,
+                    synced=True,
+                    timestamp=datetime.fromisoformat(report_data.get('timestamp', datetime.utcnow().isoformat()))
+                )
+                report, merged = await _save_report(report, user, image_phash)
+                results.append({
+                    'success': True,
+                    'report': report.to_dict(),
+                    'original_id': report_data.get('id'),
+                    'merged': merged
+                })
+            except Exception as e:
+                results.append({
+                    'success': False,
+                    'error': str(e),
+                    'original_id': report_data.get('id')
+                })
+
+        return jsonify({
+            'success': True,
+            'results': results,
+            'message': f'Processed {len(reports_data)} reports'
+        })
+
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'message': 'Failed to sync reports'
+        }), 500
+
+@disease_reports.route('/stats/summary', methods=['GET'])
+@jwt_required
+async def get_stats():
+    try:
+        match = {'$match': {'user': ObjectId(get_jwt_identity()), 'deleted': {'$ne': True}, 'duplicate_of': None}}
+        collection = get_reports_collection()
+
+        total_reports = await collection.count_documents(match['$match'])
+        disease_distribution = await collection.aggregate([match] + DISEASE_DISTRIBUTION_PIPELINE).to_list(None)
+        location_distribution = await collection.aggregate([match] + LOCATION_DISTRIBUTION_PIPELINE).to_list(None)
+
+        return jsonify({
+            'totalReports': total_reports,
+            'diseaseDistribution': disease_distribution,
+            'locationDistribution': location_distribution
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,78 @@
+from quart import Blueprint, request, jsonify
+from app.aio.jwt_auth import jwt_required, get_jwt_identity
+from app.aio.models import AsyncUser, AsyncRefreshToken
+from app.aio.routes.auth_routes import session_tokens
+
+users = Blueprint("users", __name__)
+
+@users.route("/profile", methods=["GET"])
+@jwt_required
+async def get_profile():
+    """Get user profile."""
+    user = await AsyncUser.get_user_by_id(get_jwt_identity())
+    if not user:
+        return jsonify({"success": False, "message": "User not found"}), 404
+    
+    return jsonify({
+        "success": True,
+        "user": {
+            "id": str(user["_id"]),
+            "email": user["email"],
+            "name": user["name"],
+            "created_at": user.get("created_at"),
+            "last_login": user.get("last_login")
+        }
+    }), 200
+
+@users.route("/profile", methods=["PUT"])
+@jwt_required
+async def update_profile():
+    """Update user profile."""
+    user_id = get_jwt_identity()
+    data = await request.get_json()
+    
+    if not data:
+        return jsonify({"success": False, "message": "No data provided"}), 400
+    
+    if not await AsyncUser.get_user_by_id(user_id):
+        return jsonify({"success": False, "message": "User not found"}), 404
+    
+    await AsyncUser.update_profile(user_id, name=data.get("name"))
+    
+    updated_user = await AsyncUser.get_user_by_id(user_id)
+    
+    return jsonify({
+        "success": True,
+        "message": "Profile updated successfully",
+        "user": {
+            "id": str(updated_user["_id"]),
+            "email": updated_user["email"],
+            "name": updated_user["name"]
+        }
+    }), 200
+
+@users.route("/change-password", methods=["POST"])
+@jwt_required
+async def change_password():
+    """Change user password."""
+    user_id = get_jwt_identity()
+    data = await request.get_json()
+    
+    if not data or not data.get("current_password") or not data.get("new_password"):
+        return jsonify({"success": False, "message": "Current password and new password are required"}), 400
+    
+    user = await AsyncUser.get_user_by_id(user_id)
+    if not user:
+        return jsonify({"success": False, "message": "User not found"}), 404
+    
+    if not await AsyncUser.check_password(user, data.get("current_password")):
+        return jsonify({"success": False, "message": "Current password is incorrect"}), 401
+    
+    await AsyncUser.change_password(user_id, data.get("new_password"))
+    await AsyncRefreshToken.revoke_all_for_user(user_id)
+    
+    return jsonify({
+        "success": True,
+        "message": "Password changed successfully",
+        **await session_tokens(user_id)
+    }), 200
@@ -1,10 +1,46 @@
 from datetime import datetime
-from mongoengine import Document, StringField, FloatField, ListField, BooleanField, DateTimeField, ReferenceField, EmbeddedDocument, EmbeddedDocumentField
+from mongoengine import Document, StringField, FloatField, LongField, ListField, BooleanField, DateTimeField, ObjectIdField, LazyReferenceField, EmbeddedDocument, EmbeddedDocumentField, ValidationError
+
+# Aggregations behind /stats/summary, applied after filtering by user
+DISEASE_DISTRIBUTION_PIPELINE = [
+    {
+        '$group': {
+            '_id': '$disease_name',
+            'count': {'$sum': 1},
+            'severity': {
+                '$push': {
+                    'severity': '$severity',
+                    'count': 1
+                }
+            }
+        }
+    },
+    {'$sort': {'count': -1}}
+]
+
+LOCATION_DISTRIBUTION_PIPELINE = [
+    {
+        '$group': {
+            '_id': '$location',
+            'count': {'$sum': 1}
+        }
+    },
+    {'$sort': {'count': -1}}
+]
 
 class Coordinates(EmbeddedDocument):
     latitude = FloatField(required=True)
     longitude = FloatField(required=True)
 
+class ReportOwner(Document):
+    """Read-only mongoengine view of the ``users`` collection.
+
+    Users are managed through pymongo in app/models/user.py; this document only
+    exists so reports can hold a reference to their owner. The reference is
+    lazy so serializing a report never costs an extra lookup.
+    """
+    meta = {'collection': 'users', 'strict': False, 'auto_create_index': False}
+
 class DiseaseReport(Document):
     disease_name = StringField(required=True, max_length=100)
     severity = StringField(required=True, choices=['mild', 'moderate', 'severe'])
@@ -13,24 +49,65 @@ class DiseaseReport(Document):
     coordinates = EmbeddedDocumentField(Coordinates, required=True)
     weather = StringField(max_length=100)
     notes = StringField(max_length=500)
-    image_uri = StringField(required=True)
+    image_uri = StringField()
+    image_digest = StringField(max_length=64)
+    # 64-bit pHash of the photo (stored signed) and the report it near-duplicates
+    image_phash = LongField()
+    duplicate_of = ObjectIdField()
     symptoms = ListField(StringField(max_length=200))
     recommendations = ListField(StringField(max_length=200))
-    user = ReferenceField('User', required=True)
+    user = LazyReferenceField(ReportOwner, required=True)
     synced = BooleanField(default=True)
+    # Deleted reports are kept as tombstones so delta sync can report them
+    deleted = BooleanField(default=False)
+    deleted_at = DateTimeField()
     timestamp = DateTimeField(default=datetime.utcnow)
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
 
     meta = {
         'collection': 'disease_reports',
+        # Built by scripts.ensure_indexes at deploy time, which first drops
+        # superseded indexes (only one text index may exist per collection)
+        'auto_create_index': False,
         'indexes': [
             ('user', '-timestamp'),
+            ('user', 'updated_at', 'id'),
+            # Search/filter shapes (see app/services/report_query.py)
+            ('user', 'disease_name', '-timestamp'),
+            ('user', 'severity', '-timestamp'),
+            ('user', 'tree_age', '-timestamp'),
             'disease_name',
-            {'fields': ['location'], 'type': 'text'}
+            'image_digest',
+            # Prefixed by user so a search only reads that user's entries
+            {'fields': ['user', '$location']}
         ]
     }
 
+    @classmethod
+    def from_payload(cls, data, user, image_digest=None, **extra):
+        """Build an unsaved report from the camelCase payload sent by the app."""
+        coordinates = Coordinates(
+            latitude=data['coordinates']['latitude'],
+            longitude=data['coordinates']['longitude']
+        )
+
+        return cls(
+            disease_name=data['diseaseName'],
+            severity=data['severity'],
+            tree_age=data['treeAge'],
+            location=data['location'],
+            coordinates=coordinates,
+            weather=data.get('weather', ''),
+            notes=data.get('notes', ''),
+            image_uri=None if image_digest else data.get('imageUri'),
+            image_digest=image_digest,
+            symptoms=data.get('symptoms', []),
+            recommendations=data.get('recommendations', []),
+            user=user,
+            **extra
+        )
+
     def to_dict(self):
         return {
             'id': str(self.id),
@@ -44,16 +121,29 @@ class DiseaseReport(Document):
             },
             'weather': self.weather,
             'notes': self.notes,
-            'image_uri': self.image_uri,
+            'image_uri': self.image_uri or (f'/api/images/{self.image_digest}' if self.image_digest else None),
+            'image_digest': self.image_digest,
+            'duplicate_of': str(self.duplicate_of) if self.duplicate_of else None,
             'symptoms': self.symptoms,
             'recommendations': self.recommendations,
             'user_id': str(self.user.id),
             'synced': self.synced,
+            'deleted': bool(self.deleted),
             'timestamp': self.timestamp.isoformat(),
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
 
+    def clean(self):
+        if not self.image_uri and not self.image_digest:
+            raise ValidationError('Either imageUri or an uploaded image is required')
+
+    def mark_deleted(self):
+        """Turn the report into a tombstone; updated_at moves so delta sync sees it."""
+        self.deleted = True
+        self.deleted_at = datetime.utcnow()
+        return self.save()
+
     def save(self, *args, **kwargs):
         self.updated_at = datetime.utcnow()
         return super(DiseaseReport, self).save(*args, **kwargs) 
\ No newline at end of file
@@ -26,31 +26,40 @@ class OTP:
         OTP.get_collection().delete_many({"email": email, "purpose": purpose})
         
         # Generate new OTP
-        otp_code = OTP.generate_otp()
+        otp_data = OTP.new_otp_document(email, purpose)
+        
+        OTP.get_collection().insert_one(otp_data)
+        return otp_data["code"]
+    
+    @staticmethod
+    def new_otp_document(email, purpose="verification"):
+        """Build a fresh OTP document for an email and purpose."""
         expiry_minutes = int(os.getenv("OTP_EXPIRY_MINUTES", 10))
         
-        otp_data = {
+        return {
             "email": email,
-            "code": otp_code,
+            "code": OTP.generate_otp(),
             "purpose": purpose,
             "created_at": datetime.datetime.utcnow(),
             "expires_at": datetime.datetime.utcnow() + datetime.timedelta(minutes=expiry_minutes),
             "is_used": False
         }
-        
-        OTP.get_collection().insert_one(otp_data)
-        return otp_code
     
     @staticmethod
-    def verify_otp(email, otp_code, purpose="verification"):
-        """Verify an OTP."""
-        otp_data = OTP.get_collection().find_one({
+    def active_otp_query(email, otp_code, purpose="verification"):
+        """Query matching an unused, unexpired OTP."""
+        return {
             "email": email,
             "code": otp_code,
             "purpose": purpose,
             "is_used": False,
             "expires_at": {"$gt": datetime.datetime.utcnow()}
-        })
+        }
+    
+    @staticmethod
+    def verify_otp(email, otp_code, purpose="verification"):
+        """Verify an OTP."""
+        otp_data = OTP.get_collection().find_one(OTP.active_otp_query(email, otp_code, purpose))
         
         if not otp_data:
             return False
@@ -0,0 +1,141 @@
+import datetime
+import hashlib
+import os
+import secrets
+import uuid
+from bson import ObjectId
+from app.utils.db import get_db
+
+class RefreshToken:
+    """Server-side refresh tokens, rotated on every use.
+
+    A refresh token is 256 random bits handed to the client once. Only its
+    SHA-256 is stored, which is enough for tokens that cannot be guessed, so
+    checking one is a single indexed lookup with no bcrypt. Every refresh
+    revokes the presented token and issues a new one in the same family. If
+    a token that was already rotated shows up again, someone holds a stolen
+    copy, and the whole family is revoked. The exception is a grace window of
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS, which covers a client that retries a
+    refresh whose response it lost: within it, the rotated token is exchanged
+    once more for a new token in the same family, as long as the family is
+    still signed in.
+    """
+
+    @staticmethod
+    def get_collection():
+        return get_db().refresh_tokens
+
+    @staticmethod
+    def hash_token(raw_token):
+        return hashlib.sha256(raw_token.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def new_token_document(user_id, family_id=None):
+        """Build a token document; returns (raw token, document)."""
+        raw_token = secrets.token_urlsafe(32)
+        now = datetime.datetime.utcnow()
+        lifetime_days = int(os.getenv("REFRESH_TOKEN_DAYS", 30))
+        return raw_token, {
+            "token_hash": RefreshToken.hash_token(raw_token),
+            "user_id": ObjectId(user_id) if isinstance(user_id, str) else user_id,
+            "family_id": family_id or uuid.uuid4().hex,
+            "created_at": now,
+            "expires_at": now + datetime.timedelta(days=lifetime_days),
+            "revoked_at": None,
+            "revoked_reason": None,
+        }
+
+    @staticmethod
+    def claim_query(raw_token):
+        """Query matching an unrevoked, unexpired token."""
+        return {
+            "token_hash": RefreshToken.hash_token(raw_token),
+            "revoked_at": None,
+            "expires_at": {"$gt": datetime.datetime.utcnow()}
+        }
+
+    @staticmethod
+    def revoke_update(reason):
+        return {"$set": {"revoked_at": datetime.datetime.utcnow(), "revoked_reason": reason}}
+
+    @staticmethod
+    def _rotated_within_grace(token_data):
+        """None unless the token was revoked by rotation; else whether that was within the grace window."""
+        if not token_data or token_data.get("revoked_reason") != "rotated":
+            return None
+        grace = float(os.getenv("REFRESH_TOKEN_REUSE_GRACE_SECONDS", 10))
+        return datetime.datetime.utcnow() - token_data["revoked_at"] <= datetime.timedelta(seconds=grace)
+
+    @staticmethod
+    def is_retry(token_data):
+        """True if a rotated token was presented again within the grace window."""
+        return RefreshToken._rotated_within_grace(token_data) is True and \
+            token_data["expires_at"] > datetime.datetime.utcnow()
+
+    @staticmethod
+    def is_reuse(token_data):
+        """True if a rotated token was presented again after the grace window."""
+        return RefreshToken._rotated_within_grace(token_data) is False
+
+    @staticmethod
+    def live_family_query(token_data):
+        """Query for the unrevoked tokens of a token's family."""
+        return {"family_id": token_data["family_id"], "revoked_at": None}
+
+    @staticmethod
+    def issue(user_id, family_id=None):
+        """Store a new refresh token for a user and return it."""
+        raw_token, token_data = RefreshToken.new_token_document(user_id, family_id)
+        RefreshToken.get_collection().insert_one(token_data)
+        return raw_token
+
+    @staticmethod
+    def rotate(raw_token):
+        """Exchange a refresh token for a new one; returns (user_id, new token) or None."""
+        # Find and revoke the token in one round trip, so concurrent refreshes cannot both win
+        token_data = RefreshToken.get_collection().find_one_and_update(
+            RefreshToken.claim_query(raw_token),
+            RefreshToken.revoke_update("rotated")
+        )
+        if not token_data:
+            return RefreshToken._retry_or_revoke(raw_token)
+
+        user_id = str(token_data["user_id"])
+        return user_id, RefreshToken.issue(user_id, token_data["family_id"])
+
+    @staticmethod
+    def _retry_or_revoke(raw_token):
+        """Handle a token that can no longer be claimed.
+
+        A retry within the grace window gets a new token in the same family,
+        unless the family was signed out meanwhile (logout, password change,
+        reuse). A reuse after the window revokes the family.
+        """
+        collection = RefreshToken.get_collection()
+        token_data = collection.find_one({"token_hash": RefreshToken.hash_token(raw_token)})
+        if RefreshToken.is_retry(token_data):
+            if collection.find_one(RefreshToken.live_family_query(token_data), {"_id": 1}) is None:
+                return None
+            user_id = str(token_data["user_id"])
+            return user_id, RefreshToken.issue(user_id, token_data["family_id"])
+        if RefreshToken.is_reuse(token_data):
+            collection.update_many(RefreshToken.live_family_query(token_data), RefreshToken.revoke_update("reuse"))
+        return None
+
+    @staticmethod
+    def revoke(raw_token, reason="logout"):
+        """Revoke one token, e.g. on logout."""
+        RefreshToken.get_collection().update_one(
+            {"token_hash": RefreshToken.hash_token(raw_token), "revoked_at": None},
+            RefreshToken.revoke_update(reason)
+        )
+
+    @staticmethod
+    def revoke_all_for_user(user_id, reason="password_changed"):
+        """Sign a user out of every device."""
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+        RefreshToken.get_collection().update_many(
+            {"user_id": user_id, "revoked_at": None},
+            RefreshToken.revoke_update(reason)
+        )
@@ -11,12 +11,14 @@ class User:
         return get_db().users
     
     @staticmethod
-    def create_user(email, password, name=None):
-        """Create a new user."""
-        # Hash the password
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-        
-        user = {
+    def hash_password(password):
+        """Hash a password with bcrypt (CPU-bound, roughly 0.25s)."""
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    
+    @staticmethod
+    def new_user_document(email, hashed_password, name=None):
+        """Build the document stored for a newly registered user."""
+        return {
             "email": email,
             "password": hashed_password,
             "name": name or email.split("@")[0],  # Default name is part of email
@@ -25,6 +27,14 @@ class User:
             "is_active": False,  # User is inactive until email verification
             "last_login": None
         }
+    
+    @staticmethod
+    def create_user(email, password, name=None):
+        """Create a new user."""
+        # Hash the password
+        hashed_password = User.hash_password(password)
+        
+        user = User.new_user_document(email, hashed_password, name)
         
         result = User.get_collection().insert_one(user)
         user["_id"] = result.inserted_id
@@ -107,7 +117,7 @@ class User:
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
         
-        hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
+        hashed_password = User.hash_password(new_password)
         
         User.get_collection().update_one(
             {"_id": user_id},
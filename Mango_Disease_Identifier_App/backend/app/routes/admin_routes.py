@@ -0,0 +1,136 @@
+import functools
+import hmac
+import os
+from flask import Blueprint, Response, request, jsonify, current_app
+from app.models.disease_report import DiseaseReport
+from app.services.memory_monitor import memory_monitor
+from app.services.prediction_log import prediction_logger
+from app.services.report_export import ReportExportService, ExportUnavailable
+from app.services.report_query import InvalidQuery
+from app.utils.resilience import breaker_states, get_breaker
+
+admin = Blueprint("admin", __name__)
+
+def admin_required(fn):
+    """Require the X-Admin-Token header to match ADMIN_TOKEN.
+
+    Admin routes are disabled entirely when ADMIN_TOKEN is not set.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        expected = os.getenv("ADMIN_TOKEN")
+        if not expected:
+            return jsonify({"success": False, "message": "Admin API is disabled"}), 404
+        provided = request.headers.get("X-Admin-Token", "")
+        if not hmac.compare_digest(provided.encode(), expected.encode()):
+            return jsonify({"success": False, "message": "Invalid admin token"}), 403
+        return fn(*args, **kwargs)
+    return wrapper
+
+def _model_registry():
+    return current_app.extensions.get("model_registry")
+
+@admin.route("/model", methods=["GET"])
+@admin_required
+def model_status():
+    """Report the active model version, available versions and reload progress."""
+    registry = _model_registry()
+    if registry is None:
+        return jsonify({"success": False, "message": "Inference is not enabled in this process"}), 404
+    
+    return jsonify({"success": True, "data": registry.status()}), 200
+
+@admin.route("/model/reload", methods=["POST"])
+@admin_required
+def reload_model():
+    """Promote a model version and hot-swap it in the background."""
+    registry = _model_registry()
+    if registry is None:
+        return jsonify({"success": False, "message": "Inference is not enabled in this process"}), 404
+    
+    data = request.get_json(silent=True) or {}
+    version = data.get("version") or registry.current_pointer()
+    
+    if version not in registry.available_versions() and version != "default":
+        return jsonify({"success": False, "message": f"Unknown model version: {version}"}), 404
+    
+    # This worker loads and checks the version first; the pointer file that the
+    # other workers follow is only moved once it is serving here
+    if not registry.reload(version, promote=True):
+        return jsonify({"success": False, "message": "A reload is already in progress"}), 409
+    
+    return jsonify({
+        "success": True,
+        "message": f"Loading model version {version} in the background",
+        "data": registry.status()
+    }), 202
+
+@admin.route("/prediction-log", methods=["GET"])
+@admin_required
+def prediction_log_status():
+    """Report buffered, written and dropped prediction events for this worker."""
+    return jsonify({"success": True, "data": prediction_logger.status()}), 200
+
+@admin.route("/dependencies", methods=["GET"])
+@admin_required
+def dependency_status():
+    """Circuit breaker state and counters for MongoDB and SMTP in this worker."""
+    # Create both so they are listed before their first call
+    get_breaker("mongo")
+    get_breaker("smtp")
+    return jsonify({"success": True, "data": breaker_states()}), 200
+
+@admin.route("/memory", methods=["GET"])
+@admin_required
+def memory_status():
+    """RSS, growth rate and tracemalloc state of the worker that answers."""
+    memory_monitor.ensure_running()
+    return jsonify({"success": True, "data": memory_monitor.status()}), 200
+
+@admin.route("/memory/tracemalloc", methods=["POST"])
+@admin_required
+def set_memory_tracing():
+    """Turn allocation tracing on or off in this worker: {"enabled": true, "frames": 1}."""
+    memory_monitor.ensure_running()
+    data = request.get_json(silent=True) or {}
+    enabled = memory_monitor.set_tracing(bool(data.get("enabled", True)), data.get("frames"))
+    return jsonify({"success": True, "data": {"pid": os.getpid(), "tracemalloc": enabled}}), 200
+
+@admin.route("/memory/snapshots", methods=["POST"])
+@admin_required
+def take_memory_snapshot():
+    """Snapshot traced allocations and list the largest allocation sites."""
+    memory_monitor.ensure_running()
+    try:
+        data = memory_monitor.take_snapshot(request.args.get("limit", 20, type=int))
+    except RuntimeError as e:
+        return jsonify({"success": False, "message": str(e)}), 409
+    return jsonify({"success": True, "data": dict(data, pid=os.getpid())}), 201
+
+@admin.route("/memory/snapshots/<int:old_id>/diff/<int:new_id>", methods=["GET"])
+@admin_required
+def diff_memory_snapshots(old_id, new_id):
+    """Allocation sites that grew between two snapshots of this worker."""
+    try:
+        data = memory_monitor.diff(old_id, new_id, request.args.get("limit", 20, type=int))
+    except KeyError as e:
+        return jsonify({"success": False, "message": e.args[0]}), 404
+    return jsonify({"success": True, "data": dict(data, pid=os.getpid())}), 200
+
+@admin.route("/reports/export", methods=["GET"])
+@admin_required
+def export_all_reports():
+    """Stream every user's reports in _id order; resume an interrupted dump with ?after=<last id>."""
+    try:
+        fmt = request.args.get("format", "ndjson")
+        mimetype, extension = ReportExportService.check_format(fmt)
+        query, sort = ReportExportService.build_query(request.args)
+    except InvalidQuery as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except ExportUnavailable as e:
+        return jsonify({"success": False, "message": str(e)}), 501
+
+    chunks = ReportExportService.export(DiseaseReport._get_collection(), fmt, query, sort)
+    return Response(chunks, mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="disease-reports.{extension}"'
+    })
@@ -1,11 +1,13 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from app.models.user import User
 from app.models.otp import OTP
+from app.models.refresh_token import RefreshToken
 from app.services.email_service import EmailService
 from email_validator import validate_email, EmailNotValidError
 import json
 from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 # Custom JSON encoder to handle ObjectId
 class JSONEncoder(json.JSONEncoder):
@@ -16,6 +18,14 @@ class JSONEncoder(json.JSONEncoder):
 
 auth = Blueprint("auth", __name__)
 
+def session_tokens(user_id):
+    """A new access token and refresh token for a fresh sign-in."""
+    return {
+        "token": create_access_token(identity=user_id),
+        "refresh_token": RefreshToken.issue(user_id),
+        "expires_in": current_app.config["JWT_ACCESS_TOKEN_EXPIRES"]
+    }
+
 @auth.route("/signup", methods=["POST"])
 def signup():
     """Register a new user."""
@@ -31,7 +41,7 @@ def signup():
     
     # Validate email
     try:
-        valid = validate_email(email)
+        valid = validate_email(email, check_deliverability=current_app.config["EMAIL_CHECK_DELIVERABILITY"])
         email = valid.email
     except EmailNotValidError:
         return jsonify({"success": False, "message": "Invalid email address"}), 400
@@ -41,8 +51,11 @@ def signup():
     if existing_user:
         return jsonify({"success": False, "message": "Email already registered"}), 409
     
-    # Create user
-    user = User.create_user(email, password, name)
+    # Create user; the unique email index settles concurrent signups
+    try:
+        user = User.create_user(email, password, name)
+    except DuplicateKeyError:
+        return jsonify({"success": False, "message": "Email already registered"}), 409
     
     # Generate and send OTP
     otp_code = OTP.create_otp(email)
@@ -80,13 +93,11 @@ def verify_otp():
     # Activate user
     User.activate_user(user["_id"])
     
-    # Generate JWT token
-    access_token = create_access_token(identity=str(user["_id"]))
-    
+    # Generate JWT and refresh tokens
     return jsonify({
         "success": True,
         "message": "Email verified successfully",
-        "token": access_token,
+        **session_tokens(str(user["_id"])),
         "user": {
             "id": str(user["_id"]),
             "email": user["email"],
@@ -132,13 +143,11 @@ def login():
     # Update last login
     User.update_last_login(user["_id"])
     
-    # Generate JWT token
-    access_token = create_access_token(identity=str(user["_id"]))
-    
+    # Generate JWT and refresh tokens
     return jsonify({
         "success": True,
         "message": "Login successful",
-        "token": access_token,
+        **session_tokens(str(user["_id"])),
         "user": {
             "id": str(user["_id"]),
             "email": user["email"],
@@ -225,14 +234,51 @@ def reset_password():
     if not OTP.verify_otp(email, otp_code, purpose="password_reset"):
         return jsonify({"success": False, "message": "Invalid or expired OTP"}), 400
     
-    # Update password
+    # Update password and sign out every device
     User.change_password(user["_id"], new_password)
+    RefreshToken.revoke_all_for_user(user["_id"])
     
     return jsonify({
         "success": True,
         "message": "Password reset successful"
     }), 200
 
+@auth.route("/refresh", methods=["POST"])
+def refresh():
+    """Exchange a refresh token for a new access token and refresh token."""
+    data = request.get_json(silent=True)
+    
+    if not data or not data.get("refresh_token"):
+        return jsonify({"success": False, "message": "Refresh token is required"}), 400
+    
+    # One indexed lookup; no user lookup and no password hashing
+    rotated = RefreshToken.rotate(data.get("refresh_token"))
+    if not rotated:
+        return jsonify({"success": False, "message": "Invalid or expired refresh token"}), 401
+    
+    user_id, refresh_token = rotated
+    return jsonify({
+        "success": True,
+        "token": create_access_token(identity=user_id),
+        "refresh_token": refresh_token,
+        "expires_in": current_app.config["JWT_ACCESS_TOKEN_EXPIRES"]
+    }), 200
+
+@auth.route("/logout", methods=["POST"])
+def logout():
+    """Revoke a refresh token; the access token expires on its own."""
+    data = request.get_json(silent=True)
+    
+    if not data or not data.get("refresh_token"):
+        return jsonify({"success": False, "message": "Refresh token is required"}), 400
+    
+    RefreshToken.revoke(data.get("refresh_token"))
+    
+    return jsonify({
+        "success": True,
+        "message": "Logged out"
+    }), 200
+
 @auth.route("/me", methods=["GET"])
 @jwt_required()
 def get_current_user():
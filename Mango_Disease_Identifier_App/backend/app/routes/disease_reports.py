@@ -1,41 +1,78 @@
-from flask import Blueprint, request, jsonify
+import json
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models.disease_report import DiseaseReport, Coordinates
-from app.models.user import User
+from werkzeug.exceptions import HTTPException
+from bson.objectid import ObjectId
+from app.models.disease_report import DiseaseReport, DISEASE_DISTRIBUTION_PIPELINE, LOCATION_DISTRIBUTION_PIPELINE
+from app.services.blob_store import blob_store
+from app.services.duplicate_detector import duplicate_detector
+from app.services.image_service import ImageService, ImageValidationError
+from app.services.perceptual_hash import phash, to_signed
+from app.services.report_sync import ReportSyncService, InvalidSyncToken
+from app.services.sync_stream import SyncStreamService, iter_chunks, parser_for
+from app.services.report_export import ReportExportService, ExportUnavailable
+from app.services.report_query import ReportQueryService, InvalidQuery
+from app.utils.body_limit import body_limit
 from datetime import datetime
 
 disease_reports = Blueprint('disease_reports', __name__)
 
+def _get_payload(form_field):
+    """Read the report payload from a JSON body or a multipart form field."""
+    if request.mimetype == 'multipart/form-data':
+        return json.loads(request.form.get(form_field, 'null'))
+    return request.get_json()
+
+def _store_image(file):
+    """Validate an uploaded photo and store it, returning its SHA-256 digest and pHash."""
+    data = ImageService.read_upload(file)
+    _, img = ImageService.validate_image(data)
+    # The hash only needs a small grayscale decode
+    img.draft('L', (64, 64))
+    return blob_store.put(data), phash(img)
+
+def _uploaded_image(field_name):
+    file = request.files.get(field_name) if field_name else None
+    if not file:
+        return None, None
+    return _store_image(file)
+
+def _save_report(report, user, image_phash):
+    """Save a report, checking its photo against the user's earlier reports at that location.
+
+    Returns (report, merged). Under the merge policy, a near-duplicate is not
+    stored and the original report is returned with merged=True.
+    """
+    if image_phash is not None:
+        report.image_phash = to_signed(image_phash)
+        original_id = duplicate_detector.find_duplicate(
+            DiseaseReport._get_collection(), user, report.location, image_phash
+        )
+        if original_id is not None:
+            if duplicate_detector.policy == 'merge':
+                return DiseaseReport.objects.get(id=original_id), True
+            report.duplicate_of = original_id
+
+    report.save()
+    if image_phash is not None and report.duplicate_of is None:
+        duplicate_detector.remember(user, report.location, image_phash, report.id)
+    return report, False
+
 @disease_reports.route('/', methods=['POST'])
 @jwt_required()
 def create_report():
     try:
-        data = request.get_json()
-        user_id = get_jwt_identity()
-        user = User.objects.get(id=user_id)
-
-        coordinates = Coordinates(
-            latitude=data['coordinates']['latitude'],
-            longitude=data['coordinates']['longitude']
-        )
+        data = _get_payload('report')
+        user = ObjectId(get_jwt_identity())
+        image_digest, image_phash = _uploaded_image('image')
 
-        report = DiseaseReport(
-            disease_name=data['diseaseName'],
-            severity=data['severity'],
-            tree_age=data['treeAge'],
-            location=data['location'],
-            coordinates=coordinates,
-            weather=data.get('weather', ''),
-            notes=data.get('notes', ''),
-            image_uri=data['imageUri'],
-            symptoms=data.get('symptoms', []),
-            recommendations=data.get('recommendations', []),
-            user=user
-        )
+        report = DiseaseReport.from_payload(data, user, image_digest)
 
-        report.save()
-        return jsonify(report.to_dict()), 201
+        report, merged = _save_report(report, user, image_phash)
+        return jsonify(report.to_dict()), 200 if merged else 201
 
+    except ImageValidationError as e:
+        return jsonify({'error': e.message}), e.status_code
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -44,7 +81,7 @@ def create_report():
 def get_reports():
     try:
         user_id = get_jwt_identity()
-        reports = DiseaseReport.objects(user=user_id).order_by('-timestamp')
+        reports = DiseaseReport.objects(user=user_id, deleted__ne=True).order_by('-timestamp')
         return jsonify([report.to_dict() for report in reports])
 
     except Exception as e:
@@ -55,7 +92,7 @@ def get_reports():
 def get_report(report_id):
     try:
         user_id = get_jwt_identity()
-        report = DiseaseReport.objects.get(id=report_id, user=user_id)
+        report = DiseaseReport.objects.get(id=report_id, user=user_id, deleted__ne=True)
         return jsonify(report.to_dict())
 
     except DiseaseReport.DoesNotExist:
@@ -63,13 +100,135 @@ def get_report(report_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@disease_reports.route('/<report_id>', methods=['DELETE'])
+@jwt_required()
+def delete_report(report_id):
+    try:
+        user_id = get_jwt_identity()
+        report = DiseaseReport.objects.get(id=report_id, user=user_id, deleted__ne=True)
+        report.mark_deleted()
+        duplicate_detector.forget(report.user.id, report.location, report.id)
+        return jsonify({'success': True, 'id': str(report.id)})
+
+    except DiseaseReport.DoesNotExist:
+        return jsonify({'error': 'Report not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@disease_reports.route('/search', methods=['GET'])
+@jwt_required()
+def search_reports():
+    """Filter, search and sort the user's reports using the compound indexes."""
+    try:
+        query, sort, skip, limit = ReportQueryService.build(get_jwt_identity(), request.args)
+        reports = (
+            DiseaseReport.objects(__raw__=query)
+            .order_by(*[('-' if direction < 0 else '') + field for field, direction in sort])
+            .skip(skip)
+            .limit(limit + 1)
+        )
+        reports = list(reports)
+
+        return jsonify({
+            'reports': [report.to_dict() for report in reports[:limit]],
+            'page': skip // limit + 1,
+            'limit': limit,
+            'hasMore': len(reports) > limit
+        })
+
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@disease_reports.route('/export', methods=['GET'])
+@jwt_required()
+def export_reports():
+    """Stream all of the user's reports as NDJSON, CSV or Parquet."""
+    try:
+        fmt = request.args.get('format', 'ndjson')
+        mimetype, extension = ReportExportService.check_format(fmt)
+        query, sort = ReportExportService.build_query(request.args, get_jwt_identity())
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
+    except ExportUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+
+    chunks = ReportExportService.export(DiseaseReport._get_collection(), fmt, query, sort)
+    return Response(chunks, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="disease-reports.{extension}"'
+    })
+
+@disease_reports.route('/changes', methods=['GET'])
+@jwt_required()
+def get_changes():
+    """Delta sync: reports created, updated or deleted since a sync token."""
+    try:
+        limit = min(max(int(request.args.get('limit', 500)), 1), 1000)
+        changed, deleted, sync_token, has_more = ReportSyncService.changes_since(
+            current_app.config['SECRET_KEY'],
+            get_jwt_identity(),
+            request.args.get('since'),
+            limit
+        )
+        return jsonify({
+            'reports': changed,
+            'deleted': deleted,
+            'syncToken': sync_token,
+            'hasMore': has_more
+        })
+
+    except InvalidSyncToken as e:
+        # The client should drop its token and resync from scratch
+        return jsonify({'error': str(e), 'resync': True}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _stream_requested():
+    """NDJSON bodies, and JSON arrays sent with ?stream=true, are parsed incrementally."""
+    return request.mimetype == 'application/x-ndjson' or (
+        request.mimetype == 'application/json' and request.args.get('stream', '').lower() in ('1', 'true')
+    )
+
+def _stream_sync(user):
+    """Insert reports chunk by chunk as the body arrives; results stream back as NDJSON.
+
+    The last line is a summary with ``"done": true``. If the body turns out to
+    be malformed part way through, the reports before that point stay saved
+    and the summary carries the error.
+    """
+    parser = parser_for(request.mimetype)
+    collection = DiseaseReport._get_collection()
+
+    def generate():
+        processed = succeeded = 0
+        try:
+            for items in iter_chunks(request.stream.read, parser):
+                results = SyncStreamService.insert_chunk(collection, items, user)
+                processed += len(results)
+                succeeded += sum(1 for result in results if result['success'])
+                yield SyncStreamService.result_lines(results)
+        except Exception as e:
+            # HTTP errors (e.g. 413 from an oversized gzip body) carry a description
+            yield SyncStreamService.summary_line(processed, succeeded, getattr(e, 'description', None) or str(e))
+            return
+        yield SyncStreamService.summary_line(processed, succeeded)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @disease_reports.route('/sync', methods=['POST'])
+# Streamed bodies are bounded per item (SYNC_MAX_ITEM_BYTES) rather than in total
+@body_limit(None)
 @jwt_required()
 def sync_reports():
+    if _stream_requested():
+        return _stream_sync(ObjectId(get_jwt_identity()))
     try:
-        data = request.get_json()
+        data = _get_payload('reports')
         user_id = get_jwt_identity()
-        user = User.objects.get(id=user_id)
+        user = ObjectId(user_id)
         results = []
 
         # Handle both array and object formats
@@ -77,34 +236,26 @@ def sync_reports():
         
         for report_data in reports_data:
             try:
-                # Extract coordinates from the data
-                coordinates = Coordinates(
-                    latitude=report_data['coordinates']['latitude'],
-                    longitude=report_data['coordinates']['longitude']
+                # Photos are uploaded as multipart fields named image_<id>
+                image_digest, image_phash = _uploaded_image(
+                    report_data.get('imageField') or f"image_{report_data.get('id')}"
                 )
 
                 # Create the report
-                report = DiseaseReport(
-                    disease_name=report_data['diseaseName'],
-                    severity=report_data['severity'],
-                    tree_age=report_data['treeAge'],
-                    location=report_data['location'],
-                    coordinates=coordinates,
-                    weather=report_data.get('weather', ''),
-                    notes=report_data.get('notes', ''),
-                    image_uri=report_data['imageUri'],
-                    symptoms=report_data.get('symptoms', []),
-                    recommendations=report_data.get('recommendations', []),
-                    user=user,
+                report = DiseaseReport.from_payload(
+                    report_data,
+                    user,
+                    image_digest,
                     synced=True,
                     timestamp=datetime.fromisoformat(report_data.get('timestamp', datetime.utcnow().isoformat()))
                 )
 
-                report.save()
+                report, merged = _save_report(report, user, image_phash)
                 results.append({
                     'success': True, 
                     'report': report.to_dict(),
-                    'original_id': report_data.get('id')
+                    'original_id': report_data.get('id'),
+                    'merged': merged
                 })
             except Exception as e:
                 results.append({
@@ -119,6 +270,9 @@ def sync_reports():
             'message': f'Processed {len(reports_data)} reports'
         })
 
+    except HTTPException:
+        # e.g. 413 from an oversized gzip body; handled by the app's error handlers
+        raise
     except Exception as e:
         return jsonify({
             'error': str(e),
@@ -131,36 +285,14 @@ def get_stats():
     try:
         user_id = get_jwt_identity()
         
-        # Get total reports
-        total_reports = DiseaseReport.objects(user=user_id).count()
+        # Get total reports; flagged near-duplicates would inflate the counts
+        total_reports = DiseaseReport.objects(user=user_id, deleted__ne=True, duplicate_of=None).count()
         
         # Get disease distribution
-        disease_distribution = DiseaseReport.objects(user=user_id).aggregate([
-            {
-                '$group': {
-                    '_id': '$disease_name',
-                    'count': {'$sum': 1},
-                    'severity': {
-                        '$push': {
-                            'severity': '$severity',
-                            'count': 1
-                        }
-                    }
-                }
-            },
-            {'$sort': {'count': -1}}
-        ])
+        disease_distribution = DiseaseReport.objects(user=user_id, deleted__ne=True, duplicate_of=None).aggregate(DISEASE_DISTRIBUTION_PIPELINE)
         
         # Get location distribution
-        location_distribution = DiseaseReport.objects(user=user_id).aggregate([
-            {
-                '$group': {
-                    '_id': '$location',
-                    'count': {'$sum': 1}
-                }
-            },
-            {'$sort': {'count': -1}}
-        ])
+        location_distribution = DiseaseReport.objects(user=user_id, deleted__ne=True, duplicate_of=None).aggregate(LOCATION_DISTRIBUTION_PIPELINE)
 
         return jsonify({
             'totalReports': total_reports,
@@ -0,0 +1,52 @@
+from flask import Blueprint, jsonify, send_file
+from app.services.blob_store import blob_store, THUMBNAIL_SIZES
+from app.services.image_service import ImageService
+
+images = Blueprint("images", __name__)
+
+# Blobs are content-addressed, so a URL never changes meaning
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+_MIMETYPES = {
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp",
+}
+
+
+def _send_immutable(path, mimetype, etag):
+    # send_file hands the open file to the server's wsgi.file_wrapper,
+    # which gunicorn serves with sendfile(2) instead of copying through Python
+    response = send_file(path, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE, etag=etag, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@images.route("/<digest>", methods=["GET"])
+def get_image(digest):
+    """Serve an original image by its SHA-256 digest."""
+    if not blob_store.exists(digest):
+        return jsonify({"success": False, "message": "Image not found"}), 404
+
+    path = blob_store.blob_path(digest)
+    with open(path, "rb") as f:
+        fmt = ImageService.sniff_format(f.read(16))
+
+    return _send_immutable(path, _MIMETYPES.get(fmt, "application/octet-stream"), digest)
+
+
+@images.route("/<digest>/thumb/<int:size>", methods=["GET"])
+def get_thumbnail(digest, size):
+    """Serve a JPEG thumbnail, generating and caching it on first request."""
+    if size not in THUMBNAIL_SIZES:
+        return jsonify({
+            "success": False,
+            "message": f"Thumbnail size must be one of {list(THUMBNAIL_SIZES)}"
+        }), 400
+
+    if not blob_store.exists(digest):
+        return jsonify({"success": False, "message": "Image not found"}), 404
+
+    path = blob_store.thumbnail(digest, size)
+    return _send_immutable(path, "image/jpeg", f"{digest}-{size}")
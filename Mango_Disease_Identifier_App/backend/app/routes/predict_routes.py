@@ -0,0 +1,292 @@
+import logging
+import os
+import threading
+import time
+import numpy as np
+from flask import Blueprint, Response, jsonify, request, current_app
+from flask_jwt_extended import jwt_required, verify_jwt_in_request, get_jwt_identity
+from app.services.blob_store import blob_store
+from app.services.disease_catalog import describe_prediction
+from app.services.image_service import ImageService, ImageValidationError
+from app.services.prediction_jobs import FINISHED, JobNotFound, PredictionJobService
+from app.services.prediction_log import prediction_logger
+from app.services.similar_cases import SimilarCaseService
+from app.utils.body_limit import body_limit
+
+logger = logging.getLogger(__name__)
+
+inference = Blueprint("inference", __name__)
+
+# Job event streams open in this process; each holds a thread until it ends
+_streams_lock = threading.Lock()
+_open_streams = 0
+
+def _optional_user_id():
+    """Identity of the caller if a valid JWT was sent; /predict stays public."""
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+@inference.route('/predict', methods=['POST'])
+def predict():
+    started = time.perf_counter()
+    registry = current_app.extensions["model_registry"]
+    
+    # Take one reference so a concurrent hot swap cannot change the model mid-request
+    active_model = registry.ensure_loaded()
+    registry.ensure_watcher()
+    if active_model is None:
+        return jsonify({'error': 'Model not loaded. Server is not properly configured.'}), 500
+    
+    if not active_model.categories:
+        return jsonify({'error': 'Categories not available. Server is not properly configured.'}), 500
+        
+    # Reject oversized, unknown or malformed uploads before decoding any pixels;
+    # the length check comes first because request.files parses the whole body
+    try:
+        ImageService.check_request_length(request.content_length)
+        x, image_digest = ImageService.load_upload(request.files, request.content_length)
+    except ImageValidationError as e:
+        return jsonify({'error': e.message}), e.status_code
+    
+    try:
+        pred = active_model.predict(x)
+        
+        if pred is None or len(pred) == 0:
+            logger.error("Model returned empty prediction")
+            return jsonify({'error': 'Model returned empty prediction'}), 500
+        
+        class_index = int(np.argmax(pred, axis=1)[0])
+        prediction_probability = float(pred[0][class_index])
+        
+        # Validate index is within categories range
+        if class_index >= len(active_model.categories):
+            logger.error(f"Invalid class index: {class_index}. Out of range for categories.")
+            return jsonify({'error': 'Model prediction out of range'}), 500
+            
+        predicted_class = active_model.categories[class_index]
+        
+        result = describe_prediction(predicted_class, prediction_probability)
+        result['model_version'] = active_model.version
+        
+        # Log the prediction for monitoring
+        logger.info(f"Predicted disease: {predicted_class} with confidence: {prediction_probability:.4f} (model {active_model.version})")
+        
+        # Buffered and written to Mongo in batches by a background thread
+        prediction_logger.record(prediction_logger.build_event(
+            predicted_class,
+            pred[0],
+            active_model.categories,
+            active_model.version,
+            (time.perf_counter() - started) * 1000,
+            image_digest=image_digest,
+            user_id=_optional_user_id(),
+        ))
+        
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Prediction error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@inference.route('/similar', methods=['POST'])
+@jwt_required()
+def similar_cases():
+    """Past reports whose photos look most like the uploaded image."""
+    registry = current_app.extensions["model_registry"]
+    active_model = registry.ensure_loaded()
+    registry.ensure_watcher()
+    if active_model is None:
+        return jsonify({'error': 'Model not loaded. Server is not properly configured.'}), 500
+    
+    try:
+        k = min(max(int(request.args.get('k', 10)), 1), 50)
+    except ValueError:
+        return jsonify({'error': 'k must be an integer'}), 400
+    
+    try:
+        ImageService.check_request_length(request.content_length)
+        x, _ = ImageService.load_upload(request.files, request.content_length)
+    except ImageValidationError as e:
+        return jsonify({'error': e.message}), e.status_code
+    
+    try:
+        results = SimilarCaseService.find_similar(active_model, x, k, get_jwt_identity())
+        return jsonify({'model_version': active_model.version, 'results': results})
+    except Exception as e:
+        logger.error(f"Similar case search error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# -- batch prediction jobs ----------------------------------------------
+
+def _job_scheduler():
+    scheduler = current_app.extensions["prediction_jobs"]
+    scheduler.ensure_running()
+    return scheduler
+
+def _open_event_stream():
+    """Reserve a job event stream slot; False when PREDICTION_JOB_EVENTS_MAX_STREAMS are open."""
+    global _open_streams
+    with _streams_lock:
+        if _open_streams >= int(os.getenv('PREDICTION_JOB_EVENTS_MAX_STREAMS', 2)):
+            return False
+        _open_streams += 1
+        return True
+
+def _close_event_stream():
+    global _open_streams
+    with _streams_lock:
+        _open_streams -= 1
+
+def _job_links(job_id):
+    return {
+        'self': f'/predict/jobs/{job_id}',
+        'events': f'/predict/jobs/{job_id}/events',
+    }
+
+def _max_job_images():
+    return int(os.getenv('PREDICTION_JOB_MAX_IMAGES', 500))
+
+@inference.route('/predict/jobs', methods=['POST'])
+@body_limit(lambda: _max_job_images() * ImageService.max_request_bytes())
+@jwt_required()
+def submit_prediction_job():
+    """Queue a set of images for prediction; results arrive by polling or SSE."""
+    files = request.files.getlist('images')
+    if not files:
+        return jsonify({'error': 'No images uploaded; send them in the "images" field'}), 400
+    max_images = _max_job_images()
+    if len(files) > max_images:
+        return jsonify({'error': f'A job may contain at most {max_images} images'}), 413
+
+    # Store each image as soon as it is read and keep only its digest
+    uploads = []
+    for file in files:
+        try:
+            data = ImageService.read_upload(file)
+            ImageService.validate_image(data)
+            uploads.append((file.filename, blob_store.put(data), None))
+        except ImageValidationError as e:
+            uploads.append((file.filename, None, e.message))
+
+    job = PredictionJobService.create(get_jwt_identity(), uploads)
+    _job_scheduler().notify()
+    job_id = str(job['_id'])
+    return jsonify(dict(PredictionJobService.summary(job), links=_job_links(job_id))), 202, {
+        'Location': f'/predict/jobs/{job_id}',
+    }
+
+@inference.route('/predict/jobs', methods=['GET'])
+@jwt_required()
+def list_prediction_jobs():
+    jobs = PredictionJobService.list_for_user(get_jwt_identity())
+    return jsonify({'jobs': [PredictionJobService.summary(job) for job in jobs]})
+
+@inference.route('/predict/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_prediction_job(job_id):
+    """Job progress plus the results finished after ``since`` (a result seq)."""
+    _job_scheduler()
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'error': 'since must be an integer'}), 400
+    try:
+        job = PredictionJobService.get(job_id, get_jwt_identity())
+    except JobNotFound:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(dict(
+        PredictionJobService.summary(job),
+        seq=job['seq'],
+        results=PredictionJobService.results_since(job, since),
+        links=_job_links(job_id),
+    ))
+
+@inference.route('/predict/jobs/<job_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_prediction_job(job_id):
+    try:
+        cancelled = PredictionJobService.cancel(job_id, get_jwt_identity())
+    except JobNotFound:
+        return jsonify({'error': 'Job not found'}), 404
+    if not cancelled:
+        return jsonify({'error': 'Job has already finished'}), 409
+    return jsonify({'job_id': job_id, 'status': 'cancelled'})
+
+@inference.route('/predict/jobs/<job_id>/events', methods=['GET'])
+@jwt_required()
+def stream_prediction_job(job_id):
+    """Server-sent events: one ``result`` per finished image, ``progress`` after each
+    change, and ``done`` when the job ends.
+
+    Event ids are result seqs, so a reconnecting EventSource resumes from
+    Last-Event-ID. Each stream is capped at PREDICTION_JOB_EVENTS_MAX_SECONDS
+    because it holds a worker thread; clients simply reconnect.
+
+    A stream would hold a sync gunicorn worker, and with it /predict, for
+    its whole life, so streams are only served by threaded or async workers,
+    at most PREDICTION_JOB_EVENTS_MAX_STREAMS at a time per process. Other
+    clients poll GET /predict/jobs/<id>?since=<seq>.
+    """
+    _job_scheduler()
+    user_id = get_jwt_identity()
+    try:
+        since = int(request.headers.get('Last-Event-ID') or request.args.get('since', 0))
+        PredictionJobService.get(job_id, user_id, {'_id': 1})
+    except ValueError:
+        return jsonify({'error': 'Last-Event-ID must be an integer'}), 400
+    except JobNotFound:
+        return jsonify({'error': 'Job not found'}), 404
+
+    poll = dict(_job_links(job_id), poll=f'/predict/jobs/{job_id}?since={since}')
+    if not request.environ.get('wsgi.multithread'):
+        return jsonify({
+            'error': 'Event streams need a threaded worker (GUNICORN_WORKER_CLASS=gthread); poll the job instead',
+            'links': poll,
+        }), 501
+    if not _open_event_stream():
+        return jsonify({'error': 'Too many open event streams; poll the job instead', 'links': poll}), 503, {
+            'Retry-After': '5',
+        }
+
+    poll_seconds = float(os.getenv('PREDICTION_JOB_EVENTS_POLL_SECONDS', 1))
+    max_seconds = float(os.getenv('PREDICTION_JOB_EVENTS_MAX_SECONDS', 300))
+    dumps = current_app.json.dumps
+
+    def events():
+        nonlocal since
+        deadline = time.monotonic() + max_seconds
+        last_sent = 0.0
+        yield f'retry: {int(poll_seconds * 1000)}\n\n'
+        while True:
+            try:
+                job = PredictionJobService.get(job_id, user_id)
+            except JobNotFound:
+                yield 'event: done\ndata: {"status": "expired"}\n\n'
+                return
+            results = PredictionJobService.results_since(job, since)
+            for result in results:
+                yield f'id: {result["seq"]}\nevent: result\ndata: {dumps(result)}\n\n'
+                since = result['seq']
+            if results:
+                yield f'event: progress\ndata: {dumps(PredictionJobService.summary(job))}\n\n'
+                last_sent = time.monotonic()
+            if job['status'] in FINISHED:
+                yield f'event: done\ndata: {dumps(PredictionJobService.summary(job))}\n\n'
+                return
+            if time.monotonic() >= deadline:
+                return
+            if time.monotonic() - last_sent >= 15:
+                # Comment line keeps proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+                last_sent = time.monotonic()
+            time.sleep(poll_seconds)
+
+    response = Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    # Called by the server even if the client leaves before the first event
+    response.call_on_close(_close_event_stream)
+    return response
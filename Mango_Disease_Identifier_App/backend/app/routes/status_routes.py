@@ -0,0 +1,43 @@
+import re
+import logging
+from flask import Blueprint, jsonify
+from app.utils import db as db_utils
+
+logger = logging.getLogger(__name__)
+
+status = Blueprint("status", __name__)
+
+def test_db_connection():
+    """Check that MongoDB answers; the client is only created on first use."""
+    try:
+        db_utils.get_db()
+        # The serverStatus command is cheap and does not require auth
+        info = db_utils.mongo_client.server_info()
+        logger.info(f"MongoDB connection successful! Version: {info.get('version')}")
+        return True
+    except Exception as e:
+        logger.error(f"MongoDB connection failed: {e}")
+        return False
+
+@status.route('/db-status', methods=['GET'])
+def db_status():
+    is_connected = test_db_connection()
+    collections = []
+    db_name = None
+    
+    if is_connected:
+        try:
+            # List all collections in the database
+            db = db_utils.get_db()
+            collections = db.list_collection_names()
+            db_name = db.name
+            logger.info(f"Found collections: {collections}")
+        except Exception as e:
+            logger.error(f"Failed to list collections: {e}")
+    
+    return jsonify({
+        'status': 'connected' if is_connected else 'disconnected',
+        'database_name': db_name,
+        'collections': collections,
+        'uri': re.sub(r'//[^@/]+@', '//***:***@', db_utils.get_mongo_uri())  # Hide credentials
+    })
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User
+from app.models.refresh_token import RefreshToken
+from app.routes.auth_routes import session_tokens
 from bson.objectid import ObjectId
 
 users = Blueprint("users", __name__)
@@ -77,10 +79,12 @@ def change_password():
     if not User.check_password(user, current_password):
         return jsonify({"success": False, "message": "Current password is incorrect"}), 401
     
-    # Update password
+    # Update password, sign out other devices and start a new session here
     User.change_password(user_id, new_password)
+    RefreshToken.revoke_all_for_user(user_id)
     
     return jsonify({
         "success": True,
-        "message": "Password changed successfully"
+        "message": "Password changed successfully",
+        **session_tokens(user_id)
     }), 200 
\ No newline at end of file
@@ -0,0 +1,108 @@
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+from PIL import Image
+
+# Thumbnail widths that can be requested; anything else is rejected
+THUMBNAIL_SIZES = (128, 320, 640)
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobStore:
+    """Content-addressed image store on local disk.
+
+    Blobs are keyed by the SHA-256 of their bytes, so identical photos uploaded
+    by different reports or users are stored once. Thumbnails are generated on
+    first request and cached next to the originals.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or os.getenv(
+            "BLOB_STORE_DIR",
+            os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "blobs"),
+        )
+        # One lock per (digest, size) being generated, with its waiter count,
+        # so only requests for the same thumbnail wait for each other
+        self._thumb_locks = {}
+        self._thumb_locks_lock = threading.Lock()
+
+    @staticmethod
+    def is_digest(value):
+        return bool(value) and bool(_DIGEST_RE.match(value))
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, "sha256", digest[:2], digest[2:4], digest)
+
+    def thumbnail_path(self, digest, size):
+        return os.path.join(self.root, "thumbs", str(size), digest[:2], digest[2:4], f"{digest}.jpg")
+
+    def exists(self, digest):
+        return self.is_digest(digest) and os.path.exists(self.blob_path(digest))
+
+    def put(self, data):
+        """Store bytes and return their SHA-256 hex digest.
+
+        Writes go to a temporary file that is atomically renamed into place, so
+        concurrent uploads of the same photo never expose a partial blob.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            return digest
+
+        self._write_atomic(path, data)
+        return digest
+
+    def thumbnail(self, digest, size):
+        """Return the path of a cached JPEG thumbnail, generating it if needed."""
+        if size not in THUMBNAIL_SIZES:
+            raise ValueError(f"Unsupported thumbnail size: {size}")
+        if not self.exists(digest):
+            raise FileNotFoundError(digest)
+
+        path = self.thumbnail_path(digest, size)
+        if os.path.exists(path):
+            return path
+
+        key = (digest, size)
+        with self._thumb_locks_lock:
+            entry = self._thumb_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                if os.path.exists(path):
+                    return path
+                with Image.open(self.blob_path(digest)) as img:
+                    img.draft("RGB", (size, size))
+                    img = img.convert("RGB")
+                    img.thumbnail((size, size))
+                    buf = io.BytesIO()
+                    img.save(buf, "JPEG", quality=85, optimize=True)
+                self._write_atomic(path, buf.getvalue())
+            return path
+        finally:
+            with self._thumb_locks_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._thumb_locks[key]
+
+    @staticmethod
+    def _write_atomic(path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+blob_store = BlobStore()
@@ -0,0 +1,130 @@
+import copy
+
+# IMPORTANT: Order must match the original training data order exactly
+CATEGORIES = ["Anthracnose", "Die Back", "Healthy", "Non_Mango", "Powdery Mildew", "Sooty Mould"]
+
+# Disease information dictionary with symptoms and recommendations
+DISEASE_INFO = {
+    'anthracnose': {
+        'name': 'Anthracnose',
+        'symptoms': [
+            'Small, dark, sunken spots on leaves, stems, flowers, and fruits',
+            'Leaf spots that enlarge and coalesce',
+            'Fruit spots that develop into sunken lesions',
+            'Brown to black lesions with pink, salmon, or orange spore masses in humid conditions'
+        ],
+        'recommendations': [
+            'Remove and destroy infected plant parts',
+            'Apply fungicides as preventative treatment',
+            'Improve air circulation by proper spacing and pruning',
+            'Avoid overhead irrigation to reduce leaf wetness'
+        ],
+        'probability': 0.0
+    },
+    'die_back': {
+        'name': 'Die Back',
+        'symptoms': [
+            'Progressive death of shoots, branches, and twigs',
+            'Browning of leaves that remain attached',
+            'Internal wood discoloration',
+            'Cankers on stems and branches'
+        ],
+        'recommendations': [
+            'Prune infected parts several inches below visible symptoms',
+            'Apply fungicides during dormant season',
+            'Maintain tree vigor with proper fertilization',
+            'Avoid stress conditions like drought'
+        ],
+        'probability': 0.0
+    },
+    'healthy': {
+        'name': 'Healthy',
+        'symptoms': [
+            'Vibrant green leaves without spots or discoloration',
+            'Even leaf growth and development',
+            'No visible lesions or abnormalities',
+            'Healthy fruit development'
+        ],
+        'recommendations': [
+            'Continue regular fertilization and watering practices',
+            'Monitor for early signs of disease',
+            'Maintain good air circulation',
+            'Apply preventative treatments during high-risk seasons'
+        ],
+        'probability': 0.0
+    },
+    'non_mango': {
+        'name': 'Not a Mango Image',
+        'symptoms': [
+            'This is not a mango leaf or fruit image',
+            'The system cannot identify diseases in non-mango plants',
+            'The image may be blurry, poorly lit, or showing other objects/plants'
+        ],
+        'recommendations': [
+            'Please take a clear, well-lit picture of a mango leaf or fruit',
+            'Crop the image to show only the mango part you want to analyze',
+            'Ensure the mango leaf or fruit fills most of the frame',
+            'Avoid including other plants or objects in the image',
+            'If using a camera, hold steady and focus on the mango part'
+        ],
+        'probability': 0.0
+    },
+    'powdery_mildew': {
+        'name': 'Powdery Mildew',
+        'symptoms': [
+            'White or grayish powdery coating on leaves and fruits',
+            'Stunted or distorted new growth',
+            'Premature leaf drop',
+            'Reduced fruit size and quality'
+        ],
+        'recommendations': [
+            'Apply sulfur or potassium bicarbonate-based fungicides',
+            'Improve air circulation by proper spacing and pruning',
+            'Remove and destroy infected leaves',
+            'Apply preventative treatments during susceptible periods'
+        ],
+        'probability': 0.0
+    },
+    'sooty_mould': {
+        'name': 'Sooty Mould',
+        'symptoms': [
+            'Black, sooty or powdery coating on leaves and stems',
+            'Sticky honeydew on plant surfaces',
+            'Presence of insects like aphids, scale, or whiteflies',
+            'Reduced plant vigor due to decreased photosynthesis'
+        ],
+        'recommendations': [
+            'Control sap-sucking insects that produce honeydew',
+            'Wash affected leaves with mild soap solution',
+            'Apply insecticidal soap or horticultural oil',
+            'Maintain proper plant nutrition and watering'
+        ],
+        'probability': 0.0
+    }
+}
+
+
+def describe_prediction(predicted_class, probability):
+    """Build the /predict response body for a predicted class.
+
+    Returns a fresh copy, so concurrent requests never share (or overwrite)
+    the catalog entry's probability.
+    """
+    entry = DISEASE_INFO.get(predicted_class.lower().replace(" ", "_"))
+    if entry is not None:
+        result = copy.deepcopy(entry)
+    else:
+        # Generic response if the disease is not in our database
+        result = {
+            'name': predicted_class,
+            'symptoms': ['Please consult a plant pathologist for detailed symptoms'],
+            'recommendations': ['Consult with a plant pathologist for proper treatment'],
+        }
+    result['probability'] = probability
+
+    # Add the class name for backward compatibility
+    result['prediction'] = predicted_class
+    result['class'] = predicted_class
+    result['disease'] = predicted_class
+    result['disease_name'] = result['name']
+    return result
@@ -0,0 +1,119 @@
+import os
+import threading
+from collections import OrderedDict
+from app.services.perceptual_hash import MultiIndexHashTable, to_unsigned
+
+# What happens to a report whose photo is a near-duplicate of an earlier one by
+# the same user at the same location:
+#   flag   store it with duplicate_of set; it is left out of the stats (default)
+#   merge  do not store it; the existing report is returned instead
+#   off    no duplicate detection
+POLICIES = ('flag', 'merge', 'off')
+
+
+class _UserHashes:
+    def __init__(self, radius):
+        self.radius = radius
+        self.by_location = {}
+        self.newest_id = None
+        self.lock = threading.Lock()
+
+    def add(self, location_key, phash, report_id):
+        table = self.by_location.get(location_key)
+        if table is None:
+            table = self.by_location[location_key] = MultiIndexHashTable(self.radius)
+        table.add(phash, report_id)
+
+
+class DuplicateReportDetector:
+    """Per-process index of report photo hashes, scoped by user and location.
+
+    A user's hashes are loaded from MongoDB the first time they sync and then
+    topped up with reports created since the newest one seen. Reports created
+    by other workers are picked up that way too. Lookups themselves are
+    in-memory multi-index hash probes. Users are evicted least recently used
+    beyond ``max_users``.
+
+    The caller does the database I/O, using ``rows_query`` and ``ingest``,
+    so the same detector serves the Flask (pymongo) and Quart (motor) routes.
+    """
+
+    def __init__(self, radius=None, max_users=None, policy=None):
+        self.radius = int(radius if radius is not None else os.getenv('DUPLICATE_HASH_RADIUS', 6))
+        self.max_users = int(max_users or os.getenv('DUPLICATE_CACHE_USERS', 10000))
+        self.policy = (policy or os.getenv('DUPLICATE_REPORT_POLICY', 'flag')).lower()
+        if self.policy not in POLICIES:
+            raise ValueError(f"DUPLICATE_REPORT_POLICY must be one of {POLICIES}")
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.policy != 'off'
+
+    @staticmethod
+    def location_key(location):
+        return ' '.join((location or '').lower().split())
+
+    def _user(self, user_id):
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is None:
+                state = self._users[user_id] = _UserHashes(self.radius)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            return state
+
+    def rows_query(self, user_id):
+        """Filter and projection for the user's reports not yet in the index."""
+        # Flagged duplicates are not indexed, so new copies point at the original
+        query = {'user': user_id, 'image_phash': {'$ne': None}, 'duplicate_of': None, 'deleted': {'$ne': True}}
+        newest_id = self._user(user_id).newest_id
+        if newest_id is not None:
+            query['_id'] = {'$gt': newest_id}
+        return query, {'_id': 1, 'image_phash': 1, 'location': 1}
+
+    def ingest(self, user_id, rows):
+        state = self._user(user_id)
+        with state.lock:
+            for row in rows:
+                state.add(self.location_key(row.get('location')), to_unsigned(row['image_phash']), row['_id'])
+                if state.newest_id is None or row['_id'] > state.newest_id:
+                    state.newest_id = row['_id']
+
+    def candidates(self, user_id, location, phash):
+        """Ids of the user's reports at ``location`` with a near-identical photo, nearest first."""
+        state = self._user(user_id)
+        with state.lock:
+            table = state.by_location.get(self.location_key(location))
+            return [report_id for _, report_id in table.query(phash)] if table else []
+
+    def remember(self, user_id, location, phash, report_id):
+        """Index a report this process just stored."""
+        state = self._user(user_id)
+        with state.lock:
+            state.add(self.location_key(location), phash, report_id)
+
+    def forget(self, user_id, location, report_id):
+        state = self._user(user_id)
+        with state.lock:
+            table = state.by_location.get(self.location_key(location))
+            if table is not None:
+                table.remove(report_id)
+
+    def find_duplicate(self, collection, user_id, location, phash):
+        """Blocking lookup through a pymongo collection; returns the original report id or None."""
+        if not self.enabled or phash is None:
+            return None
+        query, projection = self.rows_query(user_id)
+        self.ingest(user_id, collection.find(query, projection))
+        ids = self.candidates(user_id, location, phash)
+        if not ids:
+            return None
+        # Another worker may have deleted the original since it was indexed
+        live = {doc['_id'] for doc in collection.find({'_id': {'$in': ids}, 'deleted': {'$ne': True}}, {'_id': 1})}
+        return next((report_id for report_id in ids if report_id in live), None)
+
+
+duplicate_detector = DuplicateReportDetector()
@@ -1,24 +1,81 @@
-from flask_mail import Message
-from app import mail
+import os
+import smtplib
+from flask_mail import Message, Connection
 from flask import render_template, current_app
+from app.utils.resilience import call
+
+def is_transient_smtp_error(error):
+    """Connection problems, timeouts and 4xx replies; a later attempt may succeed."""
+    if isinstance(error, smtplib.SMTPConnectError):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPException):
+        return isinstance(error, smtplib.SMTPServerDisconnected)
+    return isinstance(error, OSError)
+
+class _TimedConnection(Connection):
+    """flask-mail connection whose socket honours MAIL_TIMEOUT.
+
+    flask-mail opens smtplib.SMTP without a timeout, so a stalled relay
+    would otherwise hold the worker indefinitely.
+    """
+    
+    def configure_host(self):
+        timeout = current_app.config["MAIL_TIMEOUT"]
+        if self.mail.use_ssl:
+            host = smtplib.SMTP_SSL(self.mail.server, self.mail.port, timeout=timeout)
+        else:
+            host = smtplib.SMTP(self.mail.server, self.mail.port, timeout=timeout)
+        
+        host.set_debuglevel(int(self.mail.debug))
+        
+        if self.mail.use_tls:
+            host.starttls()
+        if self.mail.username and self.mail.password:
+            host.login(self.mail.username, self.mail.password)
+        
+        return host
 
 class EmailService:
     """Service for sending emails."""
     
+    @staticmethod
+    def _deliver(msg):
+        with _TimedConnection(current_app.extensions["mail"]) as connection:
+            msg.send(connection)
+    
     @staticmethod
     def send_email(to, subject, template, **kwargs):
-        """Send an email."""
+        """Send an email through the "smtp" circuit breaker.
+        
+        Transient failures are retried (SMTP_RETRIES, default 2) with jittered
+        backoff within SMTP_DEADLINE_SECONDS. While the relay is down, sends fail
+        at once with CircuitOpenError.
+        """
         msg = Message(
             subject,
             recipients=[to],
             html=template,
             sender=current_app.config["MAIL_DEFAULT_SENDER"]
         )
-        mail.send(msg)
+        call(
+            "smtp", EmailService._deliver, msg,
+            retries=int(os.getenv("SMTP_RETRIES", 2)),
+            retry_on=is_transient_smtp_error,
+            timeout=float(os.getenv("SMTP_DEADLINE_SECONDS", 20)),
+            base_delay=0.5,
+        )
     
     @staticmethod
     def send_otp_email(to, otp_code):
         """Send an OTP verification email."""
+        subject, template = EmailService.build_otp_email(otp_code)
+        EmailService.send_email(to, subject, template)
+    
+    @staticmethod
+    def build_otp_email(otp_code):
+        """Build the subject and HTML body of an OTP verification email."""
         subject = "Verify Your Email - Sorghum Disease Identifier App"
         
         # Email template as HTML string since we don't have templates folder set up
@@ -61,11 +118,17 @@ class EmailService:
         </html>
         """
         
-        EmailService.send_email(to, subject, template)
+        return subject, template
     
     @staticmethod
     def send_password_reset_email(to, reset_link):
         """Send a password reset email."""
+        subject, template = EmailService.build_password_reset_email(reset_link)
+        EmailService.send_email(to, subject, template)
+    
+    @staticmethod
+    def build_password_reset_email(reset_link):
+        """Build the subject and HTML body of a password reset email."""
         subject = "Reset Your Password - Sorghum Disease Identifier App"
         
         template = f"""
@@ -106,4 +169,4 @@ class EmailService:
         </html>
         """
         
-        EmailService.send_email(to, subject, template) 
\ No newline at end of file
+        return subject, template
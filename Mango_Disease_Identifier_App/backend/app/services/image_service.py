@@ -0,0 +1,190 @@
+import hashlib
+import io
+import os
+import numpy as np
+from PIL import Image
+
+# Input size the classifier was trained on
+MODEL_INPUT_SIZE = (320, 320)
+
+# Size of a raw uint8 RGB tensor upload (320 x 320 x 3)
+RAW_TENSOR_BYTES = MODEL_INPUT_SIZE[0] * MODEL_INPUT_SIZE[1] * 3
+
+# Room for multipart boundaries, part headers and small form fields
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Magic byte signatures, checked in order against the start of the upload
+_SIGNATURES = [
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+]
+
+# ISO-BMFF brands used by HEIC/HEIF/AVIF photos from phones
+_HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1", b"avif"}
+
+
+class ImageValidationError(Exception):
+    """Raised when an upload is rejected before or during decoding."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class ImageService:
+    """Service for validating uploads and turning them into model inputs."""
+
+    @staticmethod
+    def max_upload_bytes():
+        return int(os.getenv("MAX_IMAGE_UPLOAD_BYTES", 10 * 1024 * 1024))
+
+    @staticmethod
+    def max_request_bytes():
+        """Largest request body a single-image upload can need."""
+        return max(ImageService.max_upload_bytes(), RAW_TENSOR_BYTES) + MULTIPART_OVERHEAD_BYTES
+
+    @staticmethod
+    def check_request_length(content_length, max_bytes=None):
+        """Refuse a request whose declared length cannot hold an acceptable upload.
+
+        Call it before touching ``request.files``, which parses the whole body.
+        """
+        max_bytes = max_bytes or ImageService.max_upload_bytes()
+        if content_length is not None and content_length > max_bytes + MULTIPART_OVERHEAD_BYTES:
+            raise ImageValidationError(f"Upload exceeds the {max_bytes} byte limit", 413)
+
+    @staticmethod
+    def max_image_pixels():
+        return int(os.getenv("MAX_IMAGE_PIXELS", 40_000_000))
+
+    @staticmethod
+    def allowed_formats():
+        return set(os.getenv("ALLOWED_IMAGE_FORMATS", "jpeg,png,webp").lower().split(","))
+
+    @staticmethod
+    def sniff_format(header):
+        """Detect the image format from the first bytes of an upload."""
+        for signature, fmt in _SIGNATURES:
+            if header.startswith(signature):
+                return fmt
+        if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+            return "webp"
+        if header[4:8] == b"ftyp" and header[8:12] in _HEIF_BRANDS:
+            return "heic"
+        return None
+
+    @staticmethod
+    def read_upload(file, content_length=None, max_bytes=None):
+        """Read an uploaded file, refusing anything larger than the byte limit.
+
+        The declared request length is checked first so oversized uploads are
+        rejected without reading the body at all.
+        """
+        max_bytes = max_bytes or ImageService.max_upload_bytes()
+        ImageService.check_request_length(content_length, max_bytes)
+
+        data = file.stream.read(max_bytes + 1)
+        if len(data) > max_bytes:
+            raise ImageValidationError(f"Upload exceeds the {max_bytes} byte limit", 413)
+        if not data:
+            raise ImageValidationError("Empty file")
+        return data
+
+    @staticmethod
+    def validate_image(data):
+        """Check format and dimensions from the header, without decoding pixels.
+
+        Returns the sniffed format and the opened (still undecoded) PIL image.
+        """
+        fmt = ImageService.sniff_format(data[:16])
+        if fmt is None:
+            raise ImageValidationError("Unrecognised image format", 415)
+        if fmt not in ImageService.allowed_formats():
+            raise ImageValidationError(f"Unsupported image format: {fmt}", 415)
+
+        max_pixels = ImageService.max_image_pixels()
+        try:
+            # Image.open only parses the header; pixel data is decoded on load()
+            img = Image.open(io.BytesIO(data))
+        except Image.DecompressionBombError:
+            raise ImageValidationError("Image dimensions exceed the pixel limit", 413)
+        except Exception:
+            raise ImageValidationError("Corrupt or truncated image")
+
+        width, height = img.size
+        if width <= 0 or height <= 0:
+            raise ImageValidationError("Invalid image dimensions")
+        if width * height > max_pixels:
+            raise ImageValidationError(
+                f"Image is {width}x{height}; the limit is {max_pixels} pixels", 413
+            )
+        return fmt, img
+
+    @staticmethod
+    def to_model_input(img):
+        """Decode a validated PIL image into a (1, 320, 320, 3) float32 batch.
+
+        Images that the client already resized to the model input size skip
+        the resize step entirely.
+        """
+        if img.format == "JPEG" and os.getenv("IMAGE_JPEG_DRAFT", "false").lower() == "true":
+            # Let libjpeg downscale by a power of two while decoding large photos
+            img.draft("RGB", MODEL_INPUT_SIZE)
+
+        try:
+            img = img.convert("RGB")
+        except Image.DecompressionBombError:
+            raise ImageValidationError("Image dimensions exceed the pixel limit", 413)
+        except Exception:
+            raise ImageValidationError("Corrupt or truncated image")
+
+        if img.size != MODEL_INPUT_SIZE:
+            img = img.resize(MODEL_INPUT_SIZE)
+
+        x = np.asarray(img, dtype=np.float32)
+        return np.expand_dims(x, axis=0)
+
+    @staticmethod
+    def tensor_to_model_input(data):
+        """Turn a raw uint8 RGB 320x320 tensor upload into a model batch."""
+        if len(data) != RAW_TENSOR_BYTES:
+            raise ImageValidationError(
+                f"Raw tensor must be exactly {RAW_TENSOR_BYTES} bytes (320x320x3 uint8)"
+            )
+        x = np.frombuffer(data, dtype=np.uint8).reshape(MODEL_INPUT_SIZE[1], MODEL_INPUT_SIZE[0], 3)
+        return np.expand_dims(x.astype(np.float32), axis=0)
+
+    @staticmethod
+    def load_upload(files, content_length=None):
+        """Validate a predict upload and return the model input batch and upload digest.
+
+        Accepts either an encoded image in the ``image`` field or a raw
+        pre-resized uint8 tensor in the ``tensor`` field. The digest is the
+        SHA-256 of the uploaded bytes, matching the blob store's addressing.
+        """
+        if "tensor" in files:
+            data = ImageService.read_upload(
+                files["tensor"], content_length, max_bytes=RAW_TENSOR_BYTES
+            )
+            return ImageService.tensor_to_model_input(data), hashlib.sha256(data).hexdigest()
+
+        if "image" not in files:
+            raise ImageValidationError("No image uploaded")
+
+        file = files["image"]
+        if not file or not file.filename:
+            raise ImageValidationError("Empty file or invalid filename")
+
+        data = ImageService.read_upload(file, content_length)
+        _, img = ImageService.validate_image(data)
+        return ImageService.to_model_input(img), hashlib.sha256(data).hexdigest()
+
+
+# Let PIL enforce the same pixel ceiling on any decode path we don't gate
+Image.MAX_IMAGE_PIXELS = ImageService.max_image_pixels()
@@ -0,0 +1,40 @@
+"""Inference component: the model registry, the /predict routes and the job scheduler.
+
+Nothing here imports TensorFlow at module level. The framework is only
+imported when a model is first loaded: at startup when ``preload`` is set,
+otherwise on the first prediction. Processes started in ``api`` mode never
+call init_inference and so never pay for TensorFlow.
+"""
+import os
+
+# Must be set before TensorFlow is first imported
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+
+from app.services.disease_catalog import CATEGORIES
+from app.services.inference_tuning import apply_environment, load_profile
+from app.services.model_registry import ModelRegistry
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'model')
+
+def init_inference(app, preload=False, warm_up=True):
+    """Attach the model registry and the prediction routes to an app.
+
+    Pass ``warm_up=False`` when preloading in a process that will fork; the
+    workers then warm up the model after the fork (ModelRegistry.warm_up).
+    """
+    # Thread and oneDNN settings tuned for this host, applied before TensorFlow loads
+    profile = load_profile()
+    apply_environment(profile)
+
+    registry = ModelRegistry(MODEL_DIR, CATEGORIES, thread_profile=profile)
+    registry.init_app(app)
+
+    from app.services.prediction_jobs import PredictionJobScheduler
+    app.extensions["prediction_jobs"] = PredictionJobScheduler(registry)
+
+    from app.routes.predict_routes import inference
+    app.register_blueprint(inference)
+
+    if preload:
+        registry.ensure_loaded(warm_up=warm_up)
+    return registry
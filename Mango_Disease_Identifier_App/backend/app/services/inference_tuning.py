@@ -0,0 +1,116 @@
+"""Host-specific TensorFlow threading profile for inference workers.
+
+``python -m scripts.tune_inference`` measures the classifier on this host
+and writes a profile (INFERENCE_PROFILE, default model/inference_profile.json)::
+
+    {"workers": 2, "intra_op_threads": 4, "inter_op_threads": 1,
+     "onednn": true, "batch_size": 8, "pin_workers": true,
+     "cpu_sets": [[0, 1, 2, 3], [4, 5, 6, 7]], ...}
+
+At startup the profile sets the oneDNN/OpenMP environment before TensorFlow
+is imported, and the thread pools before the first model load. Under
+gunicorn it also sets the default worker count and pins each worker to its
+own core set. Without a profile, TensorFlow's defaults are left alone.
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "model", "inference_profile.json"
+)
+
+_tensorflow_configured = False
+
+
+def profile_path():
+    return os.getenv("INFERENCE_PROFILE", DEFAULT_PROFILE_PATH)
+
+
+def available_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS
+        return list(range(os.cpu_count() or 1))
+
+
+def load_profile(path=None):
+    """The tuned profile, or None if there is none (or it is disabled with INFERENCE_PROFILE=off)."""
+    path = path or profile_path()
+    if path.lower() == "off":
+        return None
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        logger.error(f"Ignoring unreadable inference profile {path}: {e}")
+        return None
+
+    tuned_cpus = profile.get("host", {}).get("cpus")
+    if tuned_cpus and tuned_cpus != len(available_cpus()):
+        logger.warning(
+            "Inference profile %s was tuned on %s CPUs but %s are available; re-run scripts.tune_inference",
+            path, tuned_cpus, len(available_cpus()),
+        )
+    return profile
+
+
+def save_profile(profile, path=None):
+    path = path or profile_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def apply_environment(profile):
+    """Set oneDNN and OpenMP variables; only effective before TensorFlow is imported.
+
+    Explicitly set environment variables win over the profile.
+    """
+    if not profile:
+        return
+    os.environ.setdefault("TF_ENABLE_ONEDNN_OPTS", "1" if profile.get("onednn", True) else "0")
+    if profile.get("intra_op_threads"):
+        os.environ.setdefault("OMP_NUM_THREADS", str(profile["intra_op_threads"]))
+
+
+def configure_tensorflow(profile):
+    """Size TensorFlow's thread pools; must run before the first op executes."""
+    global _tensorflow_configured
+    if not profile or _tensorflow_configured:
+        return
+    import tensorflow as tf
+
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(int(profile.get("intra_op_threads", 0)))
+        tf.config.threading.set_inter_op_parallelism_threads(int(profile.get("inter_op_threads", 0)))
+        _tensorflow_configured = True
+    except RuntimeError as e:
+        # The runtime was already initialized (e.g. by another import); keep its pools
+        logger.warning(f"Could not apply inference thread profile: {e}")
+
+
+def cpu_sets(workers, threads_per_worker, cpus=None):
+    """Split the CPUs into one disjoint set per worker (wrapping if there are too few)."""
+    cpus = cpus or available_cpus()
+    size = max(1, min(threads_per_worker, len(cpus)))
+    return [
+        [cpus[(slot * size + i) % len(cpus)] for i in range(size)]
+        for slot in range(workers)
+    ]
+
+
+def pin_to_cpus(cpus):
+    """Restrict this process (and threads it creates later) to ``cpus``."""
+    try:
+        os.sched_setaffinity(0, cpus)
+        return True
+    except (AttributeError, OSError) as e:
+        logger.warning(f"Could not pin process {os.getpid()} to CPUs {cpus}: {e}")
+        return False
@@ -0,0 +1,252 @@
+"""Per-process memory tracking: RSS samples, growth rate and tracemalloc snapshots.
+
+A background thread samples RSS every MEMORY_SAMPLE_SECONDS (default 60)
+and keeps the last MEMORY_SAMPLE_HISTORY samples (default 120). From those
+it reports growth in MB per hour and per 1000 requests. tracemalloc is off
+by default, because tracing every allocation slows Python code down. Turn it
+on with MEMORY_TRACEMALLOC=True, or for one worker through the admin API.
+While it is on, the thread also takes a snapshot at every sample and diffs
+it with the previous one, so status() lists the allocation sites that grew
+in each recent interval. Periodic snapshots and those taken through the
+admin API are kept in separate rings of the last MEMORY_SNAPSHOT_KEEP
+(default 5) each, so the sampler never evicts a snapshot an operator is
+about to diff. Ids come from one sequence across both. The diffs keep the
+same number.
+
+Workers are recycled on an RSS ceiling by gunicorn.conf.py, which uses
+current_rss_bytes() from here.
+"""
+import gc
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+MB = 1024 * 1024
+
+
+def current_rss_bytes():
+    """Resident set size of this process; the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _slope(points):
+    """Least-squares slope of y over x, or None with fewer than two distinct x values."""
+    if len(points) < 2:
+        return None
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+def _stat_row(stat):
+    frame = stat.traceback[0]
+    row = {"location": f"{frame.filename}:{frame.lineno}", "size_kb": round(stat.size / 1024, 1),
+           "count": stat.count}
+    if hasattr(stat, "size_diff"):
+        row.update(size_diff_kb=round(stat.size_diff / 1024, 1), count_diff=stat.count_diff)
+    return row
+
+
+class MemoryMonitor:
+    def __init__(self, interval=None, history=None, keep_snapshots=None):
+        self.interval = interval or float(os.getenv("MEMORY_SAMPLE_SECONDS", 60))
+        self.samples = deque(maxlen=history or int(os.getenv("MEMORY_SAMPLE_HISTORY", 120)))
+        self.keep_snapshots = keep_snapshots or int(os.getenv("MEMORY_SNAPSHOT_KEEP", 5))
+        self.requests = 0
+        self._snapshots = OrderedDict()
+        self._periodic = OrderedDict()
+        self.diffs = deque(maxlen=self.keep_snapshots)
+        self._snapshot_seq = 0
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pid = None
+
+    def ensure_running(self):
+        """Start the sampling thread once per process (threads do not survive fork)."""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            # Concurrent admin requests must not each start a sampler
+            if self._pid == os.getpid():
+                return
+            self.samples.clear()
+            self._snapshots.clear()
+            self._periodic.clear()
+            self.diffs.clear()
+            self.requests = 0
+            if os.getenv("MEMORY_TRACEMALLOC", "False").lower() == "true":
+                self.set_tracing(True)
+            self.sample()
+            threading.Thread(target=self._run, name="memory-monitor", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sample()
+                if tracemalloc.is_tracing():
+                    self.record_growth()
+            except Exception as e:
+                logger.error(f"Memory sampling error: {e}")
+
+    def count_request(self, response=None):
+        self.requests += 1
+        return response
+
+    def sample(self):
+        entry = {"at": time.time(), "rss_bytes": current_rss_bytes(), "requests": self.requests}
+        if tracemalloc.is_tracing():
+            entry["traced_bytes"] = tracemalloc.get_traced_memory()[0]
+        self.samples.append(entry)
+        return entry
+
+    def growth(self):
+        samples = list(self.samples)
+        per_second = _slope([(s["at"], s["rss_bytes"]) for s in samples])
+        per_request = _slope([(s["requests"], s["rss_bytes"]) for s in samples])
+        return {
+            "mb_per_hour": None if per_second is None else round(per_second * 3600 / MB, 2),
+            "mb_per_1000_requests": None if per_request is None else round(per_request * 1000 / MB, 2),
+            "window_seconds": round(samples[-1]["at"] - samples[0]["at"]) if samples else 0,
+        }
+
+    # -- tracemalloc -----------------------------------------------------
+
+    def set_tracing(self, enabled, frames=None):
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start(frames or int(os.getenv("MEMORY_TRACEMALLOC_FRAMES", 1)))
+        elif not enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+            with self._lock:
+                # Snapshots from a stopped trace cannot be compared with new ones
+                self._snapshots.clear()
+                self._periodic.clear()
+                self.diffs.clear()
+        return tracemalloc.is_tracing()
+
+    def take_snapshot(self, limit=20):
+        """Record a tracemalloc snapshot and return its id with the top allocation sites."""
+        return self.describe_snapshot(self._record_snapshot(), limit)
+
+    def _record_snapshot(self, periodic=False):
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not enabled in this process")
+        # Leave out garbage that is merely waiting for a collection
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        ring = self._periodic if periodic else self._snapshots
+        with self._lock:
+            self._snapshot_seq += 1
+            snapshot_id = self._snapshot_seq
+            ring[snapshot_id] = (time.time(), current_rss_bytes(), snapshot)
+            while len(ring) > self.keep_snapshots:
+                ring.popitem(last=False)
+        return snapshot_id
+
+    def record_growth(self, limit=10):
+        """Snapshot now and keep the diff with the previous periodic snapshot, if there is one."""
+        with self._lock:
+            previous = next(reversed(self._periodic), None)
+        snapshot_id = self._record_snapshot(periodic=True)
+        if previous is None:
+            return None
+        try:
+            diff = self.diff(previous, snapshot_id, limit)
+        except KeyError:
+            # Tracing was restarted, or the buffer rotated, in between
+            return None
+        self.diffs.append(diff)
+        return diff
+
+    def _snapshot(self, snapshot_id):
+        with self._lock:
+            for ring in (self._snapshots, self._periodic):
+                if snapshot_id in ring:
+                    return ring[snapshot_id]
+            raise KeyError(f"Unknown snapshot {snapshot_id}; kept: {list(self._snapshots)}, "
+                           f"periodic: {list(self._periodic)}")
+
+    def describe_snapshot(self, snapshot_id, limit=20):
+        taken_at, rss, snapshot = self._snapshot(snapshot_id)
+        stats = snapshot.statistics("lineno")
+        return {
+            "id": snapshot_id,
+            "taken_at": taken_at,
+            "rss_mb": round(rss / MB, 1),
+            "traced_mb": round(sum(stat.size for stat in stats) / MB, 1),
+            "top": [_stat_row(stat) for stat in stats[:limit]],
+        }
+
+    def diff(self, old_id, new_id, limit=20):
+        """Allocation sites that grew the most between two snapshots."""
+        old_at, old_rss, old = self._snapshot(old_id)
+        new_at, new_rss, new = self._snapshot(new_id)
+        stats = new.compare_to(old, "lineno")
+        return {
+            "from": old_id,
+            "to": new_id,
+            "seconds": round(new_at - old_at, 1),
+            "rss_diff_mb": round((new_rss - old_rss) / MB, 1),
+            "traced_diff_mb": round(sum(stat.size_diff for stat in stats) / MB, 1),
+            "top": [_stat_row(stat) for stat in stats[:limit]],
+        }
+
+    def status(self):
+        latest = self.samples[-1] if self.samples else self.sample()
+        ceiling = int(os.getenv("WORKER_MAX_RSS_MB", 0))
+        with self._lock:
+            snapshots = list(self._snapshots)
+            periodic = list(self._periodic)
+        return {
+            "pid": os.getpid(),
+            "rss_mb": round(current_rss_bytes() / MB, 1),
+            "peak_rss_mb": round(peak_rss_bytes() / MB, 1),
+            "rss_ceiling_mb": ceiling or None,
+            "requests": self.requests,
+            "growth": self.growth(),
+            "tracemalloc": tracemalloc.is_tracing(),
+            "traced_mb": round(tracemalloc.get_traced_memory()[0] / MB, 1) if tracemalloc.is_tracing() else None,
+            "snapshots": snapshots,
+            "periodic_snapshots": periodic,
+            "diffs": list(self.diffs),
+            "samples": [dict(s, rss_mb=round(s["rss_bytes"] / MB, 1)) for s in list(self.samples)[-20:]],
+            "last_sample_at": latest["at"],
+        }
+
+
+memory_monitor = MemoryMonitor()
+
+
+def init_memory_monitor(app):
+    """Count requests for the per-request growth rate."""
+    app.after_request(memory_monitor.count_request)
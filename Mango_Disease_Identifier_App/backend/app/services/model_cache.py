@@ -0,0 +1,303 @@
+"""On-disk cache of serving-ready models, for fast cold starts.
+
+``tf.keras.models.load_model`` unpacks the .keras archive, rebuilds every
+layer and traces the call graph again in each new process. The cache stores
+the model once as a SavedModel whose serving signature is already traced:
+probabilities plus, when the model has one, the penultimate-layer embedding.
+Loading it restores that graph directly.
+
+Entries live under MODEL_CACHE_DIR (default model/cache), one directory per
+``<sha256 of the .keras file>-tf<TensorFlow version>``. A retrained model or
+a TensorFlow upgrade therefore never reuses a stale entry. The digest of a
+.keras file is remembered under ``sources/`` with its size and mtime, so it is
+only recomputed when the file changes. A missing or unreadable entry falls
+back to the .keras file. Only an entry whose manifest does not match its
+source, or that lacks the serving signature, is deleted; a load that fails
+for any other reason may be transient and leaves it for the other workers.
+
+After such a fallback, a serving worker (never the preloading gunicorn
+master, which must not start threads before it forks) rebuilds the entry in
+the background, unless MODEL_CACHE_BUILD_ON_MISS=False. A lock file makes
+one worker per host do it. ``python -m scripts.prepare_model_cache`` builds
+entries ahead of time, e.g. in the image build. MODEL_CACHE=False turns the
+cache off.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "model", "cache"
+)
+MANIFEST = "manifest.json"
+INPUT_SHAPE = (320, 320, 3)
+# A build lock older than this is left over from a crashed process
+STALE_LOCK_SECONDS = 600
+
+
+def enabled():
+    return os.getenv("MODEL_CACHE", "True").lower() == "true"
+
+
+def cache_dir():
+    return os.getenv("MODEL_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def entry_key(source_sha256, tf_version):
+    return f"{source_sha256[:24]}-tf{tf_version}"
+
+
+def serving_module(model):
+    """A tf.Module with one traced signature returning named probabilities and, if present, the embedding."""
+    import tensorflow as tf
+    from app.services.model_registry import build_embedding_model
+
+    embedding_model = build_embedding_model(model)
+    module = tf.Module()
+    module.model = model
+    module.embedding_model = embedding_model
+
+    @tf.function(input_signature=[tf.TensorSpec((None,) + INPUT_SHAPE, tf.float32, name="image")])
+    def serve(image):
+        outputs = {"probabilities": model(image, training=False)}
+        if embedding_model is not None:
+            outputs["embedding"] = embedding_model(image, training=False)
+        return outputs
+
+    module.serve = serve
+    return module, embedding_model is not None
+
+
+class CachedModelVersion:
+    """Same interface as model_registry.ModelVersion, backed by a cached SavedModel."""
+
+    def __init__(self, version, path, categories, saved_model, manifest):
+        self.version = version
+        self.path = path
+        self.categories = categories
+        self.manifest = manifest
+        self.cache_path = manifest["cache_path"]
+        self.has_embedding = "embedding" in manifest["outputs"]
+        self.loaded_at = time.time()
+        # Keep the restored object alive; the signature only references it weakly
+        self._saved_model = saved_model
+        self._serve = saved_model.signatures["serving_default"]
+
+    def _run(self, x):
+        import tensorflow as tf
+
+        return self._serve(image=tf.constant(x, dtype=tf.float32))
+
+    def predict(self, x):
+        return self._run(x)["probabilities"].numpy()
+
+    def embed(self, x):
+        """Penultimate-layer embeddings for a batch, shape (batch, features)."""
+        if not self.has_embedding:
+            raise ValueError(f"Model {self.version} has no embedding layer")
+        return self._run(x)["embedding"].numpy()
+
+
+class ModelCache:
+    def __init__(self, root=None):
+        self.root = root or cache_dir()
+        self._building = set()
+        self._lock = threading.Lock()
+        # abspath -> (size, mtime_ns, sha256)
+        self._digests = {}
+
+    def source_digest(self, source_path):
+        """sha256 of a .keras file, recomputed only when its size or mtime changes."""
+        path = os.path.abspath(source_path)
+        stat = os.stat(path)
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        known = self._digests.get(path)
+        if known and known[:2] == stamp:
+            return known[2]
+        record_path = os.path.join(self.root, "sources", hashlib.sha256(path.encode("utf-8")).hexdigest()[:24] + ".json")
+        try:
+            with open(record_path) as f:
+                record = json.load(f)
+            if (record["size"], record["mtime_ns"]) == stamp:
+                self._digests[path] = stamp + (record["sha256"],)
+                return record["sha256"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        sha = file_sha256(path)
+        self._digests[path] = stamp + (sha,)
+        try:
+            os.makedirs(os.path.dirname(record_path), exist_ok=True)
+            tmp = f"{record_path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"path": path, "size": stamp[0], "mtime_ns": stamp[1], "sha256": sha}, f)
+            os.replace(tmp, record_path)
+        except OSError as e:
+            logger.warning(f"Could not record the digest of {path}: {e}")
+        return sha
+
+    def entry_path(self, source_path, tf_version=None):
+        """(entry directory, source sha256) for a .keras file under the running TensorFlow."""
+        if tf_version is None:
+            import tensorflow as tf
+
+            tf_version = tf.__version__
+        sha = self.source_digest(source_path)
+        return os.path.join(self.root, entry_key(sha, tf_version)), sha
+
+    def invalidate(self, entry, reason):
+        """Delete an entry that can never be served; renamed first so no reader sees half of it."""
+        logger.error(f"Discarding model cache entry {entry}: {reason}")
+        doomed = f"{entry}.discard-{os.getpid()}"
+        try:
+            os.rename(entry, doomed)
+        except OSError:
+            return
+        shutil.rmtree(doomed, ignore_errors=True)
+
+    def load(self, version, source_path, categories):
+        """The cached model for ``source_path``, or None on a miss or an unusable entry."""
+        import tensorflow as tf
+
+        entry, sha = self.entry_path(source_path, tf.__version__)
+        manifest_path = os.path.join(entry, MANIFEST)
+        if not os.path.isfile(manifest_path):
+            logger.info("No model cache entry for %s at %s", source_path, entry)
+            return None
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            saved_model = None
+            if manifest.get("source_sha256") == sha and manifest.get("tf_version") == tf.__version__:
+                saved_model = tf.saved_model.load(os.path.join(entry, "saved_model"))
+        except Exception as e:
+            # Possibly transient (I/O, memory); the entry stays for the other workers
+            logger.error(f"Could not load model cache entry {entry}; using {source_path}: {e}")
+            return None
+        if saved_model is None:
+            self.invalidate(entry, "manifest does not match the source model")
+            return None
+        if "serving_default" not in saved_model.signatures or "probabilities" not in manifest.get("outputs", ()):
+            self.invalidate(entry, "no serving signature")
+            return None
+        manifest["cache_path"] = entry
+        return CachedModelVersion(version, source_path, categories, saved_model, manifest)
+
+    def build(self, model, source_path, force=False):
+        """Export ``model`` into the cache entry for ``source_path``; returns the entry directory.
+
+        The entry is written to a temporary directory and renamed into place,
+        so concurrent readers never see half of one. A lock file keeps the
+        workers of one host from all building the same entry.
+        """
+        import tensorflow as tf
+
+        entry, sha = self.entry_path(source_path, tf.__version__)
+        if os.path.isfile(os.path.join(entry, MANIFEST)) and not force:
+            return entry
+        os.makedirs(self.root, exist_ok=True)
+        lock_path = f"{entry}.lock"
+        if not self._acquire(lock_path):
+            logger.info("Model cache entry %s is being built by another process", entry)
+            return None
+        tmp_entry = f"{entry}.tmp-{os.getpid()}"
+        try:
+            started = time.perf_counter()
+            module, has_embedding = serving_module(model)
+            tf.saved_model.save(module, os.path.join(tmp_entry, "saved_model"),
+                                signatures={"serving_default": module.serve})
+            manifest = {
+                "source_path": os.path.abspath(source_path),
+                "source_sha256": sha,
+                "source_bytes": os.path.getsize(source_path),
+                "tf_version": tf.__version__,
+                "outputs": ["probabilities", "embedding"] if has_embedding else ["probabilities"],
+                "input_shape": list(INPUT_SHAPE),
+                "built_at": time.time(),
+                "build_seconds": round(time.perf_counter() - started, 2),
+            }
+            with open(os.path.join(tmp_entry, MANIFEST), "w") as f:
+                json.dump(manifest, f, indent=2)
+            if os.path.isdir(entry):
+                shutil.rmtree(entry)
+            os.replace(tmp_entry, entry)
+            logger.info("Built model cache entry %s in %.1fs", entry, manifest["build_seconds"])
+            return entry
+        finally:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+
+    def _acquire(self, lock_path):
+        try:
+            if time.time() - os.path.getmtime(lock_path) > STALE_LOCK_SECONDS:
+                os.remove(lock_path)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def build_in_background(self, model, source_path):
+        """Rebuild a missing entry without delaying the model that is about to serve."""
+        if os.getenv("MODEL_CACHE_BUILD_ON_MISS", "True").lower() != "true":
+            return
+        with self._lock:
+            if source_path in self._building:
+                return
+            self._building.add(source_path)
+
+        def run():
+            try:
+                self.build(model, source_path)
+            except Exception as e:
+                # e.g. a read-only image; the .keras file keeps working
+                logger.error(f"Could not build model cache entry for {source_path}: {e}")
+            finally:
+                with self._lock:
+                    self._building.discard(source_path)
+
+        threading.Thread(target=run, name="model-cache-build", daemon=True).start()
+
+    def entries(self):
+        """Manifests of the complete entries, newest first."""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name, MANIFEST)
+            try:
+                with open(path) as f:
+                    found.append(dict(json.load(f), cache_path=os.path.dirname(path)))
+            except (OSError, ValueError):
+                continue
+        return sorted(found, key=lambda manifest: manifest.get("built_at", 0), reverse=True)
+
+    def prune(self, keep, protect=()):
+        """Remove all but the ``keep`` newest entries and those in ``protect``; returns the removed paths."""
+        removed = []
+        protect = {os.path.abspath(path) for path in protect}
+        for manifest in self.entries()[keep:]:
+            if os.path.abspath(manifest["cache_path"]) in protect:
+                continue
+            shutil.rmtree(manifest["cache_path"], ignore_errors=True)
+            removed.append(manifest["cache_path"])
+        return removed
@@ -0,0 +1,386 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
+from app.services.image_service import ImageService
+from app.services.inference_tuning import configure_tensorflow
+from app.services import model_cache
+from app.services.model_cache import CachedModelVersion, ModelCache
+from app.services.tflite_model import TFLITE_FILENAME, TFLiteModelVersion
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILENAME = "mango_classifier.keras"
+
+
+def build_embedding_model(model):
+    """Wrap ``model`` so it returns the penultimate-layer activations.
+
+    The embedding layer is the last one before the classifier head with a
+    flat (batch, features) output. Dropout is skipped because at inference
+    time it is an identity. Returns None if no such layer exists.
+    """
+    import tensorflow as tf
+
+    for layer in reversed(model.layers[:-1]):
+        if isinstance(layer, tf.keras.layers.Dropout):
+            continue
+        if len(layer.output.shape) == 2:
+            return tf.keras.Model(inputs=model.inputs, outputs=layer.output)
+    return None
+
+
+class ModelVersion:
+    """A loaded, validated model and the metadata that identifies it."""
+
+    def __init__(self, version, path, model, categories, embedding_model=None):
+        self.version = version
+        self.path = path
+        self.model = model
+        self.categories = categories
+        self.embedding_model = embedding_model
+        self.loaded_at = time.time()
+
+    @property
+    def has_embedding(self):
+        return self.embedding_model is not None
+
+    def predict(self, x):
+        return self.model.predict(x, verbose=0)
+
+    def embed(self, x):
+        """Penultimate-layer embeddings for a batch, shape (batch, features)."""
+        if self.embedding_model is None:
+            raise ValueError(f"Model {self.version} has no embedding layer")
+        return self.embedding_model.predict(x, verbose=0)
+
+
+class ModelRegistry:
+    """Versioned model artifacts with zero-downtime hot reload.
+
+    Layout of ``model_dir``::
+
+        registry/<version>/mango_classifier.keras
+        registry/<version>/mango_classifier.tflite   (optional, see app/services/tflite_model.py)
+        registry/<version>/class_names.json   (optional)
+        registry/CURRENT                      (name of the version to serve)
+        golden/<class name>/*.jpg             (images each model must classify)
+        mango_classifier.keras                (legacy artifact, served as "default")
+
+    A reload loads and warms up the new model in a background thread and
+    checks it against the golden set. Only then does it swap the active model,
+    a single reference assignment. Requests that already hold the old model
+    finish on it, and nothing blocks while the new one loads.
+
+    MODEL_FORMAT selects the artifact: ``keras`` (default), ``tflite``, or
+    ``auto`` (the .tflite file when a version has one, otherwise the .keras one).
+    A .keras model is served from its precompiled cache entry when there is
+    one (see app/services/model_cache.py).
+    """
+
+    def __init__(self, model_dir, categories, golden_min_accuracy=None, poll_interval=None, thread_profile=None):
+        self.model_dir = model_dir
+        # Tuned TensorFlow thread settings (see app/services/inference_tuning.py)
+        self.thread_profile = thread_profile
+        self.cache = ModelCache() if model_cache.enabled() else None
+        self.registry_dir = os.path.join(model_dir, "registry")
+        self.golden_dir = os.path.join(model_dir, "golden")
+        self.default_categories = list(categories)
+        self.golden_min_accuracy = float(
+            golden_min_accuracy if golden_min_accuracy is not None
+            else os.getenv("MODEL_GOLDEN_MIN_ACCURACY", 0.95)
+        )
+        self.poll_interval = float(
+            poll_interval if poll_interval is not None else os.getenv("MODEL_REGISTRY_POLL_SECONDS", 10)
+        )
+        self._active = None
+        self._reload_lock = threading.Lock()
+        self._watcher_lock = threading.Lock()
+        self._watcher_pid = None
+        # A failed first load is retried, at most this often, by the next caller
+        self.load_retry_seconds = float(os.getenv("MODEL_LOAD_RETRY_SECONDS", 30))
+        self._next_load_attempt = 0.0
+        self.reload_state = {"state": "idle", "version": None, "error": None, "finished_at": None}
+
+    def init_app(self, app):
+        app.extensions["model_registry"] = self
+
+    # -- artifacts -------------------------------------------------------
+
+    @property
+    def active(self):
+        return self._active
+
+    @property
+    def active_version(self):
+        return self._active.version if self._active else None
+
+    def available_versions(self):
+        if not os.path.isdir(self.registry_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.registry_dir)
+            if os.path.isfile(os.path.join(self.registry_dir, name, MODEL_FILENAME))
+            or os.path.isfile(os.path.join(self.registry_dir, name, TFLITE_FILENAME))
+        )
+
+    def current_pointer(self):
+        """Version named in registry/CURRENT, else the newest one, else the legacy file."""
+        try:
+            with open(os.path.join(self.registry_dir, "CURRENT")) as f:
+                version = f.read().strip()
+            if version:
+                return version
+        except FileNotFoundError:
+            pass
+        versions = self.available_versions()
+        return versions[-1] if versions else "default"
+
+    def set_current_pointer(self, version):
+        """Atomically point registry/CURRENT at a version so every worker picks it up."""
+        os.makedirs(self.registry_dir, exist_ok=True)
+        tmp_path = os.path.join(self.registry_dir, f".CURRENT.{os.getpid()}")
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.registry_dir, "CURRENT"))
+
+    def artifact_path(self, version, fmt="keras"):
+        filename = TFLITE_FILENAME if fmt == "tflite" else MODEL_FILENAME
+        if version == "default":
+            return os.path.join(self.model_dir, filename)
+        return os.path.join(self.registry_dir, version, filename)
+
+    def artifact_format(self, version):
+        fmt = os.getenv("MODEL_FORMAT", "keras").lower()
+        if fmt == "auto":
+            return "tflite" if os.path.isfile(self.artifact_path(version, "tflite")) else "keras"
+        return fmt
+
+    def _categories_for(self, version):
+        path = os.path.join(self.registry_dir, version, "class_names.json")
+        if os.path.isfile(path):
+            with open(path) as f:
+                return json.load(f)
+        return self.default_categories
+
+    # -- loading ---------------------------------------------------------
+
+    def load_version(self, version, warm_up=True):
+        """Load and warm up a version without making it active.
+
+        ``warm_up=False`` only loads it. The preloading gunicorn master uses
+        that: running the graph starts TensorFlow's thread pools, which do not
+        survive fork, so each worker warms up after forking (see warm_up()).
+        """
+        fmt = self.artifact_format(version)
+        path = self.artifact_path(version, fmt)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"No {fmt} model artifact for version {version!r} at {path}")
+
+        if fmt == "tflite":
+            threads = (self.thread_profile or {}).get("intra_op_threads")
+            loaded = TFLiteModelVersion(version, path, self._categories_for(version), num_threads=threads)
+            return self._warm(loaded) if warm_up else loaded
+
+        import tensorflow as tf
+
+        configure_tensorflow(self.thread_profile)
+        if self.cache is not None:
+            loaded = self.cache.load(version, path, self._categories_for(version))
+            if loaded is not None:
+                return self._warm(loaded) if warm_up else loaded
+
+        model = tf.keras.models.load_model(path)
+        loaded = ModelVersion(version, path, model, self._categories_for(version),
+                              embedding_model=build_embedding_model(model))
+
+        return self._warm(loaded) if warm_up else loaded
+
+    def _warm(self, loaded):
+        # The first predict traces the graph, so do it before serving
+        warmup = np.zeros((1, 320, 320, 3), dtype=np.float32)
+        loaded.predict(warmup)
+        if loaded.has_embedding:
+            loaded.embed(warmup)
+        loaded.warmed_pid = os.getpid()
+        return loaded
+
+    def warm_up(self):
+        """Warm up the active model in this process, once; returns it.
+
+        A model served from its .keras file also gets its cache entry rebuilt
+        in the background, here rather than in load_version so that it never
+        happens in the preloading master.
+        """
+        active = self._active
+        if active is not None and getattr(active, "warmed_pid", None) != os.getpid():
+            try:
+                self._warm(active)
+                logger.info("Warmed up model version %s in process %s", active.version, os.getpid())
+            except Exception as e:
+                # The first prediction will try again; a worker must still boot
+                logger.error(f"Warm-up of model version {active.version} failed: {e}")
+        if active is not None:
+            self._build_cache_entry(active)
+        return active
+
+    def _build_cache_entry(self, loaded):
+        """Rebuild the cache entry of a model served from its .keras file.
+
+        Only called in serving processes: the save runs in a thread, and
+        threads in the preloading master would not survive its fork.
+        """
+        if getattr(loaded, "cache_checked_pid", None) == os.getpid():
+            return
+        loaded.cache_checked_pid = os.getpid()
+        if self.cache is not None and isinstance(loaded, ModelVersion):
+            self.cache.build_in_background(loaded.model, loaded.path)
+
+    def _golden_images(self):
+        for class_dir in sorted(glob.glob(os.path.join(self.golden_dir, "*"))):
+            if not os.path.isdir(class_dir):
+                continue
+            for path in sorted(glob.glob(os.path.join(class_dir, "*"))):
+                yield os.path.basename(class_dir), path
+
+    def _check_golden_set(self, candidate):
+        """Classify the golden images; raise if accuracy is below the threshold."""
+        images = list(self._golden_images())
+        if not images:
+            logger.warning("No golden images in %s; skipping validation of %s", self.golden_dir, candidate.version)
+            return None
+
+        correct = 0
+        for label, path in images:
+            with open(path, "rb") as f:
+                _, img = ImageService.validate_image(f.read())
+            probs = candidate.predict(ImageService.to_model_input(img))
+            if candidate.categories[int(np.argmax(probs[0]))] == label:
+                correct += 1
+
+        accuracy = correct / len(images)
+        if accuracy < self.golden_min_accuracy:
+            raise ValueError(
+                f"Model {candidate.version} scored {accuracy:.2%} on the golden set "
+                f"(minimum {self.golden_min_accuracy:.2%})"
+            )
+        return accuracy
+
+    def load_initial(self, warm_up=True):
+        """Load the current version synchronously at startup."""
+        version = self.current_pointer()
+        try:
+            self._active = self.load_version(version, warm_up=warm_up)
+            logger.info("Serving model version %s from %s", version, self._active.path)
+        except Exception as e:
+            logger.error(f"Failed to load model version {version}: {e}")
+            self._active = None
+        return self._active
+
+    def ensure_loaded(self, warm_up=True):
+        """Return the active model, loading the current version on first use.
+
+        A load that fails, e.g. while a deploy is still copying the artifact,
+        is tried again on a later call once MODEL_LOAD_RETRY_SECONDS (default
+        30) have passed, so the worker recovers without a manual reload. A
+        model preloaded without warm-up is warmed up on its first use in each
+        process.
+        """
+        if self._active is None and time.monotonic() >= self._next_load_attempt:
+            with self._reload_lock:
+                if self._active is None and time.monotonic() >= self._next_load_attempt:
+                    if self.load_initial(warm_up) is None:
+                        self._next_load_attempt = time.monotonic() + self.load_retry_seconds
+        return self.warm_up() if warm_up else self._active
+
+    def reload(self, version=None, background=True, promote=False):
+        """Load, warm up, validate and atomically swap in a model version.
+
+        With ``promote``, registry/CURRENT is pointed at the version once it
+        is serving, so other workers only follow a version that passed.
+        Returns False if a reload is already in progress.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+
+        try:
+            version = version or self.current_pointer()
+        except Exception:
+            self._reload_lock.release()
+            raise
+        self.reload_state = {"state": "loading", "version": version, "error": None, "finished_at": None}
+
+        def run():
+            try:
+                candidate = self.load_version(version)
+                accuracy = self._check_golden_set(candidate)
+                self._active = candidate
+                if promote:
+                    self.set_current_pointer(version)
+                self._build_cache_entry(candidate)
+                self.reload_state = {"state": "succeeded", "version": version, "error": None,
+                                     "golden_accuracy": accuracy, "finished_at": time.time()}
+                logger.info("Hot-swapped model to version %s", version)
+            except Exception as e:
+                self.reload_state = {"state": "failed", "version": version, "error": str(e),
+                                     "finished_at": time.time()}
+                logger.error(f"Model reload to {version} failed; still serving {self.active_version}: {e}")
+            finally:
+                self._reload_lock.release()
+
+        if background:
+            threading.Thread(target=run, name="model-reload", daemon=True).start()
+        else:
+            run()
+        return True
+
+    # -- pointer watching ------------------------------------------------
+
+    def ensure_watcher(self):
+        """Start (once per process) a thread that follows registry/CURRENT.
+
+        Under gunicorn an admin request reaches only one worker, and threads
+        do not survive fork. So each worker watches the pointer file itself and
+        reloads when it changes.
+        """
+        if self._watcher_pid == os.getpid() or self.poll_interval <= 0:
+            return
+        with self._watcher_lock:
+            # Concurrent first requests must not each start a watcher
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+            threading.Thread(target=self._watch, name="model-registry-watch", daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                wanted = self.current_pointer()
+                failed = self.reload_state["state"] == "failed" and self.reload_state["version"] == wanted
+                if wanted != self.active_version and not failed:
+                    self.reload(wanted)
+            except Exception as e:
+                logger.error(f"Model registry watcher error: {e}")
+
+    def install_signal_handler(self, signum):
+        """Reload from registry/CURRENT when the process receives ``signum``."""
+        import signal
+
+        signal.signal(signum, lambda *_: self.reload())
+
+    def status(self):
+        active = self._active
+        return {
+            "active_version": active.version if active else None,
+            "active_path": active.path if active else None,
+            "active_format": "tflite" if isinstance(active, TFLiteModelVersion) else ("keras" if active else None),
+            "active_cache_path": active.cache_path if isinstance(active, CachedModelVersion) else None,
+            "loaded_at": active.loaded_at if active else None,
+            "current_pointer": self.current_pointer(),
+            "available_versions": self.available_versions(),
+            "reload": self.reload_state,
+        }
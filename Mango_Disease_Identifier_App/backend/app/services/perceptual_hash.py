@@ -0,0 +1,116 @@
+import itertools
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+
+_PHASH_SIZE = 32
+_PHASH_LOW = 8
+
+# Orthonormal DCT-II basis, so the 2-D DCT is two small matrix products
+_n = np.arange(_PHASH_SIZE)
+_DCT = np.sqrt(2.0 / _PHASH_SIZE) * np.cos(np.pi * (2 * _n[None, :] + 1) * _n[:, None] / (2 * _PHASH_SIZE))
+_DCT[0] /= np.sqrt(2.0)
+
+
+def _bits_to_int(bits):
+    value = 0
+    for bit in bits.ravel():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def dhash(img):
+    """64-bit difference hash: whether each pixel is brighter than its left neighbour."""
+    pixels = np.asarray(img.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(img):
+    """64-bit DCT perceptual hash.
+
+    Survives re-encoding, resizing and mild crops or colour changes. The
+    hash compares the lowest 8x8 DCT frequencies of a 32x32 grayscale copy
+    against their median.
+    """
+    pixels = np.asarray(
+        img.convert("L").resize((_PHASH_SIZE, _PHASH_SIZE), Image.LANCZOS), dtype=np.float64
+    )
+    low = (_DCT @ pixels @ _DCT.T)[:_PHASH_LOW, :_PHASH_LOW]
+    # The DC term is overall brightness; leave it out of the median
+    median = np.median(low.ravel()[1:])
+    return _bits_to_int(low > median)
+
+
+def to_signed(value):
+    """Store an unsigned 64-bit hash in a MongoDB int64."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class MultiIndexHashTable:
+    """Hamming-radius search over 64-bit hashes by multi-index hashing.
+
+    Each hash is split into ``chunks`` disjoint 16-bit substrings, and there
+    is one table per substring position. If two hashes are within ``radius``
+    bits, at least one substring differs in at most ``radius // chunks``
+    bits (pigeonhole). A lookup therefore probes each table with the query's
+    substring and its variants within that sub-radius, then verifies the
+    full distance of the few entries found. It never scans the stored hashes.
+    """
+
+    def __init__(self, radius, chunks=4, bits=HASH_BITS):
+        self.radius = radius
+        width = bits // chunks
+        self._spans = [(bits - (i + 1) * width, (1 << width) - 1) for i in range(chunks)]
+        sub_radius = radius // chunks
+        self._flips = [0] + [
+            sum(1 << b for b in combo)
+            for r in range(1, sub_radius + 1)
+            for combo in itertools.combinations(range(width), r)
+        ]
+        self._tables = [{} for _ in self._spans]
+        self._hashes = {}
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, item):
+        return item in self._hashes
+
+    def add(self, value, item):
+        if item in self._hashes:
+            return
+        self._hashes[item] = value
+        for (shift, mask), table in zip(self._spans, self._tables):
+            table.setdefault((value >> shift) & mask, []).append(item)
+
+    def remove(self, item):
+        value = self._hashes.pop(item, None)
+        if value is None:
+            return
+        for (shift, mask), table in zip(self._spans, self._tables):
+            bucket = table.get((value >> shift) & mask)
+            if bucket and item in bucket:
+                bucket.remove(item)
+
+    def query(self, value):
+        """Items within ``radius`` bits of ``value`` as (distance, item), nearest first."""
+        seen = set()
+        matches = []
+        hashes = self._hashes
+        for (shift, mask), table in zip(self._spans, self._tables):
+            key = (value >> shift) & mask
+            for flip in self._flips:
+                for item in table.get(key ^ flip, ()):
+                    if item in seen:
+                        continue
+                    seen.add(item)
+                    distance = (value ^ hashes[item]).bit_count()
+                    if distance <= self.radius:
+                        matches.append((distance, item))
+        matches.sort(key=lambda match: match[0])
+        return matches
@@ -0,0 +1,354 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+import numpy as np
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from app.services.blob_store import blob_store
+from app.services.image_service import ImageService, ImageValidationError
+from app.services.inference_tuning import load_profile
+from app.services.prediction_log import prediction_logger
+from app.utils.db import get_db
+from app.utils.indexes import ensure_indexes
+from app.utils.resilience import OPEN, get_breaker
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "prediction_jobs"
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+FINISHED = (DONE, CANCELLED)
+
+
+class JobNotFound(Exception):
+    pass
+
+
+def _retention():
+    return timedelta(hours=float(os.getenv("PREDICTION_JOB_RETENTION_HOURS", 24)))
+
+
+def _collection():
+    return get_db()[COLLECTION_NAME]
+
+
+class PredictionJobService:
+    """Persistence for batch prediction jobs (the ``prediction_jobs`` collection).
+
+    A job holds one item per uploaded image, with the image's blob digest,
+    its status (pending, done or failed) and, once done, the predicted class.
+    Completed items get an increasing ``seq``, so clients can ask for, or
+    stream, only the results they have not seen. Jobs are deleted by a TTL
+    index PREDICTION_JOB_RETENTION_HOURS after they finish.
+    """
+
+    _indexes_ready = False
+
+    @staticmethod
+    def ensure_indexes():
+        """Build the declared indexes on first use; the TTL index is what enforces retention."""
+        if PredictionJobService._indexes_ready:
+            return
+        ensure_indexes([COLLECTION_NAME])
+        PredictionJobService._indexes_ready = True
+
+    @staticmethod
+    def claim_query(now):
+        """Jobs waiting for a scheduler: queued, or running under a lapsed lease."""
+        return {
+            "status": {"$in": [QUEUED, RUNNING]},
+            "$or": [{"lease_expires_at": None}, {"lease_expires_at": {"$lt": now}}],
+        }
+
+    @staticmethod
+    def create(user_id, uploads):
+        """Queue a job for images already in the blob store.
+
+        ``uploads`` is a list of (filename, digest, error). Uploads that failed
+        validation become failed items rather than failing the whole job.
+        """
+        PredictionJobService.ensure_indexes()
+        now = datetime.utcnow()
+        items, failed = [], 0
+        for index, (filename, digest, error) in enumerate(uploads):
+            item = {"index": index, "filename": filename, "status": "pending"}
+            if error is None:
+                item["digest"] = digest
+            else:
+                failed += 1
+                item.update(status="failed", error=error, seq=failed)
+            items.append(item)
+
+        job = {
+            "user_id": user_id,
+            "status": QUEUED,
+            "total": len(items),
+            "completed": 0,
+            "failed": failed,
+            "seq": failed,
+            "items": items,
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "created_at": now,
+            "updated_at": now,
+            # Unfinished jobs expire too, so abandoned ones cannot pile up
+            "expires_at": now + _retention(),
+        }
+        if failed == len(items):
+            job.update(status=DONE, finished_at=now)
+        job["_id"] = _collection().insert_one(job).inserted_id
+        return job
+
+    @staticmethod
+    def get(job_id, user_id, projection=None):
+        try:
+            job_id = ObjectId(job_id)
+        except (InvalidId, TypeError):
+            raise JobNotFound(job_id)
+        job = _collection().find_one({"_id": job_id, "user_id": user_id}, projection)
+        if job is None:
+            raise JobNotFound(job_id)
+        return job
+
+    @staticmethod
+    def list_for_user(user_id, limit=20):
+        return list(
+            _collection()
+            .find({"user_id": user_id}, {"items": 0})
+            .sort("created_at", DESCENDING)
+            .limit(limit)
+        )
+
+    @staticmethod
+    def cancel(job_id, user_id):
+        job = PredictionJobService.get(job_id, user_id, {"status": 1})
+        if job["status"] in FINISHED:
+            return False
+        now = datetime.utcnow()
+        result = _collection().update_one(
+            {"_id": job["_id"], "status": {"$nin": list(FINISHED)}},
+            {"$set": {"status": CANCELLED, "lease_owner": None, "updated_at": now,
+                      "finished_at": now, "expires_at": now + _retention()}},
+        )
+        return result.modified_count == 1
+
+    @staticmethod
+    def summary(job):
+        return {
+            "job_id": str(job["_id"]),
+            "status": job["status"],
+            "total": job["total"],
+            "completed": job["completed"],
+            "failed": job["failed"],
+            "model_version": job.get("model_version"),
+            "created_at": job["created_at"],
+            "finished_at": job.get("finished_at"),
+            "expires_at": job.get("expires_at"),
+        }
+
+    @staticmethod
+    def results_since(job, since=0):
+        """Finished items with seq > ``since``, in completion order."""
+        from app.services.disease_catalog import describe_prediction
+
+        results = []
+        for item in job.get("items", []):
+            if item["status"] == "pending" or item["seq"] <= since:
+                continue
+            entry = {"index": item["index"], "filename": item.get("filename"), "status": item["status"],
+                     "seq": item["seq"]}
+            if item["status"] == "done":
+                entry["result"] = dict(
+                    describe_prediction(item["prediction"], item["probability"]),
+                    model_version=item.get("model_version"),
+                )
+            else:
+                entry["error"] = item.get("error")
+            results.append(entry)
+        results.sort(key=lambda entry: entry["seq"])
+        return results
+
+
+class _ActiveJob:
+    def __init__(self, doc):
+        self.id = doc["_id"]
+        self.user_id = doc.get("user_id")
+        self.seq = doc.get("seq", 0)
+        self.pending = deque((item["index"], item["digest"]) for item in doc["items"] if item["status"] == "pending")
+
+
+class PredictionJobScheduler:
+    """Background worker that runs queued prediction jobs in inference processes.
+
+    Each process leases up to PREDICTION_JOB_MAX_ACTIVE jobs at a time, with
+    a lease that every write extends by PREDICTION_JOB_LEASE_SECONDS. It fills
+    each inference batch round-robin from them, so a small job never waits
+    behind a large one. A worker that dies mid-job stops renewing its lease,
+    and another process picks the job up from its first pending image. The
+    batch size comes from PREDICTION_JOB_BATCH_SIZE, else the tuned
+    inference profile, else 16.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        profile = load_profile() or {}
+        self.batch_size = int(os.getenv("PREDICTION_JOB_BATCH_SIZE", profile.get("batch_size") or 16))
+        self.max_active = int(os.getenv("PREDICTION_JOB_MAX_ACTIVE", 4))
+        self.lease_seconds = float(os.getenv("PREDICTION_JOB_LEASE_SECONDS", 60))
+        self.poll_interval = float(os.getenv("PREDICTION_JOB_POLL_SECONDS", 2))
+        self.enabled = os.getenv("PREDICTION_JOBS_ENABLED", "True").lower() == "true"
+        self._owner = None
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._active = []
+        self._wakeup = threading.Event()
+        self.stats = {"batches": 0, "images": 0, "failed": 0, "last_error": None}
+
+    def ensure_running(self):
+        """Start the scheduler thread once per process (threads do not survive fork)."""
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._start_lock:
+            # Concurrent first requests must not each start a scheduler
+            if self._pid == os.getpid():
+                return
+            self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+            self._active = []
+            threading.Thread(target=self._run, name="prediction-job-scheduler", daemon=True).start()
+            self._pid = os.getpid()
+
+    def notify(self):
+        """A job was queued in this process; look for work now instead of at the next poll."""
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            try:
+                # Leave queued jobs alone while this process has no model or no database
+                if get_breaker("mongo").state != OPEN and self.registry.ensure_loaded() is not None:
+                    self._claim()
+                    batch = self._next_batch()
+                    if batch:
+                        self._run_batch(batch)
+                        continue
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                logger.error(f"Prediction job scheduler error: {e}")
+                # Our view of the claimed jobs may be stale; they are reclaimed once their leases expire
+                self._active = []
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _lease(self, now):
+        return {"lease_owner": self._owner, "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                "updated_at": now}
+
+    def _claim(self):
+        while len(self._active) < self.max_active:
+            now = datetime.utcnow()
+            doc = _collection().find_one_and_update(
+                PredictionJobService.claim_query(now),
+                {"$set": dict(self._lease(now), status=RUNNING)},
+                sort=[("created_at", ASCENDING)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if doc is None:
+                return
+            job = _ActiveJob(doc)
+            if job.pending:
+                self._active.append(job)
+            else:
+                self._finish(job)
+
+    def _next_batch(self):
+        batch = []
+        while len(batch) < self.batch_size and any(job.pending for job in self._active):
+            for job in self._active:
+                if job.pending and len(batch) < self.batch_size:
+                    batch.append((job, *job.pending.popleft()))
+        return batch
+
+    def _run_batch(self, batch):
+        model = self.registry.ensure_loaded()
+        started = time.perf_counter()
+        inputs, ready, failures = [], [], []
+        for job, index, digest in batch:
+            try:
+                with open(blob_store.blob_path(digest), "rb") as f:
+                    _, img = ImageService.validate_image(f.read())
+                inputs.append(ImageService.to_model_input(img))
+                ready.append((job, index, digest))
+            except (OSError, ImageValidationError) as e:
+                failures.append((job, index, getattr(e, "message", str(e))))
+
+        outcomes = {}
+        try:
+            pred = model.predict(np.concatenate(inputs)) if ready else []
+        except Exception as e:
+            logger.error(f"Batch prediction error: {e}")
+            failures.extend((job, index, str(e)) for job, index, _ in ready)
+            ready, pred = [], []
+        if ready:
+            latency_ms = (time.perf_counter() - started) * 1000 / len(ready)
+            for (job, index, digest), probabilities in zip(ready, pred):
+                class_index = int(np.argmax(probabilities))
+                predicted_class = model.categories[class_index]
+                outcomes.setdefault(job, []).append((index, {
+                    "status": "done",
+                    "prediction": predicted_class,
+                    "probability": float(probabilities[class_index]),
+                    "model_version": model.version,
+                }))
+                prediction_logger.record(prediction_logger.build_event(
+                    predicted_class, probabilities, model.categories, model.version, latency_ms,
+                    image_digest=digest, user_id=job.user_id,
+                ))
+        for job, index, error in failures:
+            outcomes.setdefault(job, []).append((index, {"status": "failed", "error": error}))
+
+        self.stats["batches"] += 1
+        self.stats["images"] += len(ready)
+        self.stats["failed"] += len(failures)
+        for job, results in outcomes.items():
+            self._save(job, results, model.version)
+
+    def _save(self, job, results, model_version):
+        now = datetime.utcnow()
+        update = dict(self._lease(now), model_version=model_version)
+        for index, fields in results:
+            job.seq += 1
+            for key, value in dict(fields, seq=job.seq).items():
+                update[f"items.{index}.{key}"] = value
+        done = sum(1 for _, fields in results if fields["status"] == "done")
+        saved = _collection().update_one(
+            {"_id": job.id, "lease_owner": self._owner, "status": RUNNING},
+            {"$set": dict(update, seq=job.seq), "$inc": {"completed": done, "failed": len(results) - done}},
+        )
+        if saved.matched_count == 0:
+            # Cancelled, or the lease was lost to another process
+            self._active.remove(job)
+        elif not job.pending:
+            self._finish(job)
+
+    def _finish(self, job):
+        now = datetime.utcnow()
+        _collection().update_one(
+            {"_id": job.id, "lease_owner": self._owner, "status": RUNNING},
+            {"$set": {"status": DONE, "finished_at": now, "updated_at": now, "expires_at": now + _retention(),
+                      "lease_owner": None, "lease_expires_at": None}},
+        )
+        if job in self._active:
+            self._active.remove(job)
+
+    def status(self):
+        return dict(self.stats, enabled=self.enabled, batch_size=self.batch_size, max_active=self.max_active,
+                    active_jobs=[str(job.id) for job in self._active], owner=self._owner)
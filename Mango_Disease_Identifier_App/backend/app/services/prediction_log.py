@@ -0,0 +1,147 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from app.utils.db import get_db
+from app.utils.resilience import OPEN, get_breaker
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "prediction_events"
+
+
+class PredictionLogger:
+    """Write-behind log of /predict events.
+
+    ``record`` only appends to an in-memory buffer. A background thread
+    drains the buffer into MongoDB with ``insert_many``, either when
+    ``batch_size`` events are waiting or every ``flush_interval`` seconds.
+    The buffer holds at most ``max_buffer`` events. When it is full, new
+    events are dropped and counted rather than stalling predictions on a
+    slow database. A failed write drops its batch (counted as failed) and
+    makes the writer back off exponentially, up to the mongo breaker's reset
+    timeout, before it writes again.
+    """
+
+    def __init__(self, batch_size=None, flush_interval=None, max_buffer=None, collection=None):
+        self.batch_size = int(batch_size or os.getenv("PREDICTION_LOG_BATCH_SIZE", 100))
+        self.flush_interval = float(flush_interval or os.getenv("PREDICTION_LOG_FLUSH_SECONDS", 5))
+        self.max_buffer = int(max_buffer or os.getenv("PREDICTION_LOG_MAX_BUFFER", 10000))
+        self.enabled = os.getenv("PREDICTION_LOG_ENABLED", "True").lower() == "true"
+        self._collection = collection
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        self._writer_pid = None
+        self._failures = 0
+        self.stats = {"recorded": 0, "written": 0, "dropped": 0, "failed": 0, "last_error": None}
+        atexit.register(self.close)
+
+    def collection(self):
+        if self._collection is None:
+            return get_db()[COLLECTION_NAME]
+        return self._collection
+
+    @staticmethod
+    def build_event(predicted_class, probabilities, categories, model_version,
+                    latency_ms, image_digest=None, user_id=None):
+        return {
+            "predicted_class": predicted_class,
+            "probability": float(max(probabilities)),
+            "probabilities": {c: float(p) for c, p in zip(categories, probabilities)},
+            "model_version": model_version,
+            "latency_ms": round(latency_ms, 2),
+            "image_digest": image_digest,
+            "user_id": user_id,
+            "created_at": datetime.utcnow(),
+        }
+
+    def record(self, event):
+        """Queue an event without blocking; returns False if it was dropped."""
+        if not self.enabled:
+            return False
+        self._ensure_writer()
+        with self._cond:
+            if len(self._buffer) >= self.max_buffer:
+                self.stats["dropped"] += 1
+                return False
+            self._buffer.append(event)
+            self.stats["recorded"] += 1
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def _take_batch(self):
+        with self._cond:
+            n = min(len(self._buffer), self.batch_size)
+            return [self._buffer.popleft() for _ in range(n)]
+
+    def flush(self):
+        """Write every buffered event now, in batches; returns the number written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                # Keep events buffered while MongoDB is known to be down
+                if get_breaker("mongo").state == OPEN:
+                    return written
+                batch = self._take_batch()
+                if not batch:
+                    return written
+                try:
+                    self.collection().insert_many(batch, ordered=False)
+                    written += len(batch)
+                    self.stats["written"] += len(batch)
+                    self._failures = 0
+                except Exception as e:
+                    # Losing a batch of analytics beats retrying into an outage
+                    self.stats["failed"] += len(batch)
+                    self.stats["last_error"] = str(e)
+                    logger.error(f"Failed to write {len(batch)} prediction events: {e}")
+                    self._failures += 1
+                    return written
+
+    def _ensure_writer(self):
+        # Threads do not survive fork, so each gunicorn worker starts its own
+        if self._writer_pid == os.getpid():
+            return
+        with self._writer_lock:
+            # Concurrent first requests must not each start a writer
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+            threading.Thread(target=self._run, name="prediction-log-writer", daemon=True).start()
+
+    def _retry_delay(self):
+        """Seconds to wait after a flush that left events behind."""
+        breaker = get_breaker("mongo")
+        # Doubles with each failed write in a row, up to the breaker's reset timeout
+        backoff = min(self.flush_interval * 2 ** self._failures, max(self.flush_interval, breaker.reset_timeout))
+        # ...and never before the open breaker lets a probe through
+        return max(backoff, breaker.retry_after())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if len(self._buffer) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+            self.flush()
+            if self._buffer or self._failures:
+                # flush() stopped early; retrying at once would spin on the full buffer
+                time.sleep(self._retry_delay())
+
+    def close(self):
+        """Flush what is left at shutdown."""
+        if self._buffer:
+            self.flush()
+
+    def status(self):
+        return dict(self.stats, buffered=len(self._buffer), max_buffer=self.max_buffer,
+                    batch_size=self.batch_size, flush_interval=self.flush_interval,
+                    enabled=self.enabled)
+
+
+prediction_logger = PredictionLogger()
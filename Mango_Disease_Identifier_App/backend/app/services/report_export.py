@@ -0,0 +1,259 @@
+import csv
+import io
+import json
+import os
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from app.services.report_query import ReportQueryService, InvalidQuery, SEVERITIES, TREE_AGES
+from app.utils.db import iter_without_timeout
+
+# pyarrow is optional and only needed for Parquet; it is imported on first use
+# so API workers do not pay for it at startup
+pa = pq = None
+
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# Flat column order shared by every format
+COLUMNS = [
+    'id', 'user_id', 'disease_name', 'severity', 'tree_age', 'location', 'latitude', 'longitude',
+    'weather', 'notes', 'image_uri', 'image_digest', 'duplicate_of', 'symptoms', 'recommendations',
+    'synced', 'deleted', 'timestamp', 'created_at', 'updated_at',
+]
+
+_PROJECTION = {
+    'user': 1, 'disease_name': 1, 'severity': 1, 'tree_age': 1, 'location': 1, 'coordinates': 1,
+    'weather': 1, 'notes': 1, 'image_uri': 1, 'image_digest': 1, 'duplicate_of': 1, 'symptoms': 1,
+    'recommendations': 1, 'synced': 1, 'deleted': 1, 'timestamp': 1, 'created_at': 1, 'updated_at': 1,
+}
+
+
+class ExportUnavailable(Exception):
+    pass
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that collects what pyarrow writes until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ReportExportService:
+    """Streams disease reports out of MongoDB as NDJSON, CSV or Parquet.
+
+    Reports are read with a raw pymongo cursor (no mongoengine documents) in
+    batches of EXPORT_BATCH_SIZE and encoded row by row. Output is handed
+    on in chunks of about EXPORT_CHUNK_BYTES, or one Parquet row group of
+    EXPORT_PARQUET_ROW_GROUP rows at a time. Memory therefore stays flat
+    however many reports match.
+    """
+
+    @staticmethod
+    def build_query(params, user_id=None):
+        """Return (filter, sort) for the export parameters.
+
+        A user's export walks the (user, timestamp) index newest first; a full
+        export walks _id so it can be resumed with ``after``.
+        """
+        query = {}
+        if user_id is not None:
+            query['user'] = ObjectId(user_id)
+        if params.get('include_deleted', '').lower() != 'true':
+            query['deleted'] = {'$ne': True}
+        if params.get('include_duplicates', '').lower() != 'true':
+            query['duplicate_of'] = None
+        if params.get('disease'):
+            query['disease_name'] = params['disease']
+        if params.get('severity'):
+            if params['severity'] not in SEVERITIES:
+                raise InvalidQuery(f"'severity' must be one of {', '.join(SEVERITIES)}")
+            query['severity'] = params['severity']
+        if params.get('tree_age'):
+            if params['tree_age'] not in TREE_AGES:
+                raise InvalidQuery(f"'tree_age' must be one of {', '.join(TREE_AGES)}")
+            query['tree_age'] = params['tree_age']
+
+        date_range = {}
+        if params.get('from'):
+            date_range['$gte'] = ReportQueryService._parse_date(params['from'], 'from')
+        if params.get('to'):
+            date_range['$lte'] = ReportQueryService._parse_date(params['to'], 'to')
+        if date_range:
+            query['timestamp'] = date_range
+
+        if user_id is not None:
+            return query, [('user', 1), ('timestamp', -1)]
+
+        if params.get('after'):
+            try:
+                query['_id'] = {'$gt': ObjectId(params['after'])}
+            except InvalidId:
+                raise InvalidQuery("'after' must be a report id")
+        return query, [('_id', 1)]
+
+    @staticmethod
+    def check_format(fmt):
+        if fmt not in FORMATS:
+            raise InvalidQuery(f"'format' must be one of {', '.join(FORMATS)}")
+        if fmt == 'parquet':
+            ReportExportService._import_pyarrow()
+        return FORMATS[fmt]
+
+    @staticmethod
+    def _import_pyarrow():
+        global pa, pq
+        if pa is None:
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise ExportUnavailable('Parquet export needs the pyarrow package')
+            pa, pq = pyarrow, pyarrow.parquet
+
+    @staticmethod
+    def cursor(collection, query, sort, batch_size=None):
+        batch_size = batch_size or int(os.getenv('EXPORT_BATCH_SIZE', 2000))
+        return collection.find(query, _PROJECTION, sort=sort, batch_size=batch_size)
+
+    @staticmethod
+    def row(doc):
+        """Flatten a raw report document into the export columns."""
+        coordinates = doc.get('coordinates') or {}
+        digest = doc.get('image_digest')
+        return {
+            'id': str(doc['_id']),
+            'user_id': str(doc['user']) if doc.get('user') else None,
+            'disease_name': doc.get('disease_name'),
+            'severity': doc.get('severity'),
+            'tree_age': doc.get('tree_age'),
+            'location': doc.get('location'),
+            'latitude': coordinates.get('latitude'),
+            'longitude': coordinates.get('longitude'),
+            'weather': doc.get('weather'),
+            'notes': doc.get('notes'),
+            'image_uri': doc.get('image_uri') or (f'/api/images/{digest}' if digest else None),
+            'image_digest': digest,
+            'duplicate_of': str(doc['duplicate_of']) if doc.get('duplicate_of') else None,
+            'symptoms': doc.get('symptoms') or [],
+            'recommendations': doc.get('recommendations') or [],
+            'synced': doc.get('synced', True),
+            'deleted': bool(doc.get('deleted')),
+            'timestamp': doc['timestamp'].isoformat() if doc.get('timestamp') else None,
+            'created_at': doc['created_at'].isoformat() if doc.get('created_at') else None,
+            'updated_at': doc['updated_at'].isoformat() if doc.get('updated_at') else None,
+        }
+
+    @staticmethod
+    def export(collection, fmt, query, sort):
+        """Yield the export of every matching report, closing the cursor when done or abandoned."""
+        cursor = ReportExportService.cursor(collection, query, sort)
+        try:
+            # An export outlives the request deadline, which the server would apply to the whole cursor
+            yield from ReportExportService.stream(fmt, iter_without_timeout(cursor))
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def stream(fmt, docs, chunk_bytes=None, row_group_size=None):
+        """Yield the encoded export of ``docs`` as byte chunks."""
+        if fmt == 'parquet':
+            return ReportExportService._parquet(docs, row_group_size or int(os.getenv('EXPORT_PARQUET_ROW_GROUP', 50000)))
+        chunk_bytes = chunk_bytes or int(os.getenv('EXPORT_CHUNK_BYTES', 256 * 1024))
+        if fmt == 'csv':
+            return ReportExportService._csv(docs, chunk_bytes)
+        return ReportExportService._ndjson(docs, chunk_bytes)
+
+    @staticmethod
+    def _ndjson(docs, chunk_bytes):
+        row, dumps = ReportExportService.row, json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        lines, size = [], 0
+        for doc in docs:
+            line = (dumps(row(doc)) + '\n').encode('utf-8')
+            lines.append(line)
+            size += len(line)
+            if size >= chunk_bytes:
+                yield b''.join(lines)
+                lines, size = [], 0
+        if lines:
+            yield b''.join(lines)
+
+    @staticmethod
+    def _csv(docs, chunk_bytes):
+        row = ReportExportService.row
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(COLUMNS)
+        for doc in docs:
+            values = row(doc)
+            # Lists become "a; b" so each report stays one CSV row
+            values['symptoms'] = '; '.join(values['symptoms'])
+            values['recommendations'] = '; '.join(values['recommendations'])
+            writer.writerow([values[column] for column in COLUMNS])
+            if buf.tell() >= chunk_bytes:
+                yield buf.getvalue().encode('utf-8')
+                buf.seek(0)
+                buf.truncate()
+        if buf.tell():
+            yield buf.getvalue().encode('utf-8')
+
+    @staticmethod
+    def parquet_schema():
+        ReportExportService._import_pyarrow()
+        string, strings = pa.string(), pa.list_(pa.string())
+        types = {
+            'latitude': pa.float64(), 'longitude': pa.float64(),
+            'symptoms': strings, 'recommendations': strings,
+            'synced': pa.bool_(), 'deleted': pa.bool_(),
+        }
+        return pa.schema([(column, types.get(column, string)) for column in COLUMNS])
+
+    @staticmethod
+    def _parquet(docs, row_group_size):
+        row = ReportExportService.row
+        schema = ReportExportService.parquet_schema()
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+
+        # Buffer one row group column-wise; a list per column is far smaller than a dict per row
+        columns = {column: [] for column in COLUMNS}
+        pending = 0
+
+        def write():
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema), row_group_size=row_group_size)
+            for values in columns.values():
+                values.clear()
+            return sink.drain()
+
+        for doc in docs:
+            for column, value in row(doc).items():
+                columns[column].append(value)
+            pending += 1
+            if pending >= row_group_size:
+                yield write()
+                pending = 0
+        if pending:
+            yield write()
+        writer.close()
+        yield sink.drain()
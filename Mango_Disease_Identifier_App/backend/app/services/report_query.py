@@ -0,0 +1,91 @@
+import itertools
+from datetime import datetime
+from bson.objectid import ObjectId
+
+SEVERITIES = ('mild', 'moderate', 'severe')
+TREE_AGES = ('youngTree', 'matureTree', 'oldTree')
+
+# Sort options, each backed by an index whose last key is timestamp
+SORTS = {
+    '-timestamp': [('timestamp', -1)],
+    'timestamp': [('timestamp', 1)],
+    'disease_name': [('disease_name', 1), ('timestamp', -1)],
+    'severity': [('severity', 1), ('timestamp', -1)],
+}
+
+MAX_LIMIT = 100
+
+class InvalidQuery(ValueError):
+    pass
+
+class ReportQueryService:
+    """Builds the search/filter queries behind GET /api/disease-reports/search.
+
+    Every supported combination of filters starts with an equality on user, so
+    it is served by one of the compound indexes declared on DiseaseReport:
+    (user, timestamp), (user, disease_name, timestamp), (user, severity,
+    timestamp) and (user, tree_age, timestamp), following equality-sort-range
+    order. Location search uses the (user, location) text index, whose
+    user prefix confines the search to that user's reports. query_shapes()
+    enumerates every combination for scripts/check_query_plans.py.
+    """
+
+    @staticmethod
+    def _parse_date(value, name):
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise InvalidQuery(f"'{name}' must be an ISO 8601 date")
+
+    @staticmethod
+    def build(user_id, params):
+        """Return (filter, sort, skip, limit) for the request parameters."""
+        query = {'user': ObjectId(user_id), 'deleted': {'$ne': True}}
+
+        if params.get('q'):
+            query['$text'] = {'$search': params['q']}
+        if params.get('disease'):
+            query['disease_name'] = params['disease']
+        if params.get('severity'):
+            if params['severity'] not in SEVERITIES:
+                raise InvalidQuery(f"'severity' must be one of {', '.join(SEVERITIES)}")
+            query['severity'] = params['severity']
+        if params.get('tree_age'):
+            if params['tree_age'] not in TREE_AGES:
+                raise InvalidQuery(f"'tree_age' must be one of {', '.join(TREE_AGES)}")
+            query['tree_age'] = params['tree_age']
+
+        date_range = {}
+        if params.get('from'):
+            date_range['$gte'] = ReportQueryService._parse_date(params['from'], 'from')
+        if params.get('to'):
+            date_range['$lte'] = ReportQueryService._parse_date(params['to'], 'to')
+        if date_range:
+            query['timestamp'] = date_range
+
+        sort_key = params.get('sort') or '-timestamp'
+        if sort_key not in SORTS:
+            raise InvalidQuery(f"'sort' must be one of {', '.join(SORTS)}")
+
+        try:
+            limit = min(max(int(params.get('limit', 20)), 1), MAX_LIMIT)
+            page = max(int(params.get('page', 1)), 1)
+        except ValueError:
+            raise InvalidQuery("'limit' and 'page' must be integers")
+
+        return query, SORTS[sort_key], (page - 1) * limit, limit
+
+    @staticmethod
+    def query_shapes(sample):
+        """Yield parameter dicts for every supported filter/sort combination.
+
+        ``sample`` supplies a value for each filter (q, disease, severity,
+        tree_age, from, to).
+        """
+        filters = ['q', 'disease', 'severity', 'tree_age', 'from', 'to']
+        for size in range(len(filters) + 1):
+            for combo in itertools.combinations(filters, size):
+                for sort_key in SORTS:
+                    params = {name: sample[name] for name in combo}
+                    params['sort'] = sort_key
+                    yield params
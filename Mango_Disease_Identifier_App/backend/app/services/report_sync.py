@@ -0,0 +1,98 @@
+import os
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from itsdangerous import URLSafeSerializer, BadSignature
+from app.models.disease_report import DiseaseReport
+
+class InvalidSyncToken(Exception):
+    pass
+
+class ReportSyncService:
+    """Delta sync for the offline-first client.
+
+    A sync token is a signed (updated_at, _id) position in the user's
+    (user, updated_at, _id) index. Each call returns the reports changed after
+    that position, tombstones included, in index order, plus the token to send
+    next time.
+
+    Reports written in the last few seconds may still be committing, possibly
+    with an earlier updated_at than those already returned. So the token never
+    advances past ``now - SYNC_SAFETY_WINDOW_SECONDS``, and the newest changes
+    are resent once. Clients upsert by id, so a repeat is harmless.
+    """
+
+    @staticmethod
+    def _serializer(secret_key):
+        return URLSafeSerializer(secret_key, salt="disease-report-sync")
+
+    @staticmethod
+    def encode_token(secret_key, user_id, updated_at, last_id):
+        return ReportSyncService._serializer(secret_key).dumps({
+            "u": str(user_id),
+            "t": updated_at.isoformat(),
+            "i": str(last_id) if last_id else None,
+        })
+
+    @staticmethod
+    def decode_token(secret_key, token, user_id):
+        try:
+            data = ReportSyncService._serializer(secret_key).loads(token)
+        except BadSignature:
+            raise InvalidSyncToken("Invalid sync token")
+        if data.get("u") != str(user_id):
+            raise InvalidSyncToken("Sync token belongs to another user")
+        return datetime.fromisoformat(data["t"]), ObjectId(data["i"]) if data.get("i") else None
+
+    # Index order of (user, updated_at, _id)
+    SORT = [("updated_at", 1), ("_id", 1)]
+
+    @staticmethod
+    def changes_query(secret_key, user_id, token=None):
+        """Filter for the user's reports changed after ``token``, read in SORT order."""
+        query = {"user": ObjectId(user_id)}
+
+        if token:
+            since, last_id = ReportSyncService.decode_token(secret_key, token, user_id)
+            if last_id is None:
+                query["updated_at"] = {"$gte": since}
+            else:
+                query["$or"] = [
+                    {"updated_at": {"$gt": since}},
+                    {"updated_at": since, "_id": {"$gt": last_id}},
+                ]
+        else:
+            # First sync: the device has nothing, so tombstones are irrelevant
+            query["deleted"] = {"$ne": True}
+        return query
+
+    @staticmethod
+    def changes_since(secret_key, user_id, token=None, limit=500):
+        """Return (changed reports, deleted ids, next token, has_more)."""
+        query = ReportSyncService.changes_query(secret_key, user_id, token)
+        # Fetch one extra row to learn whether another page follows
+        reports = list(
+            DiseaseReport.objects(__raw__=query)
+            .order_by("updated_at", "id")
+            .limit(limit + 1)
+        )
+        return ReportSyncService.page(secret_key, user_id, token, reports, limit)
+
+    @staticmethod
+    def page(secret_key, user_id, token, reports, limit):
+        """Shape up to ``limit + 1`` reports in SORT order into (changed, deleted, next token, has_more)."""
+        user = ObjectId(user_id)
+        has_more = len(reports) > limit
+        reports = reports[:limit]
+
+        changed = [r.to_dict() for r in reports if not r.deleted]
+        deleted = [str(r.id) for r in reports if r.deleted]
+
+        safe_until = datetime.utcnow() - timedelta(seconds=float(os.getenv("SYNC_SAFETY_WINDOW_SECONDS", 5)))
+        if reports and (has_more or reports[-1].updated_at <= safe_until):
+            next_token = ReportSyncService.encode_token(secret_key, user, reports[-1].updated_at, reports[-1].id)
+        elif reports or not token:
+            next_token = ReportSyncService.encode_token(secret_key, user, safe_until, None)
+        else:
+            next_token = token
+
+        return changed, deleted, next_token, has_more
@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+import numpy as np
+from bson.objectid import ObjectId
+from app.models.disease_report import DiseaseReport
+from app.services.blob_store import blob_store
+from app.services.image_service import ImageService
+from app.services.vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+VECTOR_INDEX_DIR = os.getenv(
+    "VECTOR_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "vector_index"),
+)
+
+# Fields read for matching reports; the caller sees all of them for their own
+# reports, and only SHARED_REPORT_FIELDS for everyone else's
+REPORT_FIELDS = ('id', 'user', 'disease_name', 'severity', 'tree_age', 'location', 'timestamp', 'image_digest')
+SHARED_REPORT_FIELDS = ('disease_name', 'severity')
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+class SimilarCaseService:
+    """Nearest-neighbour search over embeddings of reported images.
+
+    Embeddings depend on the model, so each model version has its own index
+    under VECTOR_INDEX_DIR/<version>. Indexes are keyed by image digest, and
+    a search result is resolved to every live report that used that photo.
+    Matches from other users show only the disease and severity: their
+    location, date and photo (its digest is the image URL) stay private.
+    """
+
+    @staticmethod
+    def index_dir(version):
+        return os.path.join(VECTOR_INDEX_DIR, version)
+
+    @staticmethod
+    def get_index(version):
+        """The index for a model version, opened once per process."""
+        with _indexes_lock:
+            if version not in _indexes:
+                _indexes[version] = VectorIndex(SimilarCaseService.index_dir(version))
+            return _indexes[version]
+
+    @staticmethod
+    def _checkpoint_path(version):
+        return os.path.join(SimilarCaseService.index_dir(version), "checkpoint")
+
+    @staticmethod
+    def read_checkpoint(version):
+        try:
+            with open(SimilarCaseService._checkpoint_path(version)) as f:
+                return ObjectId(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def write_checkpoint(version, report_id):
+        path = SimilarCaseService._checkpoint_path(version)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            f.write(str(report_id))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def index_new_reports(model_version, batch_size=64):
+        """Embed and index photos of reports created since the last checkpoint.
+
+        Reports are scanned in ``_id`` order, so each run only reads reports
+        it has not seen. Returns (reports scanned, vectors added).
+        """
+        index = SimilarCaseService.get_index(model_version.version)
+        last_id = SimilarCaseService.read_checkpoint(model_version.version)
+
+        query = {'image_digest__ne': None}
+        if last_id is not None:
+            query['id__gt'] = last_id
+        reports = DiseaseReport.objects(**query).only('id', 'image_digest').order_by('id').limit(batch_size)
+
+        scanned = 0
+        digests, batch = [], []
+        newest_id = None
+        for report in reports:
+            scanned += 1
+            newest_id = report.id
+            digest = report.image_digest
+            if digest in digests or index.contains(digest) or not blob_store.exists(digest):
+                continue
+            try:
+                with open(blob_store.blob_path(digest), "rb") as f:
+                    _, img = ImageService.validate_image(f.read())
+                batch.append(ImageService.to_model_input(img)[0])
+                digests.append(digest)
+            except Exception as e:
+                logger.warning(f"Skipping image {digest} of report {report.id}: {e}")
+
+        added = 0
+        if batch:
+            added = index.add(digests, model_version.embed(np.stack(batch)))
+        if newest_id is not None:
+            SimilarCaseService.write_checkpoint(model_version.version, newest_id)
+        return scanned, added
+
+    @staticmethod
+    def find_similar(model_version, x, k=10, user_id=None):
+        """Reports whose photos are most similar to the image batch ``x``.
+
+        ``user_id`` is the caller, whose own reports are returned in full.
+        """
+        index = SimilarCaseService.get_index(model_version.version)
+        embedding = model_version.embed(x)[0]
+        # Over-fetch a little: deleted reports are filtered out afterwards
+        matches = index.search(embedding, k=k * 2)
+        if not matches:
+            return []
+
+        by_digest = {}
+        reports = DiseaseReport.objects(
+            image_digest__in=[digest for digest, _ in matches], deleted__ne=True
+        ).only(*REPORT_FIELDS)
+        for report in reports:
+            if user_id is not None and str(report.user.id) == str(user_id):
+                entry = {
+                    'own': True,
+                    'id': str(report.id),
+                    'disease_name': report.disease_name,
+                    'severity': report.severity,
+                    'tree_age': report.tree_age,
+                    'location': report.location,
+                    'timestamp': report.timestamp,
+                }
+            else:
+                entry = {field: getattr(report, field) for field in SHARED_REPORT_FIELDS}
+                entry['own'] = False
+            by_digest.setdefault(report.image_digest, []).append(entry)
+
+        results = []
+        for digest, similarity in matches:
+            if digest not in by_digest:
+                continue
+            result = {
+                'similarity': round(similarity, 4),
+                'reports': by_digest[digest],
+            }
+            # The photo is only linked when the caller reported it too
+            if any(entry['own'] for entry in by_digest[digest]):
+                result.update(image_digest=digest, image_uri=f"/api/images/{digest}")
+            results.append(result)
+            if len(results) == k:
+                break
+        return results
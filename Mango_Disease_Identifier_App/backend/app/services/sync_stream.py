@@ -0,0 +1,259 @@
+"""Incremental parsing and chunked writing for large /sync uploads.
+
+The buffered /sync path reads the whole body and parses it into one list
+before the first report is saved, so its memory grows with the upload. In
+streaming mode the body is fed to a push parser as it arrives. The body is
+an ``application/x-ndjson`` upload, or a top-level JSON array sent with
+``?stream=true``. Reports are validated and inserted SYNC_STREAM_CHUNK_SIZE
+at a time (default 100) with one insert_many, and each result goes back as
+an NDJSON line. Peak memory is bounded by one chunk plus one partial item of
+at most SYNC_MAX_ITEM_BYTES (default 1 MB), however large the upload is.
+
+The parsers take bytes and know nothing about the transport, so the Flask
+and Quart routes share them.
+"""
+import codecs
+import json
+import os
+from datetime import datetime
+from pymongo.errors import BulkWriteError
+from app.models.disease_report import DiseaseReport
+
+READ_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r\ufeff'
+
+
+class SyncPayloadError(Exception):
+    pass
+
+
+def chunk_size():
+    return int(os.getenv('SYNC_STREAM_CHUNK_SIZE', 100))
+
+
+def max_item_bytes():
+    return int(os.getenv('SYNC_MAX_ITEM_BYTES', 1024 * 1024))
+
+
+class _PushParser:
+    """feed() bytes, get back the items completed so far.
+
+    A syntax error is raised only after the items before it have been
+    returned, so every report up to the bad one still gets saved.
+    """
+
+    def __init__(self, max_item_size=None):
+        self.max_item_size = max_item_size or max_item_bytes()
+        self._error = None
+
+    def feed(self, data, final=False):
+        if self._error is not None:
+            raise self._error
+        items = []
+        try:
+            self._parse(data, final, items)
+        except SyncPayloadError as e:
+            if not items:
+                raise
+            self._error = e
+        return items
+
+    def close(self):
+        return self.feed(b'', final=True)
+
+
+class JSONArrayParser(_PushParser):
+    """Push parser for a top-level JSON array."""
+
+    def __init__(self, max_item_size=None):
+        super().__init__(max_item_size)
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._state = 'start'  # start, value, separator, done
+        self._count = 0
+
+    def _parse(self, data, final, items):
+        try:
+            self._buffer += self._text.decode(data, final)
+        except UnicodeDecodeError:
+            raise SyncPayloadError('Request body is not valid UTF-8')
+        buffer, pos = self._buffer, 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                break
+            char = buffer[pos]
+            if self._state == 'start':
+                if char != '[':
+                    raise SyncPayloadError('Streaming sync expects a JSON array of reports')
+                self._state, pos = 'value', pos + 1
+            elif self._state == 'value':
+                if char == ']' and self._count == 0:
+                    self._state, pos = 'done', pos + 1
+                    continue
+                try:
+                    item, end = self._decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as e:
+                    # A report cut off by the chunk boundary fails within a few
+                    # characters of the end, or inside an unterminated string
+                    cut_off = e.pos >= len(buffer) - 8 or e.msg.startswith('Unterminated string')
+                    if final or not cut_off:
+                        raise SyncPayloadError(f'Malformed report {self._count + 1}: {e.msg}')
+                    break
+                if end == len(buffer) and not final:
+                    # A number or literal may continue in the next chunk
+                    break
+                items.append(item)
+                self._count += 1
+                self._state, pos = 'separator', end
+            elif self._state == 'separator':
+                if char == ',':
+                    self._state, pos = 'value', pos + 1
+                elif char == ']':
+                    self._state, pos = 'done', pos + 1
+                else:
+                    raise SyncPayloadError(f"Expected ',' or ']' between reports, got {char!r}")
+            else:
+                raise SyncPayloadError('Unexpected data after the end of the array')
+        self._buffer = buffer[pos:]
+        if len(self._buffer) > self.max_item_size:
+            raise SyncPayloadError(f'A report exceeds {self.max_item_size} bytes')
+        if final and self._state != 'done':
+            raise SyncPayloadError('Request body ended before the end of the array')
+
+
+class NDJSONParser(_PushParser):
+    """Push parser for newline-delimited JSON, one report per line."""
+
+    def __init__(self, max_item_size=None):
+        super().__init__(max_item_size)
+        self._buffer = b''
+        self._line = 0
+
+    def _parse_line(self, line):
+        self._line += 1
+        line = line.strip()
+        if not line:
+            return []
+        try:
+            return [json.loads(line)]
+        except ValueError as e:
+            raise SyncPayloadError(f'Malformed JSON on line {self._line}: {e}')
+
+    def _parse(self, data, final, items):
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b'\n')
+        for line in lines:
+            items.extend(self._parse_line(line))
+        if len(self._buffer) > self.max_item_size:
+            raise SyncPayloadError(f'Line {self._line + 1} exceeds {self.max_item_size} bytes')
+        if final and self._buffer:
+            line, self._buffer = self._buffer, b''
+            items.extend(self._parse_line(line))
+
+
+def parser_for(mimetype):
+    return NDJSONParser() if mimetype == 'application/x-ndjson' else JSONArrayParser()
+
+
+def iter_chunks(read, parser, size=None):
+    """Parse a blocking ``read(n)`` stream and yield lists of up to ``size`` items."""
+    size = size or chunk_size()
+    pending = []
+    while True:
+        data = read(READ_SIZE)
+        try:
+            pending.extend(parser.feed(data) if data else parser.close())
+        except SyncPayloadError:
+            # Save the reports before the error, then report it
+            if pending:
+                yield pending
+            raise
+        while len(pending) >= size:
+            yield pending[:size]
+            pending = pending[size:]
+        if not data:
+            break
+    if pending:
+        yield pending
+
+
+class SyncStreamService:
+    """Validation and bulk insertion of one chunk of synced reports."""
+
+    @staticmethod
+    def build_chunk(items, user):
+        """Validate reports; returns (results with None where a report awaits insertion, documents).
+
+        ``documents`` pairs each result slot with its validated report.
+        """
+        results, documents = [], []
+        for item in items:
+            original_id = item.get('id') if isinstance(item, dict) else None
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError('Each report must be a JSON object')
+                report = DiseaseReport.from_payload(
+                    item,
+                    user,
+                    synced=True,
+                    timestamp=datetime.fromisoformat(item.get('timestamp', datetime.utcnow().isoformat()))
+                )
+                report.updated_at = datetime.utcnow()
+                report.validate()
+            except Exception as e:
+                results.append({'success': False, 'error': str(e), 'original_id': original_id})
+                continue
+            documents.append((len(results), original_id, report, report.to_mongo().to_dict()))
+            results.append(None)
+        return results, documents
+
+    @staticmethod
+    def write_errors(error):
+        """Per-document messages from an unordered insert_many failure."""
+        return {e['index']: e.get('errmsg', 'Write failed') for e in error.details.get('writeErrors', [])}
+
+    @staticmethod
+    def complete_chunk(results, documents, failed):
+        """Fill in the results after insert_many set each document's _id."""
+        for position, (slot, original_id, report, doc) in enumerate(documents):
+            if position in failed:
+                results[slot] = {'success': False, 'error': failed[position], 'original_id': original_id}
+                continue
+            report.id = doc['_id']
+            results[slot] = {'success': True, 'report': report.to_dict(), 'original_id': original_id,
+                             'merged': False}
+        return results
+
+    @staticmethod
+    def insert_chunk(collection, items, user):
+        """Validate and insert one chunk through pymongo; returns its results in input order."""
+        results, documents = SyncStreamService.build_chunk(items, user)
+        failed = {}
+        if documents:
+            try:
+                collection.insert_many([doc for *_, doc in documents], ordered=False)
+            except BulkWriteError as e:
+                failed = SyncStreamService.write_errors(e)
+        return SyncStreamService.complete_chunk(results, documents, failed)
+
+    @staticmethod
+    def result_lines(results):
+        return ''.join(json.dumps(result) + '\n' for result in results)
+
+    @staticmethod
+    def summary_line(processed, succeeded, error=None):
+        summary = {
+            'done': True,
+            'success': error is None,
+            'processed': processed,
+            'succeeded': succeeded,
+            'failed': processed - succeeded,
+            'message': f'Processed {processed} reports'
+        }
+        if error is not None:
+            summary['error'] = error
+        return json.dumps(summary) + '\n'
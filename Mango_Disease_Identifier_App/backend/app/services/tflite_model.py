@@ -0,0 +1,88 @@
+"""TensorFlow Lite model artifacts whose weights are shared by every process on a host.
+
+A Keras model is unpacked into private memory by every process that loads
+it. A ``.tflite`` file is a flatbuffer that the interpreter mmaps read-only.
+With the default delegates disabled, the built-in kernels read the weights
+straight from that mapping. N workers therefore share one page-cache copy of
+the weights, and each worker privately holds only its activation buffers.
+
+XNNPACK, the default CPU delegate, is faster but repacks the weights into
+private memory in every process. Set TFLITE_USE_XNNPACK=True to trade the
+sharing for speed.
+
+The interpreter comes from the small ``tflite-runtime`` package when it is
+installed, so serving does not import TensorFlow at all; otherwise from
+``tf.lite``. Artifacts are produced by ``python -m scripts.export_tflite``.
+"""
+import json
+import os
+import threading
+import time
+
+TFLITE_FILENAME = "mango_classifier.tflite"
+
+
+def _interpreter_module():
+    try:
+        from tflite_runtime import interpreter
+    except ImportError:  # tflite-runtime is optional; full TensorFlow ships the same interpreter
+        import tensorflow as tf
+
+        interpreter = tf.lite
+    return interpreter
+
+
+def read_signature(path):
+    """The output names written next to the artifact by scripts/export_tflite.py."""
+    try:
+        with open(f"{path}.json") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+class TFLiteModelVersion:
+    """Same interface as model_registry.ModelVersion, backed by a mmapped .tflite file.
+
+    Interpreters are not thread-safe and their thread pools do not survive
+    fork, so each thread of each process creates its own interpreter. They all
+    map the same file, so extra interpreters cost activations only.
+    """
+
+    def __init__(self, version, path, categories, num_threads=None):
+        self.version = version
+        self.path = path
+        self.categories = categories
+        self.num_threads = num_threads
+        self.signature = read_signature(path)
+        self.has_embedding = "embedding" in self.signature.get("outputs", {})
+        self.loaded_at = time.time()
+        self._local = threading.local()
+
+    def _runner(self):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            module = _interpreter_module()
+            options = {"model_path": self.path, "num_threads": self.num_threads}
+            if os.getenv("TFLITE_USE_XNNPACK", "False").lower() != "true":
+                options["experimental_op_resolver_type"] = module.experimental.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+            interpreter = module.Interpreter(**options)
+            local.runner = interpreter.get_signature_runner()
+            local.input_name = next(iter(local.runner.get_input_details()))
+            local.pid = os.getpid()
+        return local.runner, local.input_name
+
+    def _run(self, x):
+        runner, input_name = self._runner()
+        # The signature runner resizes the input to the batch and reallocates as needed
+        return runner(**{input_name: x})
+
+    def predict(self, x):
+        outputs = self._run(x)
+        return outputs[self.signature.get("outputs", {}).get("probabilities", "output_0")]
+
+    def embed(self, x):
+        """Penultimate-layer embeddings for a batch, shape (batch, features)."""
+        if not self.has_embedding:
+            raise ValueError(f"Model {self.version} has no embedding output")
+        return self._run(x)[self.signature["outputs"]["embedding"]]
@@ -0,0 +1,336 @@
+import fcntl
+import json
+import os
+import threading
+import time
+import numpy as np
+
+# Image digests are SHA-256 hex strings, stored as 32 raw bytes
+ID_BYTES = 32
+
+PQ_CODES = 256
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores, k):
+    """Indices of the k largest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+def _squared_distances(x, centroids):
+    return (
+        (x * x).sum(axis=1, keepdims=True)
+        - 2 * x @ centroids.T
+        + (centroids * centroids).sum(axis=1)[None, :]
+    )
+
+
+def kmeans(x, k, iterations=15, seed=0, chunk_size=65536):
+    """Plain Lloyd's k-means in NumPy; returns (centroids, assignments)."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=k, replace=len(x) < k)].copy()
+    assignments = np.zeros(len(x), dtype=np.int32)
+    for _ in range(iterations):
+        for start in range(0, len(x), chunk_size):
+            chunk = x[start:start + chunk_size]
+            assignments[start:start + chunk_size] = _squared_distances(chunk, centroids).argmin(axis=1)
+        counts = np.bincount(assignments, minlength=k)
+        nonempty = counts > 0
+        # Sum each cluster's points with one sort and reduceat (np.add.at is far slower)
+        order = np.argsort(assignments, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+        sums = np.add.reduceat(x[order], starts, axis=0)
+        centroids[nonempty] = sums / counts[nonempty, None]
+        # Re-seed empty clusters from random points so every list gets used
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), size=len(empty))]
+    return centroids, assignments
+
+
+class _Snapshot:
+    """Memory maps and IVF lists for the first ``count`` rows of an index."""
+
+    def __init__(self, index, count):
+        self.count = count
+        self.meta = dict(index.meta)
+        self.vectors = index._memmap("vectors.f32", np.float32, count, index.dim or 0)
+        self.ids = index._memmap("ids.bin", np.uint8, count, ID_BYTES)
+        self.codes = None
+        if not index.trained:
+            return
+
+        with np.load(index._path("ivfpq.npz")) as params:
+            self.coarse = params["coarse"]
+            self.codebooks = params["codebooks"]
+        m = self.meta["m"]
+        codes_count = min(count, index._file_rows("codes.u8", m), index._file_rows("lists.i32", 4))
+        self.codes = index._memmap("codes.u8", np.uint8, codes_count, m)
+        lists = (np.fromfile(index._path("lists.i32"), dtype=np.int32, count=codes_count)
+                 if codes_count else np.empty(0, dtype=np.int32))
+        # Inverted lists as one permutation plus offsets: list l is order[offsets[l]:offsets[l + 1]]
+        self.lists_order = np.argsort(lists, kind="stable").astype(np.int64)
+        self.lists_offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(lists, minlength=self.meta["nlist"]))]
+        )
+
+    def digest(self, row):
+        return bytes(self.ids[row]).hex()
+
+    def brute_force_scores(self, q, chunk_size=262144):
+        scores = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, chunk_size):
+            scores[start:start + chunk_size] = self.vectors[start:start + chunk_size] @ q
+        return scores
+
+    def ivfpq_candidates(self, q, k, nprobe):
+        nprobe = int(nprobe or self.meta.get("nprobe", 16))
+        refine = int(self.meta.get("refine", 10))
+        probed = _top_k(self.coarse @ q, nprobe)
+        rows = np.concatenate([
+            self.lists_order[self.lists_offsets[l]:self.lists_offsets[l + 1]] for l in probed
+        ])
+        if len(rows) == 0:
+            return rows
+
+        # Asymmetric distance: per-subspace table of |q_j - c|^2, summed over the codes
+        m, dsub = self.meta["m"], self.meta["dsub"]
+        table = ((self.codebooks - q.reshape(m, dsub)[:, None, :]) ** 2).sum(axis=2)
+        distances = table[np.arange(m), np.asarray(self.codes[rows])].sum(axis=1)
+
+        keep = min(len(rows), k * refine)
+        return rows[np.argpartition(distances, keep - 1)[:keep]]
+
+
+class VectorIndex:
+    """Append-only, memory-mapped cosine-similarity index keyed by image digest.
+
+    Files in ``directory``::
+
+        meta.json     dimension and IVF-PQ parameters
+        vectors.f32   unit-normalized float32 rows (the exact vectors)
+        ids.bin       32-byte digests, one per row
+        ivfpq.npz     coarse centroids and PQ codebooks, once trained
+        codes.u8      PQ codes, one row of ``m`` bytes per vector
+        lists.i32     IVF list number of each vector
+
+    Until ``train`` is run, search is a brute-force matrix product over the
+    memory-mapped vectors. After training, search probes the ``nprobe``
+    closest IVF lists, ranks their candidates by PQ distance, and re-ranks
+    the best with the exact vectors. ``add`` appends to every file under a
+    file lock, so a single indexer can grow the index while serving
+    processes keep reading it. Readers pick up new rows on ``refresh``.
+    """
+
+    def __init__(self, directory, dim=None, refresh_interval=None):
+        self.directory = directory
+        self.refresh_interval = float(
+            refresh_interval if refresh_interval is not None else os.getenv("VECTOR_INDEX_REFRESH_SECONDS", 5)
+        )
+        self.meta = self._read_meta()
+        if dim is not None and self.meta.get("dim") not in (None, dim):
+            raise ValueError(f"Index at {directory} has dimension {self.meta['dim']}, not {dim}")
+        if dim is not None and "dim" not in self.meta:
+            self.meta["dim"] = int(dim)
+        self._lock = threading.Lock()
+        self._known_ids = None
+        self._refreshed_at = 0
+        self._snapshot = None
+
+    # -- files -----------------------------------------------------------
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._path("meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_meta(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._path(f".meta.{os.getpid()}")
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._path("meta.json"))
+
+    @property
+    def dim(self):
+        return self.meta.get("dim")
+
+    @property
+    def trained(self):
+        return "nlist" in self.meta
+
+    def _file_rows(self, name, row_bytes):
+        try:
+            return os.path.getsize(self._path(name)) // row_bytes
+        except FileNotFoundError:
+            return 0
+
+    def _memmap(self, name, dtype, count, width):
+        if count == 0:
+            return np.empty((0, width), dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode="r", shape=(count, width))
+
+    def __len__(self):
+        if not self.dim:
+            return 0
+        # ids.bin is written last, so it bounds the rows that are complete everywhere
+        return self._file_rows("ids.bin", ID_BYTES)
+
+    # -- reading ---------------------------------------------------------
+
+    def refresh(self, force=False):
+        """Re-map the files if another process has appended rows since the last look."""
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.refresh_interval:
+            return
+        with self._lock:
+            self._refreshed_at = now
+            self.meta = self._read_meta()
+            count = len(self)
+            if not force and self._snapshot is not None and self._snapshot.count == count:
+                return
+            # Built off to the side and swapped in whole, so concurrent searches
+            # never mix arrays from two generations
+            self._snapshot = _Snapshot(self, count)
+
+    def search(self, query, k=10, nprobe=None):
+        """Return up to k (digest, cosine similarity) pairs, most similar first."""
+        self.refresh()
+        snap = self._snapshot
+        if snap is None or snap.count == 0:
+            return []
+        q = _normalize(query)[0]
+
+        if snap.codes is None or len(snap.codes) == 0:
+            scores = snap.brute_force_scores(q)
+            best = _top_k(scores, k)
+            return [(snap.digest(r), float(scores[r])) for r in best]
+
+        # Rows appended while training was in progress have no codes yet; scan them exactly
+        tail = np.arange(len(snap.codes), snap.count)
+        rows = np.unique(np.concatenate([snap.ivfpq_candidates(q, k, nprobe), tail]))
+        scores = np.asarray(snap.vectors[rows]) @ q
+        best = _top_k(scores, k)
+        return [(snap.digest(rows[i]), float(scores[i])) for i in best]
+
+    # -- writing ---------------------------------------------------------
+
+    def contains(self, digest):
+        if self._known_ids is None:
+            count = len(self)
+            ids = np.fromfile(self._path("ids.bin"), dtype=np.uint8, count=count * ID_BYTES) if count else []
+            self._known_ids = {bytes(ids[i:i + ID_BYTES]) for i in range(0, len(ids), ID_BYTES)}
+        return bytes.fromhex(digest) in self._known_ids
+
+    def add(self, digests, vectors):
+        """Append vectors for digests not yet indexed; returns the number added."""
+        vectors = _normalize(vectors)
+        if self.dim is None:
+            self.meta["dim"] = int(vectors.shape[1])
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+        rows = []
+        for i, digest in enumerate(digests):
+            if not self.contains(digest):
+                rows.append(i)
+                self._known_ids.add(bytes.fromhex(digest))
+        if not rows:
+            return 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        if not os.path.exists(self._path("meta.json")):
+            self._write_meta()
+        new_vectors = vectors[rows]
+        with open(self._path(".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another process may have trained the index since this one opened it
+            self.meta = self._read_meta() or self.meta
+            with open(self._path("vectors.f32"), "ab") as f:
+                f.write(new_vectors.tobytes())
+            if self.trained:
+                self._append_codes(new_vectors)
+            with open(self._path("ids.bin"), "ab") as f:
+                f.write(b"".join(bytes.fromhex(digests[i]) for i in rows))
+        return len(rows)
+
+    def _append_codes(self, vectors):
+        with np.load(self._path("ivfpq.npz")) as params:
+            coarse, codebooks = params["coarse"], params["codebooks"]
+        lists = _squared_distances(vectors, coarse).argmin(axis=1).astype(np.int32)
+        codes = self._encode(vectors, codebooks)
+        with open(self._path("codes.u8"), "ab") as f:
+            f.write(codes.tobytes())
+        with open(self._path("lists.i32"), "ab") as f:
+            f.write(lists.tobytes())
+
+    def _encode(self, vectors, codebooks):
+        m, _, dsub = codebooks.shape
+        codes = np.empty((len(vectors), m), dtype=np.uint8)
+        for j in range(m):
+            sub = vectors[:, j * dsub:(j + 1) * dsub]
+            codes[:, j] = _squared_distances(sub, codebooks[j]).argmin(axis=1)
+        return codes
+
+    def train(self, nlist=None, m=None, nprobe=16, refine=10, sample_size=100000, iterations=10, seed=0):
+        """Train IVF centroids and PQ codebooks on a sample, then encode every row."""
+        count = len(self)
+        if count == 0:
+            raise ValueError("Cannot train an empty index")
+        dim = self.dim
+        nlist = int(nlist or max(1, min(4096, int(4 * np.sqrt(count)))))
+        m = int(m or next(c for c in (32, 16, 8, 4, 2, 1) if dim % c == 0))
+        if dim % m:
+            raise ValueError(f"Dimension {dim} is not divisible by m={m}")
+        dsub = dim // m
+
+        rng = np.random.default_rng(seed)
+        vectors = self._memmap("vectors.f32", np.float32, count, dim)
+        sample = np.asarray(vectors[np.sort(rng.choice(count, size=min(count, sample_size), replace=False))])
+
+        coarse, _ = kmeans(sample, min(nlist, len(sample)), iterations, seed)
+        codebooks = np.stack([
+            kmeans(sample[:, j * dsub:(j + 1) * dsub], min(PQ_CODES, len(sample)), iterations, seed)[0]
+            for j in range(m)
+        ])
+
+        with open(self._path(".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            np.savez(self._path("ivfpq.tmp.npz"), coarse=coarse, codebooks=codebooks)
+            for name in ("codes.u8", "lists.i32"):
+                if os.path.exists(self._path(name)):
+                    os.unlink(self._path(name))
+            os.replace(self._path("ivfpq.tmp.npz"), self._path("ivfpq.npz"))
+            self.meta.update(nlist=len(coarse), m=m, dsub=dsub, nprobe=nprobe, refine=refine)
+            self._write_meta()
+            count = len(self)
+            vectors = self._memmap("vectors.f32", np.float32, count, dim)
+            chunk_size = 65536
+            for start in range(0, count, chunk_size):
+                self._append_codes(np.asarray(vectors[start:min(start + chunk_size, count)]))
+        self.refresh(force=True)
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "count": len(self),
+            "dim": self.dim,
+            "trained": self.trained,
+            **{key: self.meta[key] for key in ("nlist", "m", "nprobe", "refine") if key in self.meta},
+        }
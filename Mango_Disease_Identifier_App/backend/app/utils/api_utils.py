@@ -1,4 +1,5 @@
 from flask import jsonify
+from flask.json.provider import JSONProvider
 from bson.objectid import ObjectId
 import json
 import datetime
@@ -35,10 +36,19 @@ class JSONEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, ObjectId):
             return str(obj)
-        if isinstance(obj, datetime.datetime):
+        if isinstance(obj, (datetime.datetime, datetime.date)):
             return obj.isoformat()
         return json.JSONEncoder.default(self, obj)
 
+class MongoJSONProvider(JSONProvider):
+    """Flask JSON provider that serializes ObjectId and datetime values."""
+    
+    def dumps(self, obj, **kwargs):
+        return json.dumps(obj, cls=JSONEncoder, **kwargs)
+    
+    def loads(self, s, **kwargs):
+        return json.loads(s, **kwargs)
+
 def format_user_response(user):
     """Format a user object for API response."""
     if not user:
@@ -0,0 +1,31 @@
+"""Per-route request body limits.
+
+MAX_CONTENT_LENGTH is sized for a single image upload (see create_app), so
+werkzeug answers 413 before it parses a larger body into memory or temp
+files. The few routes that legitimately take more declare their own limit
+with @body_limit, placed directly under the route decorator.
+"""
+from flask import current_app
+from flask.wrappers import Request
+
+
+def body_limit(max_bytes):
+    """Set the largest body the view accepts: bytes, None for no limit, or a callable returning either."""
+    def decorator(view):
+        view.max_content_length = max_bytes
+        return view
+    return decorator
+
+
+class BodyLimitRequest(Request):
+    """Request whose MAX_CONTENT_LENGTH can be overridden by the matched view."""
+
+    @property
+    def max_content_length(self):
+        if not current_app:
+            return None
+        view = current_app.view_functions.get(self.endpoint) if self.url_rule else None
+        if view is None or not hasattr(view, "max_content_length"):
+            return current_app.config["MAX_CONTENT_LENGTH"]
+        limit = view.max_content_length
+        return limit() if callable(limit) else limit
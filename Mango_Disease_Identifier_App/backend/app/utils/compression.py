@@ -0,0 +1,200 @@
+"""Negotiated response compression and gzip request bodies.
+
+Responses: JSON, NDJSON, CSV and text bodies at or above COMPRESS_MIN_SIZE bytes
+are compressed with brotli (when the ``brotli`` package is installed and the
+client accepts it) or gzip. Streamed responses are compressed chunk by chunk
+and flushed after each chunk, so clients still see rows as they are produced.
+
+Requests: ``Content-Encoding: gzip`` bodies are accepted on the paths in
+DECOMPRESS_PATHS. They are decompressed lazily while the body is read, and
+reading past MAX_DECOMPRESSED_BODY_BYTES fails with 413, which guards
+against zip bombs.
+"""
+import io
+import os
+import zlib
+from flask import jsonify, request
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from werkzeug.wsgi import LimitedStream
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'text/csv',
+    'text/plain',
+    'text/html',
+}
+
+DECOMPRESS_PATHS = ('/api/disease-reports/sync', '/predict')
+
+
+def _accepted_encodings(header):
+    """Parse Accept-Encoding into the set of codings with a non-zero q value."""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def choose_encoding(accept_encoding):
+    accepted = _accepted_encodings(accept_encoding or '')
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._obj = brotli.Compressor(quality=min(level, 11))
+        else:
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._obj.process(data) if self.encoding == 'br' else self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush() if self.encoding == 'br' else self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.finish() if self.encoding == 'br' else self._obj.flush(zlib.Z_FINISH)
+
+
+def _compress_stream(chunks, compressor):
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        out = compressor.compress(chunk) + compressor.flush()
+        if out:
+            yield out
+    yield compressor.finish()
+
+
+def compress_response(response):
+    """after_request hook: compress the body if the client accepts it."""
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 304)
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or request.method == 'HEAD'
+    ):
+        return response
+
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+
+    level = int(os.getenv('COMPRESS_LEVEL', 5))
+
+    if response.is_streamed:
+        compressor = _Compressor(encoding, level)
+        response.response = _compress_stream(response.response, compressor)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < int(os.getenv('COMPRESS_MIN_SIZE', 1024)):
+            return response
+        compressor = _Compressor(encoding, level)
+        response.set_data(compressor.compress(data) + compressor.finish())
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+class _GzipRequestReader(io.RawIOBase):
+    """Decompresses a gzip request body on read, refusing to exceed a size limit."""
+
+    def __init__(self, stream, max_size, chunk_size=64 * 1024):
+        self._stream = stream
+        self._max_size = max_size
+        self._chunk_size = chunk_size
+        # wbits=47 accepts both gzip and zlib headers
+        self._decompressor = zlib.decompressobj(47)
+        self._pending = b''
+        self._produced = 0
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending and not self._eof:
+            if self._decompressor.unconsumed_tail:
+                data = self._decompressor.unconsumed_tail
+            else:
+                data = self._stream.read(self._chunk_size)
+                if not data:
+                    self._pending = self._decompressor.flush()
+                    self._eof = True
+                    break
+            try:
+                # Bound each step so a bomb cannot allocate more than one chunk at once
+                self._pending = self._decompressor.decompress(data, self._chunk_size)
+            except zlib.error:
+                raise BadRequest(description='Malformed gzip request body')
+            if self._decompressor.eof:
+                self._eof = True
+
+            self._produced += len(self._pending)
+            if self._produced > self._max_size:
+                raise RequestEntityTooLarge(
+                    description=f'Decompressed request body exceeds {self._max_size} bytes'
+                )
+
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+class DecompressRequestMiddleware:
+    """WSGI middleware that transparently gunzips request bodies on selected paths."""
+
+    def __init__(self, wsgi_app, paths=DECOMPRESS_PATHS, max_size=None):
+        self.wsgi_app = wsgi_app
+        self.paths = paths
+        self.max_size = max_size or int(os.getenv('MAX_DECOMPRESSED_BODY_BYTES', 50 * 1024 * 1024))
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        path = environ.get('PATH_INFO', '')
+        if encoding in ('gzip', 'x-gzip', 'deflate') and path.startswith(self.paths):
+            stream = environ['wsgi.input']
+            content_length = environ.get('CONTENT_LENGTH')
+            if content_length:
+                stream = LimitedStream(stream, int(content_length))
+
+            environ['wsgi.input'] = io.BufferedReader(_GzipRequestReader(stream, self.max_size))
+            # The decompressed length is unknown; read until the stream ends
+            environ.pop('CONTENT_LENGTH', None)
+            environ.pop('HTTP_CONTENT_ENCODING', None)
+            environ['wsgi.input_terminated'] = True
+        return self.wsgi_app(environ, start_response)
+
+
+def init_compression(app):
+    """Enable response compression and gzip request bodies on an app."""
+    app.after_request(compress_response)
+    app.wsgi_app = DecompressRequestMiddleware(app.wsgi_app)
+
+    @app.errorhandler(RequestEntityTooLarge)
+    def request_too_large(e):
+        return jsonify({'success': False, 'message': e.description}), 413
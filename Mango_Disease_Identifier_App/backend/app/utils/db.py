@@ -1,6 +1,9 @@
 import os
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring, timeout as operation_timeout
+from pymongo.errors import ConnectionFailure, PyMongoError
 from dotenv import load_dotenv
+import mongoengine
+from app.utils.resilience import get_breaker
 
 # Load environment variables
 load_dotenv()
@@ -9,11 +12,135 @@ load_dotenv()
 mongo_client = None
 db = None
 
+# Set by batch scripts, whose long reads and index builds must not hit the request deadline
+_batch_mode = False
+
+# Disease reports live in a separate database accessed through mongoengine
+REPORTS_DB_NAME = 'mango_disease_db'
+REPORTS_DB_HOST = 'localhost'
+REPORTS_DB_PORT = 27017
+
+def get_mongo_uri():
+    return os.getenv("MONGO_URI", "mongodb://localhost:27017/mango_disease_db")
+
+def is_mongo_failure(error):
+    """Whether an error means MongoDB is unreachable or too slow, rather than a bad request."""
+    return isinstance(error, ConnectionFailure) or (isinstance(error, PyMongoError) and error.timeout)
+
+class MongoBreakerListener(monitoring.CommandListener, monitoring.TopologyListener):
+    """Feeds every command's outcome into the "mongo" circuit breaker.
+
+    Network errors and timeouts count as failures; server errors such as a
+    duplicate key do not. The breaker also opens as soon as the topology has
+    no readable server left. Requests would otherwise each wait out the
+    server selection timeout.
+    """
+
+    # Server error codes for a timeout, a shutdown or a node that cannot serve the operation
+    FAILURE_CODES = {50, 91, 189, 262, 10107, 11600, 11602, 13435, 13436}
+    FAILURE_TYPES = {"AutoReconnect", "NetworkTimeout", "ConnectionFailure", "ExecutionTimeout", "NotPrimaryError"}
+
+    def __init__(self):
+        self.breaker = get_breaker("mongo")
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.breaker.record_success()
+
+    def failed(self, event):
+        failure = event.failure or {}
+        if failure.get("code") in self.FAILURE_CODES or failure.get("errtype") in self.FAILURE_TYPES:
+            self.breaker.record_failure(RuntimeError(f"{event.command_name}: {failure.get('errmsg')}"))
+
+    def opened(self, event):
+        pass
+
+    def description_changed(self, event):
+        was_readable = event.previous_description.has_readable_server()
+        is_readable = event.new_description.has_readable_server()
+        if was_readable and not is_readable:
+            self.breaker.trip("no reachable MongoDB server")
+
+    def closed(self, event):
+        pass
+
+def mongo_client_options():
+    """Timeouts for every MongoClient, so a slow or unreachable server cannot pin a worker.
+
+    MONGO_TIMEOUT_MS is the deadline for each request-path operation
+    (pymongo's timeoutMS); 0 disables it. It also sets maxTimeMS on the
+    server, which counts over a cursor's whole life, so long reads opt out:
+    streaming cursors through iter_without_timeout(), batch scripts through
+    use_batch_mode().
+    """
+    options = {
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 3000)),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 3000)),
+        "event_listeners": [MongoBreakerListener()],
+    }
+    timeout_ms = int(os.getenv("MONGO_TIMEOUT_MS", 5000))
+    if timeout_ms > 0 and not _batch_mode:
+        options["timeoutMS"] = timeout_ms
+    return options
+
+def use_batch_mode():
+    """Drop the per-operation deadline for this process; call before connecting."""
+    global _batch_mode
+    _batch_mode = True
+
+def iter_without_timeout(cursor):
+    """Iterate a cursor with no deadline on its find and getMore commands."""
+    while True:
+        # timeout(0) overrides the client's timeoutMS; timeout(None) would fall back to it
+        with operation_timeout(0):
+            try:
+                doc = next(cursor)
+            except StopIteration:
+                return
+        yield doc
+
+def _client_class():
+    """MongoClient, or mongomock's in-memory client for ``mongomock://`` URIs.
+
+    The in-memory stand-in lets load tests and local experiments run without
+    a MongoDB server; mongomock is only imported when it is asked for.
+    """
+    if get_mongo_uri().startswith("mongomock://"):
+        import mongomock
+        return mongomock.MongoClient
+    return MongoClient
+
 def get_db():
     """Get the database connection."""
     global mongo_client, db
     if db is None:
-        mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/mango_disease_db")
-        mongo_client = MongoClient(mongo_uri)
+        mongo_uri = get_mongo_uri()
+        client_class = _client_class()
+        if client_class is MongoClient:
+            mongo_client = MongoClient(mongo_uri, **mongo_client_options())
+        else:
+            mongo_client = client_class(mongo_uri.replace("mongomock://", "mongodb://", 1))
         db = mongo_client.get_database()
-    return db 
\ No newline at end of file
+    return db 
+
+def connect_mongoengine():
+    """Connect the default mongoengine alias used by DiseaseReport."""
+    client_class = _client_class()
+    if client_class is MongoClient:
+        mongoengine.connect(REPORTS_DB_NAME, host=REPORTS_DB_HOST, port=REPORTS_DB_PORT, **mongo_client_options())
+    else:
+        mongoengine.connect(REPORTS_DB_NAME, host="mongodb://localhost", mongo_client_class=client_class)
+
+def reset_connections():
+    """Drop MongoDB clients inherited from a parent process and reconnect.
+
+    MongoClient is not fork-safe: its monitor threads do not survive fork, so
+    each pre-forked worker must open its own connections.
+    """
+    global mongo_client, db
+    mongo_client = None
+    db = None
+    mongoengine.disconnect()
+    connect_mongoengine()
@@ -0,0 +1,189 @@
+"""The indexes every collection needs, and the hot queries they must serve.
+
+INDEXES is the single list of required indexes. disease_reports declares
+its indexes in DiseaseReport.meta, and they are read from there; mongoengine
+does not build them on its own. ``python -m scripts.ensure_indexes`` creates
+anything missing at deploy time, and is safe to run repeatedly.
+``python -m scripts.check_query_plans`` runs ``explain`` on every entry in
+hot_queries() and fails if any of them would scan the collection.
+
+When adding a query on a request path, add its shape to hot_queries() and,
+if needed, its index here.
+"""
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel, timeout as operation_timeout
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from app.utils.db import get_db
+
+INDEXES = {
+    "users": [
+        # Every login, signup, resend and password reset looks users up by email
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "otps": [
+        # Serves verification and, by prefix, replacing a user's previous codes
+        IndexModel([("email", ASCENDING), ("purpose", ASCENDING), ("code", ASCENDING)]),
+        # Expired codes are removed by MongoDB instead of piling up
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "refresh_tokens": [
+        # /api/auth/refresh finds the presented token by its hash and nothing else
+        IndexModel([("token_hash", ASCENDING)], unique=True),
+        IndexModel([("family_id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "prediction_jobs": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "prediction_events": [
+        IndexModel([("model_version", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+}
+
+# Indexes replaced by a declared one that MongoDB cannot hold alongside it.
+# A collection has at most one text index, so the global location index has
+# to go before the (user, location) one can be built.
+SUPERSEDED = {
+    "disease_reports": ["location_text"],
+}
+
+
+def _report_indexes():
+    from app.models.disease_report import DiseaseReport
+
+    models = []
+    for spec in DiseaseReport._meta["index_specs"]:
+        options = {key: value for key, value in spec.items() if key != "fields"}
+        models.append(IndexModel(spec["fields"], **options))
+    return models
+
+
+def declared_indexes():
+    return dict(INDEXES, disease_reports=_report_indexes())
+
+
+def get_collection(name):
+    if name == "disease_reports":
+        # Reports may live in a separate database (REPORTS_DB_*)
+        from app.models.disease_report import DiseaseReport
+
+        return DiseaseReport._get_collection()
+    return get_db()[name]
+
+
+_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def _options(document):
+    return {key: document[key] for key in _OPTIONS if key in document}
+
+
+def _find_existing(model, existing):
+    """The name of an existing index equivalent to ``model`` and whether its options differ."""
+    document = model.document
+    if document["name"] in existing:
+        info = existing[document["name"]]
+        return document["name"], _options(info) != _options(document)
+    key = list(document["key"].items())
+    for name, info in existing.items():
+        if [tuple(pair) for pair in info["key"]] == key:
+            return name, _options(info) != _options(document)
+    return None, False
+
+
+def ensure_indexes(names=None, dry_run=False):
+    """Create missing declared indexes; returns (collection, index, status, detail) rows.
+
+    Status is ``ok``, ``created``, ``missing`` (with dry_run), ``conflict`` (an
+    index with the same keys or name but other options exists and has to be
+    dropped by hand), ``failed``, ``dropped`` or ``superseded`` (with dry_run)
+    for an index listed in SUPERSEDED, or ``undeclared`` (present but not
+    declared; reported, never dropped).
+    """
+    rows = []
+    for collection_name, models in declared_indexes().items():
+        if names and collection_name not in names:
+            continue
+        collection = get_collection(collection_name)
+        existing = collection.index_information()
+        for name in SUPERSEDED.get(collection_name, ()):
+            if name not in existing:
+                continue
+            if dry_run:
+                rows.append((collection_name, name, "superseded", ""))
+                continue
+            try:
+                collection.drop_index(name)
+                del existing[name]
+                rows.append((collection_name, name, "dropped", ""))
+            except OperationFailure as e:
+                rows.append((collection_name, name, "failed", str(e)))
+        matched = {"_id_"} | set(SUPERSEDED.get(collection_name, ()))
+        for model in models:
+            name, differs = _find_existing(model, existing)
+            if name is not None:
+                matched.add(name)
+                if differs:
+                    rows.append((collection_name, name, "conflict",
+                                 f"exists with {_options(existing[name])}, declared {_options(model.document)}"))
+                else:
+                    rows.append((collection_name, name, "ok", ""))
+                continue
+            if dry_run:
+                rows.append((collection_name, model.document["name"], "missing", ""))
+                continue
+            try:
+                # Building on a large collection takes far longer than the request deadline
+                with operation_timeout(0):
+                    created = collection.create_indexes([model])[0]
+                rows.append((collection_name, created, "created", ""))
+            except DuplicateKeyError as e:
+                rows.append((collection_name, model.document["name"], "failed", f"remove the duplicates first: {e}"))
+            except OperationFailure as e:
+                rows.append((collection_name, model.document["name"], "failed", str(e)))
+        for name in existing:
+            if name not in matched:
+                rows.append((collection_name, name, "undeclared", ""))
+    return rows
+
+
+def hot_queries():
+    """(name, collection, filter, sort, limit) for each query on a request path.
+
+    Values are placeholders; only the shape matters to the planner. Report
+    search shapes come from ReportQueryService.query_shapes() instead.
+    """
+    from app.models.otp import OTP
+    from app.models.refresh_token import RefreshToken
+    from app.services.duplicate_detector import duplicate_detector
+    from app.services.prediction_jobs import PredictionJobService
+
+    user_id = ObjectId()
+    email = "someone@example.com"
+    now = datetime.utcnow()
+    rows_query, _ = duplicate_detector.rows_query(user_id)
+    return [
+        ("user by email", "users", {"email": email}, None, 0),
+        ("active otp", "otps", OTP.active_otp_query(email, "123456"), None, 0),
+        ("replace otps", "otps", {"email": email, "purpose": "verification"}, None, 0),
+        ("refresh token", "refresh_tokens", RefreshToken.claim_query("token"), None, 0),
+        ("revoke token family", "refresh_tokens", {"family_id": "0" * 32, "revoked_at": None}, None, 0),
+        ("revoke user's tokens", "refresh_tokens", {"user_id": user_id, "revoked_at": None}, None, 0),
+        ("report list", "disease_reports", {"user": user_id, "deleted": {"$ne": True}}, [("timestamp", DESCENDING)], 0),
+        ("report stats", "disease_reports", {"user": user_id, "deleted": {"$ne": True}, "duplicate_of": None}, None, 0),
+        ("first sync page", "disease_reports", {"user": user_id, "deleted": {"$ne": True}},
+         [("updated_at", ASCENDING), ("_id", ASCENDING)], 101),
+        ("delta sync page", "disease_reports",
+         {"user": user_id, "$or": [{"updated_at": {"$gt": now}}, {"updated_at": now, "_id": {"$gt": ObjectId()}}]},
+         [("updated_at", ASCENDING), ("_id", ASCENDING)], 101),
+        ("duplicate candidates", "disease_reports", rows_query, None, 0),
+        ("similar case reports", "disease_reports", {"image_digest": {"$in": ["0" * 64]}, "deleted": {"$ne": True}},
+         None, 0),
+        ("claim prediction job", "prediction_jobs", PredictionJobService.claim_query(now),
+         [("created_at", ASCENDING)], 1),
+        ("user's prediction jobs", "prediction_jobs", {"user_id": str(user_id)}, [("created_at", DESCENDING)], 20),
+    ]
@@ -0,0 +1,52 @@
+def plan_stages(plan):
+    """Flatten the stage names of a query plan tree."""
+    stages = [plan.get('stage')]
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            stages.extend(plan_stages(plan[key]))
+    for child in plan.get('inputStages', []):
+        stages.extend(plan_stages(child))
+    return [stage for stage in stages if stage]
+
+def plan_key_patterns(plan):
+    """Key patterns of the indexes a query plan tree reads."""
+    patterns = [plan['keyPattern']] if 'keyPattern' in plan else []
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            patterns.extend(plan_key_patterns(plan[key]))
+    for child in plan.get('inputStages', []):
+        patterns.extend(plan_key_patterns(child))
+    return patterns
+
+def _winning_plan(explain):
+    planner = explain.get('queryPlanner')
+    if planner is None:
+        # Aggregations nest the planner inside their first stage
+        for stage in explain.get('stages', []):
+            if '$cursor' in stage:
+                planner = stage['$cursor']['queryPlanner']
+                break
+    return planner['winningPlan'] if planner else None
+
+def winning_plan_stages(explain):
+    """Stage names of the winning plan in a find/aggregate explain document."""
+    plan = _winning_plan(explain)
+    return plan_stages(plan) if plan else []
+
+def winning_plan_text_indexes(explain):
+    """Key patterns of the text indexes (those with an _fts key) the winning plan reads."""
+    plan = _winning_plan(explain)
+    return [pattern for pattern in plan_key_patterns(plan) if '_fts' in pattern] if plan else []
+
+def explain_find(collection, query, sort=None, limit=0, hint=None):
+    cursor = collection.find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+    if hint:
+        cursor = cursor.hint(hint)
+    return cursor.explain()
+
+def uses_collscan(explain):
+    return 'COLLSCAN' in winning_plan_stages(explain)
@@ -0,0 +1,294 @@
+"""Deadlines, retries and circuit breakers for calls to MongoDB and SMTP.
+
+Each dependency has one CircuitBreaker per process. After
+``<NAME>_BREAKER_THRESHOLD`` consecutive failures (default
+BREAKER_FAILURE_THRESHOLD, 5), the breaker opens. Calls then fail at once with
+CircuitOpenError instead of waiting on a dependency known to be unhealthy.
+After ``<NAME>_BREAKER_RESET_SECONDS`` (default BREAKER_RESET_SECONDS, 30), a
+single probe call is let through: if it succeeds the breaker closes, and if it
+fails the breaker opens again.
+
+``call()`` and ``call_async()`` run an operation through its dependency's
+breaker. They retry failures listed in ``retry_on`` with full-jitter
+exponential backoff, and never sleep past the caller's deadline.
+"""
+import asyncio
+import functools
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, dependency, retry_after):
+        super().__init__(f"{dependency} is unavailable; retry in {retry_after:.0f}s")
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = None
+        self.counters = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+        self.last_failure = None
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probe_started = None
+        return self._state
+
+    def retry_after(self):
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def allow(self):
+        """Whether a call may go ahead; in half-open state only one probe at a time may."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            # A probe that never reported back (say, a request that did not touch the
+            # dependency after all) frees its slot after another reset_timeout
+            if state == HALF_OPEN and (
+                self._probe_started is None or self._clock() - self._probe_started >= self.reset_timeout
+            ):
+                self._probe_started = self._clock()
+                return True
+            self.counters["rejected"] += 1
+            return False
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go ahead."""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def record_success(self):
+        with self._lock:
+            self.counters["successes"] += 1
+            self._failures = 0
+            self._probe_started = None
+            if self._state != CLOSED:
+                logger.info("Circuit breaker for %s closed", self.name)
+            self._state = CLOSED
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.counters["failures"] += 1
+            self._failures += 1
+            self._probe_started = None
+            if error is not None:
+                self.last_failure = {"error": f"{type(error).__name__}: {error}"[:300], "at": time.time()}
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self.counters["opened"] += 1
+                logger.warning("Circuit breaker for %s opened after %s consecutive failures: %s",
+                               self.name, self._failures, error)
+
+    def trip(self, reason):
+        """Open the breaker right away, e.g. when monitoring shows no server is reachable."""
+        with self._lock:
+            if self._state == OPEN:
+                return
+            self._state = OPEN
+            self._opened_at = self._clock()
+            self.counters["opened"] += 1
+            self.last_failure = {"error": reason, "at": time.time()}
+            logger.warning("Circuit breaker for %s opened: %s", self.name, reason)
+
+    def status(self):
+        with self._lock:
+            state = self._current_state()
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "retry_after": max(0.0, self.reset_timeout - (self._clock() - self._opened_at)) if state == OPEN else 0.0,
+                "last_failure": self.last_failure,
+                **self.counters,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """The process-wide breaker for a dependency, configured from the environment."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            prefix = name.upper()
+            breaker = _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=int(os.getenv(f"{prefix}_BREAKER_THRESHOLD", os.getenv("BREAKER_FAILURE_THRESHOLD", 5))),
+                reset_timeout=float(os.getenv(f"{prefix}_BREAKER_RESET_SECONDS", os.getenv("BREAKER_RESET_SECONDS", 30))),
+            )
+        return breaker
+
+
+def breaker_states():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.status() for breaker in breakers}
+
+
+def backoff_delay(attempt, base=0.1, cap=2.0, rng=random):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _matches(condition, error):
+    """``condition`` is a tuple of exception types or a predicate."""
+    if isinstance(condition, tuple):
+        return isinstance(error, condition)
+    return condition(error)
+
+
+def _next_delay(attempt, retries, base_delay, deadline):
+    """Delay before the next attempt, or None when the retry budget or deadline is spent."""
+    if attempt >= retries:
+        return None
+    delay = backoff_delay(attempt, base_delay)
+    if deadline is not None and time.monotonic() + delay >= deadline:
+        return None
+    return delay
+
+
+def call(dependency, fn, *args, retries=0, retry_on=(), is_failure=None, timeout=None, base_delay=0.1, **kwargs):
+    """Run ``fn`` through the dependency's circuit breaker.
+
+    ``retry_on`` and ``is_failure`` are exception types or predicates.
+    ``is_failure`` decides whether an exception counts against the breaker;
+    by default only retryable ones do, so application errors such as a
+    duplicate key never trip it. ``timeout`` is the deadline for the whole
+    call: no retry starts after it. Each attempt must be bounded by the
+    operation itself (socket timeouts, MongoDB timeoutMS).
+    """
+    breaker = get_breaker(dependency)
+    is_failure = is_failure or retry_on
+    deadline = time.monotonic() + timeout if timeout else None
+    attempt = 0
+    while True:
+        breaker.check()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if not _matches(is_failure, e):
+                breaker.record_success()
+                raise
+            breaker.record_failure(e)
+            delay = _next_delay(attempt, retries, base_delay, deadline) if _matches(retry_on, e) else None
+            if delay is None:
+                raise
+            logger.info("Retrying %s in %.2fs after %s", dependency, delay, e)
+            time.sleep(delay)
+            attempt += 1
+            continue
+        breaker.record_success()
+        return result
+
+
+async def call_async(dependency, fn, *args, retries=0, retry_on=(), is_failure=None, timeout=None, base_delay=0.1, **kwargs):
+    """Awaitable counterpart of call(); ``timeout`` cancels an attempt still running at the deadline."""
+    breaker = get_breaker(dependency)
+    is_failure = is_failure or (lambda e: isinstance(e, asyncio.TimeoutError) or _matches(retry_on, e))
+    deadline = time.monotonic() + timeout if timeout else None
+    attempt = 0
+    while True:
+        breaker.check()
+        try:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            result = await asyncio.wait_for(fn(*args, **kwargs), remaining)
+        except Exception as e:
+            if not _matches(is_failure, e):
+                breaker.record_success()
+                raise
+            breaker.record_failure(e)
+            delay = _next_delay(attempt, retries, base_delay, deadline) if _matches(retry_on, e) else None
+            if delay is None:
+                raise
+            logger.info("Retrying %s in %.2fs after %s", dependency, delay, e)
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        breaker.record_success()
+        return result
+
+
+def guarded(dependency, **options):
+    """Decorator form of call()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return call(dependency, fn, *args, **options, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Dependencies each blueprint cannot serve a request without
+BLUEPRINT_DEPENDENCIES = {
+    "auth": ("mongo",),
+    "users": ("mongo",),
+    "disease_reports": ("mongo",),
+}
+
+
+def unavailable_response(error):
+    """503 for a CircuitOpenError, as a (body, status, headers) tuple Flask and Quart both accept."""
+    retry_after = str(max(1, int(error.retry_after + 0.5)))
+    return {"success": False, "message": str(error), "dependency": error.dependency}, 503, {"Retry-After": retry_after}
+
+
+def init_resilience(app):
+    """Fail fast with 503 while a dependency a blueprint needs is unhealthy.
+
+    MongoDB timeouts and connection errors that escape a view also become a
+    JSON 503 rather than an HTML 500.
+    """
+    from flask import jsonify, request
+    from pymongo.errors import PyMongoError
+    from app.utils.db import is_mongo_failure
+
+    @app.before_request
+    def check_dependencies():
+        for dependency in BLUEPRINT_DEPENDENCIES.get(request.blueprint, ()):
+            breaker = get_breaker(dependency)
+            if not breaker.allow():
+                return unavailable_response(CircuitOpenError(dependency, breaker.retry_after()))
+
+    app.register_error_handler(CircuitOpenError, unavailable_response)
+
+    @app.errorhandler(PyMongoError)
+    def mongo_error(e):
+        if is_mongo_failure(e):
+            breaker = get_breaker("mongo")
+            return unavailable_response(CircuitOpenError("mongo", breaker.retry_after() or 1))
+        return jsonify({"success": False, "message": "Database error"}), 500
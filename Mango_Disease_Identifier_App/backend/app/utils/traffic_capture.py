@@ -0,0 +1,395 @@
+"""Sampled capture of production requests for replay (see benchmarks/replay_traffic.py).
+
+Off unless TRAFFIC_CAPTURE_DIR is set. A TRAFFIC_CAPTURE_SAMPLE_RATE share of
+requests (default 0.01) is written to ``capture-<pid>-<n>.ndjson`` in that
+directory, one JSON line each. A line holds the method, path, query string,
+matched route, headers, status, response size, start time and duration.
+
+Request bodies are kept as received on the wire, still gzipped if the client
+sent them that way. They are copied as the app reads them, so a sampled
+upload is never held in memory whole. Bodies up to TRAFFIC_CAPTURE_INLINE_BYTES
+(default 4 KB) are stored inline. Larger ones, such as photos, are written in
+chunks to ``bodies/`` and stored once per SHA-256; the line holds only their
+digest. Authorization, cookies and the admin token are never written. The
+line just notes that the request was authenticated. Credential fields of JSON
+bodies (passwords, OTPs, tokens) are replaced with a placeholder. A body on an
+auth or password route that cannot be redacted that way is not stored at all.
+
+A log file is rotated and gzipped at TRAFFIC_CAPTURE_FILE_BYTES (default
+16 MB). Only the newest TRAFFIC_CAPTURE_MAX_FILES files (default 20) are kept,
+together with the bodies they still refer to.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+REDACTED_HEADERS = {'authorization', 'cookie', 'x-admin-token', 'proxy-authorization'}
+# Recomputed or meaningless when the request is sent again
+DROPPED_HEADERS = {'host', 'content-length', 'connection', 'keep-alive', 'transfer-encoding'}
+
+ROUTE_ENVIRON_KEY = 'mango.capture.route'
+
+REDACTED = '[REDACTED]'
+SENSITIVE_KEYS = {'otp', 'otp_code', 'code'}
+SENSITIVE_KEY_PARTS = ('password', 'token', 'secret')
+# Bodies on these routes carry credentials; one that cannot be redacted is not stored
+SENSITIVE_PATH_PREFIXES = ('/api/auth/',)
+
+READ_SIZE = 64 * 1024
+# A body is written before its log line, which follows once the response is sent
+BODY_GRACE_SECONDS = 600
+_DIGEST_PATTERN = re.compile(rb'"body_digest":"([0-9a-f]{64})"')
+
+
+def _headers(environ):
+    headers = {}
+    for key, value in environ.items():
+        if key.startswith('HTTP_'):
+            name = key[5:].replace('_', '-').lower()
+        elif key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = key.replace('_', '-').lower()
+        else:
+            continue
+        if name not in REDACTED_HEADERS and name not in DROPPED_HEADERS and value:
+            headers[name] = value
+    return headers
+
+
+def _is_sensitive_key(key):
+    key = str(key).lower()
+    return key in SENSITIVE_KEYS or any(part in key for part in SENSITIVE_KEY_PARTS)
+
+
+def _redact(value):
+    if isinstance(value, dict):
+        return {key: REDACTED if _is_sensitive_key(key) else _redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact(item) for item in value]
+    return value
+
+
+def is_sensitive_path(path):
+    return path.startswith(SENSITIVE_PATH_PREFIXES) or 'password' in path
+
+
+def redact_body(body):
+    """The body with credential fields of its JSON replaced, or None if it is not JSON."""
+    try:
+        data = json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    redacted = _redact(data)
+    return body if redacted == data else json.dumps(redacted).encode('utf-8')
+
+
+class _BodyTee:
+    """``wsgi.input`` wrapper that copies the body as the app reads it.
+
+    Up to the log's inline size the copy stays in memory. Past that it is
+    written in chunks to a temporary file under bodies/ and hashed on the way.
+    """
+
+    def __init__(self, stream, content_length, log):
+        self._stream = stream
+        self._remaining = content_length
+        self._log = log
+        self._head = bytearray()
+        self._digest = hashlib.sha256()
+        self.file = None
+        self.tmp_path = None
+        self.size = 0
+        self.failed = False
+
+    def _keep(self, data):
+        self.size += len(data)
+        self._remaining -= len(data)
+        if self.failed:
+            return data
+        self._digest.update(data)
+        if self.file is None and len(self._head) + len(data) <= self._log.inline_bytes:
+            self._head += data
+            return data
+        try:
+            if self.file is None:
+                self.file, self.tmp_path = self._log.open_body_file()
+                self.file.write(self._head)
+                self._head = bytearray()
+            self.file.write(data)
+        except OSError as e:
+            # A full disk must not fail the request itself
+            logger.error(f"Traffic capture body copy failed: {e}")
+            self.failed = True
+        return data
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        size = self._remaining if size is None or size < 0 else min(size, self._remaining)
+        return self._keep(self._stream.read(size))
+
+    def readline(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        size = self._remaining if size is None or size < 0 else min(size, self._remaining)
+        return self._keep(self._stream.readline(size))
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+    def drain(self):
+        """Read whatever the app left unread, so the copy is the whole body."""
+        while self._remaining > 0:
+            if not self.read(READ_SIZE):
+                break
+        return self._remaining <= 0
+
+    @property
+    def head(self):
+        return bytes(self._head)
+
+    @property
+    def digest(self):
+        return self._digest.hexdigest()
+
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.tmp_path is not None and os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class CaptureLog:
+    """Size-rotated NDJSON log shared by the threads of one process."""
+
+    def __init__(self, directory, max_file_bytes=None, max_files=None, inline_bytes=None):
+        self.directory = directory
+        self.bodies_dir = os.path.join(directory, 'bodies')
+        self.max_file_bytes = max_file_bytes or int(os.getenv('TRAFFIC_CAPTURE_FILE_BYTES', 16 * 1024 * 1024))
+        self.max_files = max_files or int(os.getenv('TRAFFIC_CAPTURE_MAX_FILES', 20))
+        self.inline_bytes = inline_bytes if inline_bytes is not None else int(
+            os.getenv('TRAFFIC_CAPTURE_INLINE_BYTES', 4096))
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+        self._sequence = 0
+        self.records = 0
+
+    def body_fields(self, body, path=''):
+        """Record fields for a body of at most ``inline_bytes``, with credentials redacted."""
+        if not body:
+            return {}
+        redacted = redact_body(body)
+        if redacted is None and is_sensitive_path(path):
+            return {'body_omitted': len(body)}
+        body = redacted if redacted is not None else body
+        try:
+            return {'body': body.decode('utf-8')}
+        except UnicodeDecodeError:
+            return {'body_b64': base64.b64encode(body).decode('ascii')}
+
+    def open_body_file(self):
+        os.makedirs(self.bodies_dir, exist_ok=True)
+        tmp = os.path.join(self.bodies_dir, f'{os.getpid()}-{threading.get_ident()}-{time.time_ns()}.tmp')
+        return open(tmp, 'wb'), tmp
+
+    def tee_fields(self, tee, path=''):
+        """Record fields for a fully read tee, storing a large body once per digest."""
+        if tee.file is None:
+            return self.body_fields(tee.head, path)
+        tee.file.close()
+        tee.file = None
+        if is_sensitive_path(path):
+            os.remove(tee.tmp_path)
+            return {'body_omitted': tee.size}
+        digest = tee.digest
+        body_path = os.path.join(self.bodies_dir, digest)
+        if os.path.exists(body_path):
+            os.remove(tee.tmp_path)
+            # Keeps a reused body inside the pruning grace period
+            os.utime(body_path)
+        else:
+            os.replace(tee.tmp_path, body_path)
+        return {'body_digest': digest, 'body_bytes': tee.size}
+
+    def write(self, record):
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            if self._file is None or self._pid != os.getpid():
+                self._open()
+            self._file.write(line)
+            self._file.flush()
+            self.records += 1
+            if self._file.tell() >= self.max_file_bytes:
+                self._rotate()
+
+    def _open(self):
+        # A forked worker must not share its parent's file
+        self._pid = os.getpid()
+        self._sequence += 1
+        os.makedirs(self.directory, exist_ok=True)
+        name = f'capture-{self._pid}-{int(time.time())}-{self._sequence}.ndjson'
+        self._file = open(os.path.join(self.directory, name), 'a', encoding='utf-8')
+
+    def _rotate(self):
+        path = self._file.name
+        self._file.close()
+        self._file = None
+        threading.Thread(target=self._compress_and_prune, args=(path,), name='capture-rotate', daemon=True).start()
+
+    def _referenced_digests(self, logs):
+        digests = set()
+        for log in logs:
+            try:
+                with (gzip.open(log, 'rb') if log.endswith('.gz') else open(log, 'rb')) as f:
+                    for line in f:
+                        digests.update(match.decode('ascii') for match in _DIGEST_PATTERN.findall(line))
+            except (OSError, EOFError):
+                # A log being compressed by another process; its bodies are young enough to keep
+                continue
+        return digests
+
+    def _prune_bodies(self, kept):
+        """Remove bodies no kept log refers to, except ones too new to have their line yet."""
+        if not os.path.isdir(self.bodies_dir):
+            return
+        referenced = self._referenced_digests(kept)
+        cutoff = time.time() - BODY_GRACE_SECONDS
+        for name in os.listdir(self.bodies_dir):
+            body = os.path.join(self.bodies_dir, name)
+            try:
+                if name not in referenced and os.path.getmtime(body) < cutoff:
+                    os.remove(body)
+            except FileNotFoundError:
+                continue
+
+    def _compress_and_prune(self, path):
+        try:
+            with open(path, 'rb') as src, gzip.open(f'{path}.gz', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(path)
+
+            logs = sorted(
+                (os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if name.startswith('capture-')),
+                key=os.path.getmtime,
+            )
+            for old in logs[:-self.max_files]:
+                os.remove(old)
+            self._prune_bodies(logs[-self.max_files:])
+        except OSError as e:
+            logger.error(f"Traffic capture rotation failed: {e}")
+
+
+class TrafficCaptureMiddleware:
+    """WSGI middleware that records a sample of requests to a CaptureLog.
+
+    It sits outside the gzip request middleware, so bodies are captured
+    exactly as they arrived. The duration runs until the response body has
+    been fully sent, as a client would measure it.
+    """
+
+    def __init__(self, wsgi_app, log, sample_rate=None, max_body_bytes=None, rng=random):
+        self.wsgi_app = wsgi_app
+        self.log = log
+        self.sample_rate = sample_rate if sample_rate is not None else float(
+            os.getenv('TRAFFIC_CAPTURE_SAMPLE_RATE', 0.01))
+        self.max_body_bytes = max_body_bytes or int(os.getenv('TRAFFIC_CAPTURE_MAX_BODY_BYTES', 20 * 1024 * 1024))
+        self.rng = rng
+
+    def __call__(self, environ, start_response):
+        if self.sample_rate <= 0 or self.rng.random() >= self.sample_rate:
+            return self.wsgi_app(environ, start_response)
+
+        record = {
+            'ts': time.time(),
+            'method': environ.get('REQUEST_METHOD', 'GET'),
+            'path': environ.get('PATH_INFO', ''),
+            'query': environ.get('QUERY_STRING', ''),
+            'headers': _headers(environ),
+            'auth': 'HTTP_AUTHORIZATION' in environ,
+        }
+        try:
+            content_length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        tee = None
+        if 0 < content_length <= self.max_body_bytes:
+            tee = environ['wsgi.input'] = _BodyTee(environ['wsgi.input'], content_length, self.log)
+        elif content_length:
+            record['body_omitted'] = content_length
+
+        started = time.perf_counter()
+        status = {}
+
+        def capture_start_response(status_line, headers, exc_info=None):
+            status['code'] = int(status_line.split(' ', 1)[0])
+            return start_response(status_line, headers, exc_info)
+
+        return self._finish(self.wsgi_app(environ, capture_start_response), environ, record, status, started, tee)
+
+    def _store_body(self, tee, record):
+        try:
+            if tee.drain() and not tee.failed:
+                record.update(self.log.tee_fields(tee, record['path']))
+            else:
+                # The client went away mid-upload; a partial body cannot be replayed
+                record['body_omitted'] = tee.size
+        except Exception as e:
+            record['body_omitted'] = tee.size
+            logger.error(f"Traffic capture body write failed: {e}")
+        finally:
+            try:
+                tee.discard()
+            except OSError:
+                pass
+
+    def _finish(self, app_iter, environ, record, status, started, tee=None):
+        size = 0
+        try:
+            for chunk in app_iter:
+                size += len(chunk)
+                yield chunk
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+            record.update(
+                route=environ.get(ROUTE_ENVIRON_KEY),
+                status=status.get('code', 0),
+                response_bytes=size,
+                duration_ms=round((time.perf_counter() - started) * 1000, 3),
+            )
+            if tee is not None:
+                self._store_body(tee, record)
+            try:
+                self.log.write(record)
+            except Exception as e:
+                logger.error(f"Traffic capture write failed: {e}")
+
+
+def init_traffic_capture(app):
+    """Wrap the app in TrafficCaptureMiddleware when TRAFFIC_CAPTURE_DIR is set."""
+    directory = os.getenv('TRAFFIC_CAPTURE_DIR')
+    if not directory:
+        return None
+    from flask import request
+
+    @app.before_request
+    def remember_route():
+        if request.url_rule is not None:
+            request.environ[ROUTE_ENVIRON_KEY] = request.url_rule.rule
+
+    log = CaptureLog(directory)
+    app.wsgi_app = TrafficCaptureMiddleware(app.wsgi_app, log)
+    app.extensions['traffic_capture'] = log
+    return log
@@ -0,0 +1,10 @@
+"""ASGI entry point for the asyncio deployment mode.
+
+Run with:  uvicorn asgi:app --host 0.0.0.0 --port 5001 --workers 2
+
+Only the auth, users and disease-reports APIs are served here; /predict
+keeps running on the gunicorn app (see wsgi.py).
+"""
+from app.aio import create_async_app
+
+app = create_async_app()
@@ -0,0 +1,95 @@
+"""Side-by-side load benchmark: Flask (gunicorn) vs the asyncio (ASGI) API.
+
+Start both servers against the same MongoDB, for example:
+
+    gunicorn -c gunicorn.conf.py wsgi:app                 # :5000
+    uvicorn asgi:app --port 5001 --workers 1
+
+then run, with an already verified account:
+
+    python -m benchmarks.bench_async_vs_sync \\
+        --flask-url http://127.0.0.1:5000 --async-url http://127.0.0.1:5001 \\
+        --email bench@example.com --password secret --concurrency 10 100 1000
+
+Every virtual user loops over profile, report list and stats reads, which
+are the I/O-bound requests the async mode targets. Pass --include-login to
+add bcrypt logins to the mix.
+"""
+import argparse
+import asyncio
+import json
+import resource
+import time
+
+from benchmarks.http_client import HttpConnection, format_summary, run_users, timed
+
+
+async def login(base_url, email, password):
+    conn = HttpConnection(base_url)
+    try:
+        status, _, body = await conn.request(
+            "POST", "/api/auth/login", json_body={"email": email, "password": password}
+        )
+    finally:
+        await conn.close()
+    if status != 200:
+        raise SystemExit(f"Login against {base_url} failed with {status}: {body[:200]!r}")
+    return json.loads(body)["token"]
+
+
+def make_user_loop(token, credentials, include_login):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def user_loop(conn, stats, deadline):
+        while time.perf_counter() < deadline:
+            await timed(conn, stats, "GET /api/users/profile", "GET", "/api/users/profile", headers=headers)
+            await timed(conn, stats, "GET /api/disease-reports/", "GET", "/api/disease-reports/", headers=headers)
+            await timed(conn, stats, "GET /stats/summary", "GET", "/api/disease-reports/stats/summary", headers=headers)
+            if include_login:
+                await timed(conn, stats, "POST /api/auth/login", "POST", "/api/auth/login", json_body=credentials)
+
+    return user_loop
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--flask-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--async-url", default="http://127.0.0.1:5001")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per run")
+    parser.add_argument("--include-login", action="store_true")
+    parser.add_argument("--json", help="also write all summaries to this file")
+    args = parser.parse_args()
+
+    # Each virtual user holds a socket
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (max(soft, min(hard, max(args.concurrency) * 2 + 64)), hard))
+
+    credentials = {"email": args.email, "password": args.password}
+    results = {}
+    for label, url in (("flask", args.flask_url), ("async", args.async_url)):
+        token = await login(url, args.email, args.password)
+        for concurrency in args.concurrency:
+            stats = await run_users(url, concurrency, args.duration,
+                                    make_user_loop(token, credentials, args.include_login))
+            summary = stats.summary()
+            results[f"{label}@{concurrency}"] = summary
+            print(format_summary(f"{label} ({url}), {concurrency} concurrent users", summary))
+            print()
+
+    print(f"{'concurrency':>12}{'flask req/s':>14}{'async req/s':>14}{'flask p99':>12}{'async p99':>12}")
+    for concurrency in args.concurrency:
+        f, a = results[f"flask@{concurrency}"], results[f"async@{concurrency}"]
+        f99 = max((r["p99_ms"] for r in f["endpoints"].values()), default=0)
+        a99 = max((r["p99_ms"] for r in a["endpoints"].values()), default=0)
+        print(f"{concurrency:>12}{f['throughput_rps']:>14.1f}{a['throughput_rps']:>14.1f}{f99:>12.1f}{a99:>12.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+"""Time to first prediction in a fresh process, from the .keras file and from the model cache.
+
+Each run starts a new interpreter and times three steps: importing
+TensorFlow, loading the current registry version (including its warmup), and
+one prediction on a new input, as the first /predict request would make it.
+``keras`` loads the .keras file (MODEL_CACHE=False). ``cached`` loads the
+precompiled entry built by ``python -m scripts.prepare_model_cache``, which
+this benchmark runs first when the entry is missing.
+
+    python -m benchmarks.bench_cold_start
+    python -m benchmarks.bench_cold_start --modes keras cached --repeat 5
+
+--max-seconds turns it into a regression guard: exit status 1 when the
+cached median time to first prediction exceeds it, or when ``cached`` did not
+actually load from the cache.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    # name: environment overrides
+    "keras": {"MODEL_FORMAT": "keras", "MODEL_CACHE": "False"},
+    "cached": {"MODEL_FORMAT": "keras", "MODEL_CACHE": "True", "MODEL_CACHE_BUILD_ON_MISS": "False"},
+}
+
+PROBE = r"""
+import json, time
+start = time.perf_counter()
+import numpy as np
+import tensorflow as tf
+imported = time.perf_counter()
+
+from app.services.disease_catalog import CATEGORIES
+from app.services.inference import MODEL_DIR
+from app.services.model_cache import CachedModelVersion
+from app.services.model_registry import ModelRegistry
+
+registry = ModelRegistry(MODEL_DIR, CATEGORIES, poll_interval=0)
+loaded = registry.load_version(registry.current_pointer())
+ready = time.perf_counter()
+
+x = np.random.default_rng(1).random((1, 320, 320, 3), dtype=np.float32) * 255
+loaded.predict(x)
+first = time.perf_counter()
+
+print(json.dumps({
+    "import_s": imported - start,
+    "load_s": ready - imported,
+    "predict_s": first - ready,
+    "first_prediction_s": first - start,
+    "from_cache": isinstance(loaded, CachedModelVersion),
+}))
+"""
+
+
+def measure(mode):
+    env = dict(os.environ, **MODES[mode])
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    # TensorFlow may print; the probe's JSON is the last line
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-prepare", action="store_true", help="do not build a missing cache entry first")
+    parser.add_argument("--max-seconds", type=float, help="fail if the cached median time to first prediction exceeds this")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    if "cached" in args.modes and not args.no_prepare:
+        subprocess.run([sys.executable, "-m", "scripts.prepare_model_cache", "--keep", "0"],
+                       cwd=BACKEND_DIR, check=True)
+
+    failed, results = False, {}
+    print(f"{'mode':<10}{'import s':>10}{'load s':>10}{'predict s':>11}{'first s':>10}  from cache")
+    for mode in args.modes:
+        runs = [measure(mode) for _ in range(args.repeat)]
+        row = {key: statistics.median(r[key] for r in runs)
+               for key in ("import_s", "load_s", "predict_s", "first_prediction_s")}
+        row["from_cache"] = all(r["from_cache"] for r in runs)
+        results[mode] = row
+        print(f"{mode:<10}{row['import_s']:>10.2f}{row['load_s']:>10.2f}{row['predict_s']:>11.3f}"
+              f"{row['first_prediction_s']:>10.2f}  {'yes' if row['from_cache'] else 'no'}")
+
+    if "keras" in results and "cached" in results:
+        saved = results["keras"]["first_prediction_s"] - results["cached"]["first_prediction_s"]
+        print(f"cache saves {saved:.2f}s ({saved / results['keras']['first_prediction_s']:.0%}) "
+              f"of the time to first prediction")
+    if "cached" in results:
+        if not results["cached"]["from_cache"]:
+            print("  FAIL: cached mode loaded the .keras file")
+            failed = True
+        if args.max_seconds is not None and results["cached"]["first_prediction_s"] > args.max_seconds:
+            print(f"  FAIL: cached time to first prediction "
+                  f"{results['cached']['first_prediction_s']:.2f}s > {args.max_seconds:.2f}s")
+            failed = True
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Encoding throughput and peak memory of the report export formats.
+
+Feeds generated raw report documents through ReportExportService.stream,
+the same path the export endpoints and scripts/export_reports.py use, and
+discards the output. Throughput includes generating the documents. Peak traced memory should not grow with --rows; if it
+does, something is holding rows.
+
+    python -m benchmarks.bench_export --rows 1000000
+    python -m benchmarks.bench_export --rows 200000 --formats csv,parquet
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from app.services.report_export import ReportExportService, ExportUnavailable
+
+
+def generate(rows):
+    users = [ObjectId() for _ in range(100)]
+    start = datetime(2024, 1, 1)
+    diseases = ["Anthracnose", "Powdery Mildew", "Die Back", "Healthy"]
+    for i in range(rows):
+        ts = start + timedelta(minutes=i)
+        yield {
+            "_id": ObjectId(), "user": users[i % len(users)], "disease_name": diseases[i % 4],
+            "severity": "moderate", "tree_age": "matureTree", "location": "Hawassa, Sidama",
+            "coordinates": {"latitude": 7.05, "longitude": 38.47}, "weather": "sunny",
+            "notes": "Dark lesions on young leaves after rain", "image_digest": f"{i:064x}",
+            "symptoms": ["Black spots", "Leaf drop"], "recommendations": ["Prune infected shoots"],
+            "synced": True, "timestamp": ts, "created_at": ts, "updated_at": ts,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--formats", default="ndjson,csv,parquet")
+    args = parser.parse_args()
+
+    print(f"{'format':<10}{'rows/s':>12}{'MB/s':>10}{'output MB':>12}{'peak MB':>10}")
+    for fmt in args.formats.split(","):
+        try:
+            ReportExportService.check_format(fmt)
+        except ExportUnavailable as e:
+            print(f"{fmt:<10}skipped: {e}")
+            continue
+
+        started = time.perf_counter()
+        written = 0
+        for chunk in ReportExportService.stream(fmt, generate(args.rows)):
+            written += len(chunk)
+        elapsed = time.perf_counter() - started
+
+        # Separate pass: tracing slows encoding several-fold
+        tracemalloc.start()
+        for chunk in ReportExportService.stream(fmt, generate(args.rows)):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{fmt:<10}{args.rows / elapsed:>12,.0f}{written / 1e6 / elapsed:>10.1f}"
+              f"{written / 1e6:>12.1f}{peak / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Per-worker and total memory of N processes serving the same model, per artifact format.
+
+Each format starts N fresh interpreters, like gunicorn workers without
+preload. Each one loads the model through ModelRegistry and classifies a
+batch. Once all of them are ready, this script reads their
+/proc/<pid>/smaps_rollup. RSS counts shared pages in full in every process.
+PSS divides each shared page between the processes that map it, so the sum
+of PSS is what the workers really cost the host.
+
+    python -m benchmarks.bench_model_memory --workers 4
+    python -m benchmarks.bench_model_memory --workers 8 --formats tflite --json memory.json
+
+Linux only (smaps_rollup needs kernel 4.14+).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, sys, time
+started = time.perf_counter()
+import numpy as np
+from app.services.disease_catalog import CATEGORIES
+from app.services.inference import MODEL_DIR
+from app.services.model_registry import ModelRegistry
+
+registry = ModelRegistry(MODEL_DIR, CATEGORIES, poll_interval=0)
+model = registry.load_version(sys.argv[1] or registry.current_pointer())
+x = np.random.default_rng(0).random((int(sys.argv[2]), 320, 320, 3), dtype=np.float32) * 255
+model.predict(x)
+print(json.dumps({"version": model.version, "load_s": time.perf_counter() - started,
+                  "tensorflow_imported": "tensorflow" in sys.modules}), flush=True)
+# Stay alive, holding the model, until the parent has read our memory
+sys.stdin.readline()
+"""
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def smaps_rollup(pid):
+    """The fields of /proc/<pid>/smaps_rollup that matter here, in MB."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in FIELDS:
+                values[name] = int(rest.split()[0]) / 1024
+    return values
+
+
+def measure(fmt, workers, version, batch_size):
+    env = dict(os.environ, MODEL_FORMAT=fmt)
+    procs = [
+        subprocess.Popen([sys.executable, "-c", PROBE, version or "", str(batch_size)], cwd=BACKEND_DIR, env=env,
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    try:
+        ready = []
+        for proc in procs:
+            line = proc.stdout.readline()
+            if not line:
+                raise SystemExit(f"A {fmt} worker exited before loading the model (status {proc.wait()})")
+            ready.append(json.loads(line))
+        # Let lazily freed memory settle before reading
+        time.sleep(1)
+        memory = [smaps_rollup(proc.pid) for proc in procs]
+    finally:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.stdin.write("\n")
+                proc.stdin.close()
+        for proc in procs:
+            proc.wait()
+
+    def total(field):
+        return sum(row.get(field, 0.0) for row in memory)
+
+    return {
+        "format": fmt,
+        "workers": workers,
+        "version": ready[0]["version"],
+        "load_s": max(row["load_s"] for row in ready),
+        "tensorflow_imported": ready[0]["tensorflow_imported"],
+        "rss_mb_per_worker": total("Rss") / workers,
+        "pss_mb_per_worker": total("Pss") / workers,
+        "private_mb_per_worker": (total("Private_Clean") + total("Private_Dirty")) / workers,
+        "shared_mb_per_worker": (total("Shared_Clean") + total("Shared_Dirty")) / workers,
+        "total_pss_mb": total("Pss"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="processes per format")
+    parser.add_argument("--formats", nargs="+", default=["keras", "tflite"], choices=["keras", "tflite"])
+    parser.add_argument("--version", help="model version (default: the current pointer)")
+    parser.add_argument("--batch-size", type=int, default=8, help="images classified by each worker")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        raise SystemExit("/proc/self/smaps_rollup is not available on this system")
+
+    results = [measure(fmt, args.workers, args.version, args.batch_size) for fmt in args.formats]
+    print(f"{'format':<8}{'workers':>8}{'load s':>8}{'RSS MB':>9}{'PSS MB':>9}"
+          f"{'private':>9}{'shared':>9}{'total PSS':>11}  TF imported")
+    for row in results:
+        print(f"{row['format']:<8}{row['workers']:>8}{row['load_s']:>8.1f}{row['rss_mb_per_worker']:>9.0f}"
+              f"{row['pss_mb_per_worker']:>9.0f}{row['private_mb_per_worker']:>9.0f}"
+              f"{row['shared_mb_per_worker']:>9.0f}{row['total_pss_mb']:>11.0f}  {row['tensorflow_imported']}")
+    print("Per-worker columns are averages; total PSS is what all the workers cost together.")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Lookup latency of the multi-index perceptual-hash table.
+
+Spreads random 64-bit hashes over ``--scopes`` tables, like the
+per-user/location tables of the duplicate detector. It then times Hamming
+radius queries for near-copies of stored hashes, which must be found, and
+for unrelated hashes.
+
+    python -m benchmarks.bench_phash_index --count 1000000 --scopes 10000
+    python -m benchmarks.bench_phash_index --count 1000000 --scopes 1   # one huge table
+"""
+import argparse
+import random
+import sys
+import time
+from app.services.perceptual_hash import MultiIndexHashTable
+from benchmarks.http_client import percentile
+
+
+def flip_bits(value, n, rng):
+    for bit in rng.sample(range(64), n):
+        value ^= 1 << bit
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--scopes", type=int, default=10000)
+    parser.add_argument("--radius", type=int, default=6)
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--max-p99-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    tables = [MultiIndexHashTable(args.radius) for _ in range(args.scopes)]
+    hashes = [rng.getrandbits(64) for _ in range(args.count)]
+    started = time.perf_counter()
+    for i, value in enumerate(hashes):
+        tables[i % args.scopes].add(value, i)
+    print(f"Indexed {args.count} hashes in {args.scopes} scopes in {time.perf_counter() - started:.1f}s")
+
+    missed = 0
+    latencies = {"near-copy": [], "unrelated": []}
+    for _ in range(args.queries):
+        i = rng.randrange(args.count)
+        table = tables[i % args.scopes]
+        query = flip_bits(hashes[i], rng.randint(0, args.radius), rng)
+        started = time.perf_counter()
+        found = table.query(query)
+        latencies["near-copy"].append((time.perf_counter() - started) * 1000)
+        missed += all(item != i for _, item in found)
+
+        started = time.perf_counter()
+        table.query(rng.getrandbits(64))
+        latencies["unrelated"].append((time.perf_counter() - started) * 1000)
+
+    worst = 0.0
+    for name, values in latencies.items():
+        values.sort()
+        worst = max(worst, percentile(values, 99))
+        print(f"{name:10s}  p50 {percentile(values, 50):.4f} ms   p99 {percentile(values, 99):.4f} ms")
+    print(f"Missed near-copies: {missed}")
+    sys.exit(1 if missed or worst > args.max_p99_ms else 0)
+
+
+if __name__ == "__main__":
+    main()
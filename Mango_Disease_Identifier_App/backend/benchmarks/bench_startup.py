@@ -0,0 +1,91 @@
+"""Startup-time and memory benchmark for each process mode.
+
+Each mode is started in a fresh interpreter. The script measures how long
+``import wsgi`` takes (until the app is built and, with preload, the model is
+loaded), the resident memory at that point, and whether TensorFlow was
+imported.
+
+    python -m benchmarks.bench_startup --modes api all --repeat 3
+
+Budgets turn it into a regression guard (exit status 1 when exceeded):
+
+    python -m benchmarks.bench_startup --modes api --max-seconds 1.5 --max-rss-mb 150
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, os, sys, time
+start = time.perf_counter()
+import wsgi
+elapsed = time.perf_counter() - start
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+print(json.dumps({
+    "ready_s": elapsed,
+    "rss_mb": rss_mb(),
+    "tensorflow_imported": "tensorflow" in sys.modules,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+def measure(mode, preload):
+    env = dict(os.environ, MANGO_PROCESS_MODE=mode, PRELOAD_MODEL="true" if preload else "false")
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    # App startup may print; the probe's JSON is the last line
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["api", "inference", "all"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-preload", action="store_true", help="measure lazy model loading")
+    parser.add_argument("--max-seconds", type=float, help="fail if median ready time exceeds this")
+    parser.add_argument("--max-rss-mb", type=float, help="fail if median RSS at ready exceeds this")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'mode':<12}{'ready s':>10}{'RSS MB':>10}{'modules':>10}  tensorflow")
+    for mode in args.modes:
+        runs = [measure(mode, not args.no_preload) for _ in range(args.repeat)]
+        ready = statistics.median(r["ready_s"] for r in runs)
+        rss = statistics.median(r["rss_mb"] for r in runs)
+        tf_imported = any(r["tensorflow_imported"] for r in runs)
+        print(f"{mode:<12}{ready:>10.2f}{rss:>10.1f}{runs[0]['modules']:>10}  {'yes' if tf_imported else 'no'}")
+
+        if mode == "api" and tf_imported:
+            print("  FAIL: api mode imported tensorflow")
+            failed = True
+        if args.max_seconds is not None and ready > args.max_seconds:
+            print(f"  FAIL: ready time {ready:.2f}s exceeds budget {args.max_seconds:.2f}s")
+            failed = True
+        if args.max_rss_mb is not None and rss > args.max_rss_mb:
+            print(f"  FAIL: RSS {rss:.1f} MB exceeds budget {args.max_rss_mb:.1f} MB")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
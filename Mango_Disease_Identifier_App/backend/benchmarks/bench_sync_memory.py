@@ -0,0 +1,196 @@
+"""Peak request memory of /api/disease-reports/sync, buffered and streaming, by payload size.
+
+Each upload is generated on the fly while the app reads it, so the body
+itself costs the benchmark nothing. It goes through the full WSGI stack of
+create_app() (mongomock as the database), and the response is consumed line
+by line. tracemalloc records the request's peak, less the memory still held
+when it finishes. What remains is mostly mongomock's copy of the stored
+reports, which a real deployment keeps in MongoDB instead.
+
+    python -m benchmarks.bench_sync_memory
+    python -m benchmarks.bench_sync_memory --sizes 1000 8000 32000 --modes buffered ndjson
+
+--max-growth turns it into a regression guard: exit status 1 when a
+streaming mode's transient memory at the largest size is more than that many
+times its transient memory at the smallest.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+MODES = {
+    # name: (content type, query string)
+    "buffered": ("application/json", ""),
+    "array": ("application/json", "stream=true"),
+    "ndjson": ("application/x-ndjson", ""),
+}
+
+MB = 1024 * 1024
+
+
+def report_payload(i):
+    return {
+        "id": f"local-{i}",
+        "diseaseName": "Anthracnose",
+        "severity": ("mild", "moderate", "severe")[i % 3],
+        "treeAge": "matureTree",
+        "location": f"Orchard block {i % 50}",
+        "coordinates": {"latitude": 6.9 + i * 1e-6, "longitude": 79.8 - i * 1e-6},
+        "weather": "Humid",
+        "notes": "Dark sunken lesions on several fruits near the canopy edge. " * 2,
+        "imageUri": f"file:///data/reports/{i}.jpg",
+        "symptoms": ["Black spots on leaves", "Fruit rot"],
+        "timestamp": "2024-05-01T08:30:00",
+    }
+
+
+def body_chunks(mode, count):
+    if mode == "ndjson":
+        for i in range(count):
+            yield (json.dumps(report_payload(i)) + "\n").encode("utf-8")
+        return
+    yield b"["
+    for i in range(count):
+        yield ((", " if i else "") + json.dumps(report_payload(i))).encode("utf-8")
+    yield b"]"
+
+
+class GeneratedBody(io.RawIOBase):
+    """A request body produced as it is read."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._pending = b""
+        self.size = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            self._pending = next(self._chunks, b"")
+            if not self._pending:
+                return 0
+            self.size += len(self._pending)
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+def run(app, token, mode, count):
+    from app.models.disease_report import DiseaseReport
+
+    content_type, query = MODES[mode]
+    body = GeneratedBody(body_chunks(mode, count))
+    environ = {
+        "REQUEST_METHOD": "POST",
+        "PATH_INFO": "/api/disease-reports/sync",
+        "QUERY_STRING": query,
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "CONTENT_TYPE": content_type,
+        "HTTP_AUTHORIZATION": f"Bearer {token}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BufferedReader(body),
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": False,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    status = []
+
+    DiseaseReport._get_collection().delete_many({})
+    gc.collect()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+
+    response = app(environ, lambda s, headers, exc_info=None: status.append(s))
+    # Keep only the tail of the output, as a client acting on each line would
+    tail = b""
+    try:
+        for chunk in response:
+            tail = (tail + chunk)[-4096:]
+    finally:
+        getattr(response, "close", lambda: None)()
+
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    saved = DiseaseReport._get_collection().count_documents({})
+    ok = status[0].startswith("200") and saved == count
+    if mode != "buffered":
+        summary = json.loads(tail.rstrip(b"\n").rsplit(b"\n", 1)[-1])
+        ok = ok and summary.get("succeeded") == count
+    return {
+        "mode": mode,
+        "reports": count,
+        "payload_mb": body.size / MB,
+        "seconds": elapsed,
+        "peak_mb": (peak - before) / MB,
+        "transient_mb": (peak - current) / MB,
+        "ok": bool(ok),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 4000], help="reports per upload")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--max-growth", type=float, help="fail if streaming transient memory grows more than this factor")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MONGO_URI", "mongomock://localhost/mango_disease_db")
+    os.environ.pop("TRAFFIC_CAPTURE_DIR", None)
+    from flask_jwt_extended import create_access_token
+    from bson.objectid import ObjectId
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        token = create_access_token(identity=str(ObjectId()))
+
+    tracemalloc.start()
+    # Warm up imports and caches so the first measured run is not inflated
+    run(app, token, "ndjson", 10)
+    run(app, token, "buffered", 10)
+
+    results = []
+    print(f"{'mode':<10}{'reports':>9}{'body MB':>9}{'peak MB':>9}{'transient':>11}{'seconds':>9}  ok")
+    for mode in args.modes:
+        for count in sorted(args.sizes):
+            row = run(app, token, mode, count)
+            results.append(row)
+            print(f"{row['mode']:<10}{row['reports']:>9}{row['payload_mb']:>9.1f}{row['peak_mb']:>9.1f}"
+                  f"{row['transient_mb']:>11.1f}{row['seconds']:>9.1f}  {'yes' if row['ok'] else 'NO'}")
+    print("peak: above the memory before the request; transient: peak less what the request left behind")
+
+    failed = not all(row["ok"] for row in results)
+    if args.max_growth is not None:
+        for mode in args.modes:
+            if mode == "buffered":
+                continue
+            rows = [row for row in results if row["mode"] == mode]
+            growth = rows[-1]["transient_mb"] / max(rows[0]["transient_mb"], 0.1)
+            if growth > args.max_growth:
+                print(f"  FAIL: {mode} transient memory grew {growth:.1f}x from {rows[0]['reports']} "
+                      f"to {rows[-1]['reports']} reports (budget {args.max_growth:.1f}x)")
+                failed = True
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Latency and recall benchmark for the similar-case vector index.
+
+Builds an index of synthetic clustered embeddings in a temporary directory,
+then times brute-force and IVF-PQ searches and reports IVF-PQ recall@k
+against the exact results.
+
+    python -m benchmarks.bench_vector_index --count 1000000 --dim 256
+
+A budget turns it into a regression guard (exit status 1 when exceeded):
+
+    python -m benchmarks.bench_vector_index --max-p99-ms 20 --min-recall 0.8
+"""
+import argparse
+import hashlib
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+from app.services.vector_index import VectorIndex
+from benchmarks.http_client import percentile
+
+
+def synthetic_embeddings(count, dim, clusters, seed=0, chunk_size=100000):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    for start in range(0, count, chunk_size):
+        n = min(chunk_size, count - start)
+        noise = 0.4 * rng.normal(size=(n, dim)).astype(np.float32)
+        yield start, centers[rng.integers(0, clusters, n)] + noise
+
+
+def time_searches(index, queries, k):
+    latencies, results = [], []
+    for q in queries:
+        started = time.perf_counter()
+        results.append(index.search(q, k))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return sorted(latencies), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--train-sample", type=int, default=50000)
+    parser.add_argument("--max-p99-ms", type=float)
+    parser.add_argument("--min-recall", type=float)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="vector-index-bench-")
+    try:
+        index = VectorIndex(directory, refresh_interval=0)
+        started = time.perf_counter()
+        for start, vectors in synthetic_embeddings(args.count, args.dim, args.clusters):
+            digests = [hashlib.sha256(str(start + i).encode()).hexdigest() for i in range(len(vectors))]
+            index.add(digests, vectors)
+        print(f"Added {len(index)} x {args.dim} vectors in {time.perf_counter() - started:.1f}s")
+
+        rng = np.random.default_rng(1)
+        _, sample = next(synthetic_embeddings(args.queries, args.dim, args.clusters, seed=0))
+        queries = sample + 0.1 * rng.normal(size=sample.shape).astype(np.float32)
+
+        exact_ms, exact = time_searches(index, queries, args.k)
+        print(f"brute force  p50 {percentile(exact_ms, 50):8.2f} ms   p99 {percentile(exact_ms, 99):8.2f} ms")
+
+        started = time.perf_counter()
+        index.train(nprobe=args.nprobe, sample_size=args.train_sample)
+        print(f"Trained IVF-PQ {index.stats()} in {time.perf_counter() - started:.1f}s")
+
+        approx_ms, approx = time_searches(index, queries, args.k)
+        recall = np.mean([
+            len({d for d, _ in e} & {d for d, _ in a}) / max(len(e), 1) for e, a in zip(exact, approx)
+        ])
+        p99 = percentile(approx_ms, 99)
+        print(f"IVF-PQ       p50 {percentile(approx_ms, 50):8.2f} ms   p99 {p99:8.2f} ms   recall@{args.k} {recall:.3f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    failed = (args.max_p99_ms is not None and p99 > args.max_p99_ms) or \
+             (args.min_recall is not None and recall < args.min_recall)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Fault drill: how the app behaves while SMTP or MongoDB misbehaves.
+
+Runs create_app() in-process and sends signups through a FaultProxy in front
+of a local SMTP sink. Each phase prints the status codes and latencies seen
+by clients, plus the circuit breaker state:
+
+    healthy      every signup sends its OTP
+    hung relay   the first sends wait out MAIL_TIMEOUT (with retries); once the
+                 breaker opens, the rest fail in milliseconds
+    4xx relay    transient replies are retried, then counted as failures
+    recovered    after the reset timeout a probe succeeds and the breaker closes
+
+With --mongo HOST:PORT (a real mongod), the users database is reached
+through a second proxy, and a blackholed MongoDB is drilled with logins the
+same way. Without it, MongoDB is the in-memory mongomock stand-in.
+
+    python -m benchmarks.fault_drill
+    python -m benchmarks.fault_drill --mongo 127.0.0.1:27017
+"""
+import argparse
+import os
+import time
+import uuid
+from benchmarks.fault_proxy import FaultProxy, _parse_address
+from benchmarks.smtp_sink import SmtpSink
+
+PASSWORD = "fault-drill-password"
+
+
+def run_phase(name, requests):
+    """Call each request thunk and summarize the outcome."""
+    results = []
+    for send in requests:
+        started = time.perf_counter()
+        response = send()
+        results.append((response.status_code, (time.perf_counter() - started) * 1000))
+    codes = {}
+    for status, _ in results:
+        codes[status] = codes.get(status, 0) + 1
+    latencies = " ".join(f"{ms:.0f}" for _, ms in results)
+    print(f"{name:<14} status {codes}  latency ms: {latencies}")
+
+
+def print_breakers(client, admin_headers):
+    data = client.get("/api/admin/dependencies", headers=admin_headers).get_json()["data"]
+    for name, state in data.items():
+        print(f"{'':<14} {name}: {state['state']}, failures={state['failures']}, "
+              f"rejected={state['rejected']}, opened={state['opened']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo", help="host:port of a real mongod to drill through a proxy")
+    parser.add_argument("--requests", type=int, default=8, help="requests per phase")
+    parser.add_argument("--reset-seconds", type=float, default=3.0, help="breaker reset timeout")
+    args = parser.parse_args()
+
+    sink = SmtpSink().start_in_thread()
+    smtp_proxy = FaultProxy("127.0.0.1", sink.port).start_in_thread()
+    mongo_proxy = None
+    if args.mongo:
+        mongo_proxy = FaultProxy(*_parse_address(args.mongo)).start_in_thread()
+
+    os.environ.update({
+        "MONGO_URI": (f"mongodb://127.0.0.1:{mongo_proxy.port}/fault_drill" if mongo_proxy
+                      else "mongomock://localhost/fault_drill"),
+        "MONGO_TIMEOUT_MS": "1000",
+        "MONGO_SERVER_SELECTION_TIMEOUT_MS": "1000",
+        "MAIL_SERVER": "127.0.0.1",
+        "MAIL_PORT": str(smtp_proxy.port),
+        "MAIL_USE_TLS": "False",
+        "MAIL_DEFAULT_SENDER": "fault-drill@example.com",
+        "MAIL_TIMEOUT": "1",
+        "SMTP_RETRIES": "1",
+        "EMAIL_CHECK_DELIVERABILITY": "False",
+        "BREAKER_FAILURE_THRESHOLD": "3",
+        "BREAKER_RESET_SECONDS": str(args.reset_seconds),
+        "ADMIN_TOKEN": "fault-drill",
+    })
+    from app import create_app
+
+    client = create_app().test_client()
+    admin_headers = {"X-Admin-Token": "fault-drill"}
+
+    def signup():
+        email = f"drill-{uuid.uuid4().hex[:10]}@example.com"
+        return client.post("/api/auth/signup", json={"email": email, "password": PASSWORD})
+
+    signups = lambda: [signup] * args.requests  # noqa: E731
+
+    print("SMTP")
+    run_phase("healthy", signups())
+    smtp_proxy.set_mode("blackhole")
+    run_phase("hung relay", signups())
+    print_breakers(client, admin_headers)
+    smtp_proxy.set_mode("pass")
+    time.sleep(args.reset_seconds)
+    sink.fail_with = "451 4.3.0 Try again later"
+    run_phase("4xx relay", signups())
+    sink.fail_with = None
+    time.sleep(args.reset_seconds)
+    run_phase("recovered", signups())
+    print_breakers(client, admin_headers)
+
+    if mongo_proxy:
+        email = f"drill-{uuid.uuid4().hex[:10]}@example.com"
+        client.post("/api/auth/signup", json={"email": email, "password": PASSWORD})
+        login = lambda: client.post("/api/auth/login", json={"email": email, "password": PASSWORD})  # noqa: E731
+
+        print("MongoDB")
+        run_phase("healthy", [login] * args.requests)
+        mongo_proxy.set_mode("blackhole")
+        run_phase("hung node", [login] * args.requests)
+        print_breakers(client, admin_headers)
+        mongo_proxy.set_mode("pass")
+        time.sleep(args.reset_seconds)
+        run_phase("recovered", [login] * args.requests)
+        print_breakers(client, admin_headers)
+
+
+if __name__ == "__main__":
+    main()
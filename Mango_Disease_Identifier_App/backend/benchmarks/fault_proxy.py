@@ -0,0 +1,146 @@
+"""TCP proxy that injects faults between the app and MongoDB or SMTP.
+
+Forwards connections to a target and misbehaves on demand. The mode applies
+to new and already-open connections alike, so pooled MongoDB connections
+are affected too:
+
+    pass        forward unchanged
+    delay       forward after ``delay`` seconds per chunk (a slow node)
+    blackhole   accept and read, but never forward or answer (a hung node)
+    reset       close every connection at once (a crashed node)
+
+    python -m benchmarks.fault_proxy --target 127.0.0.1:27017 --port 27018
+    # then type "delay 2", "blackhole", "reset" or "pass" on stdin
+"""
+import argparse
+import asyncio
+import threading
+
+MODES = ("pass", "delay", "blackhole", "reset")
+
+
+class FaultProxy:
+    def __init__(self, target_host, target_port, host="127.0.0.1", port=0):
+        self.target = (target_host, target_port)
+        self.host = host
+        self.port = port
+        self.mode = "pass"
+        self.delay = 0.0
+        self.connections = 0
+        self._writers = set()
+        self._loop = None
+        self._server = None
+
+    def set_mode(self, mode, delay=0.0):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        self.mode = mode
+        self.delay = delay
+        if mode == "reset" and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._reset_all)
+
+    def _reset_all(self):
+        for writer in list(self._writers):
+            writer.transport.abort()
+        self._writers.clear()
+
+    async def _pump(self, reader, writer):
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                if self.mode == "blackhole":
+                    continue
+                if self.mode == "delay":
+                    await asyncio.sleep(self.delay)
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle(self, client_reader, client_writer):
+        self.connections += 1
+        if self.mode == "reset":
+            client_writer.transport.abort()
+            return
+        if self.mode == "blackhole":
+            # Hold the connection open without ever answering
+            self._writers.add(client_writer)
+            try:
+                while await client_reader.read(65536):
+                    pass
+            except ConnectionError:
+                pass
+            finally:
+                self._writers.discard(client_writer)
+                client_writer.close()
+            return
+
+        try:
+            target_reader, target_writer = await asyncio.open_connection(*self.target)
+        except OSError:
+            client_writer.transport.abort()
+            return
+        self._writers.update((client_writer, target_writer))
+        try:
+            await asyncio.gather(
+                self._pump(client_reader, target_writer),
+                self._pump(target_reader, client_writer),
+            )
+        finally:
+            self._writers.difference_update((client_writer, target_writer))
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    def start_in_thread(self):
+        """Run the proxy on its own event loop thread; returns once it is listening."""
+        started = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, name="fault-proxy", daemon=True).start()
+        started.wait()
+        return self
+
+
+def _parse_address(value):
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", required=True, help="host:port to forward to")
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+
+    proxy = FaultProxy(*_parse_address(args.target), port=args.port).start_in_thread()
+    print(f"Proxying 127.0.0.1:{proxy.port} -> {args.target}; modes: {', '.join(MODES)}")
+    try:
+        while True:
+            parts = input("> ").split()
+            if not parts:
+                continue
+            try:
+                proxy.set_mode(parts[0], float(parts[1]) if len(parts) > 1 else 0.0)
+                print(f"mode={proxy.mode} delay={proxy.delay}")
+            except ValueError as e:
+                print(e)
+    except (EOFError, KeyboardInterrupt):
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Minimal asyncio HTTP/1.1 load client used by the benchmarks.
+
+It keeps one persistent connection per virtual user and has no third-party
+dependencies, so thousands of concurrent users are cheap to simulate and
+client overhead stays small next to server latency.
+"""
+import asyncio
+import json
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+
+class HttpConnection:
+    """A single keep-alive HTTP/1.1 connection."""
+
+    def __init__(self, base_url, timeout=30.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+            self.writer = None
+
+    async def request(self, method, path, headers=None, body=None, json_body=None):
+        """Send a request and return (status, headers, body bytes)."""
+        headers = dict(headers or {})
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers.setdefault("Content-Type", "application/json")
+        body = body or b""
+        headers.setdefault("Host", f"{self.host}:{self.port}")
+        headers["Content-Length"] = str(len(body))
+
+        for attempt in (0, 1):
+            if self.writer is None:
+                await self._connect()
+            try:
+                head = f"{method} {self.prefix}{path} HTTP/1.1\r\n" + "".join(
+                    f"{k}: {v}\r\n" for k, v in headers.items()
+                ) + "\r\n"
+                self.writer.write(head.encode("latin-1") + body)
+                await self.writer.drain()
+                return await asyncio.wait_for(self._read_response(), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # The server closed an idle keep-alive connection; retry once
+                await self.close()
+                if attempt:
+                    raise
+
+    async def _read_response(self):
+        status_line = await self.reader.readuntil(b"\r\n")
+        status = int(status_line.split(b" ", 2)[1])
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readuntil(b"\r\n")
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await self.reader.read()
+            await self.close()
+
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, headers, body
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class LoadStats:
+    """Per-endpoint latency samples and error counts for one run."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, name, seconds, ok):
+        self.latencies[name].append(seconds)
+        if not ok:
+            self.errors[name] += 1
+
+    def summary(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        rows = {}
+        for name, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            rows[name] = {
+                "requests": len(values),
+                "throughput_rps": len(values) / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "error_rate": self.errors[name] / len(values) if values else 0.0,
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {
+            "elapsed_s": elapsed,
+            "total_requests": total,
+            "throughput_rps": total / elapsed if elapsed else 0.0,
+            "endpoints": rows,
+        }
+
+
+def format_summary(title, summary):
+    lines = [
+        f"{title}: {summary['total_requests']} requests in {summary['elapsed_s']:.1f}s "
+        f"({summary['throughput_rps']:.1f} req/s)",
+        f"  {'endpoint':<28}{'reqs':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}",
+    ]
+    for name, row in summary["endpoints"].items():
+        lines.append(
+            f"  {name:<28}{row['requests']:>8}{row['throughput_rps']:>10.1f}{row['p50_ms']:>10.1f}"
+            f"{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['error_rate']:>8.1%}"
+        )
+    return "\n".join(lines)
+
+
+async def run_users(base_url, concurrency, duration, user_loop):
+    """Run ``concurrency`` virtual users for ``duration`` seconds.
+
+    ``user_loop(conn, stats, deadline)`` drives one user's requests until the
+    deadline passes.
+    """
+    stats = LoadStats()
+    deadline = time.perf_counter() + duration
+
+    async def user():
+        conn = HttpConnection(base_url)
+        try:
+            await user_loop(conn, stats, deadline)
+        finally:
+            await conn.close()
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    stats.finished = time.perf_counter()
+    return stats
+
+
+async def timed(conn, stats, name, method, path, expect=(200, 201), **kwargs):
+    """Issue one request and record its latency under ``name``."""
+    start = time.perf_counter()
+    try:
+        status, headers, body = await conn.request(method, path, **kwargs)
+        ok = status in expect
+    except Exception:
+        status, headers, body, ok = 0, {}, b"", False
+    stats.record(name, time.perf_counter() - start, ok)
+    return status, headers, body
@@ -0,0 +1,294 @@
+"""End-to-end HTTP load test with a realistic traffic mix.
+
+Each virtual user signs up, reads the OTP from a local SMTP sink, verifies,
+and then loops over a weighted mix of requests: profile reads, logins,
+report creation with a photo, bulk sync, the stats summary and /predict.
+
+By default everything runs in this process, so no MongoDB or mail server is
+needed. The app comes from ``create_app()`` and is served by a threaded
+werkzeug server. MongoDB is replaced by mongomock (MONGO_URI=mongomock://),
+and mail goes to an SMTP sink:
+
+    python -m benchmarks.load_test --users 20 --duration 30
+
+Against a real deployment, point the server's MAIL_SERVER/MAIL_PORT at the sink
+this script starts (--smtp-port) and pass its URL:
+
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --smtp-port 2525 \\
+        --mix profile=30,stats=20,create=15,sync=5,login=10,predict=20
+
+Write the summary with --json and compare a later run with --compare:
+
+    python -m benchmarks.load_test --json before.json
+    python -m benchmarks.load_test --json after.json --compare before.json
+
+The in-process server shares the GIL with the load generator, so its
+absolute numbers are only comparable with other in-process runs.
+"""
+import argparse
+import asyncio
+import importlib.util
+import io
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+from benchmarks.http_client import format_summary, run_users, timed
+from benchmarks.smtp_sink import SmtpSink
+
+DEFAULT_MIX = "profile=30,stats=20,create=15,sync=5,login=10,predict=20"
+
+PASSWORD = "load-test-password"
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def sample_images(directory, count=8, seed=0):
+    """JPEG bytes from ``directory``, or synthetic leaf-sized photos when none is given."""
+    if directory:
+        names = sorted(n for n in os.listdir(directory) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+        images = []
+        for name in names:
+            with open(os.path.join(directory, name), "rb") as f:
+                images.append(f.read())
+        if not images:
+            raise SystemExit(f"No .jpg/.png images in {directory}")
+        return images
+
+    from PIL import Image
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        pixels = (rng.random((60, 80, 3)) * 255).astype("uint8")
+        buf = io.BytesIO()
+        Image.fromarray(pixels).resize((640, 480), Image.BICUBIC).save(buf, "JPEG", quality=85)
+        images.append(buf.getvalue())
+    return images
+
+
+def encode_multipart(fields, files):
+    """Build a multipart/form-data body; ``files`` maps field name to (filename, bytes)."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, data) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: image/jpeg\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def report_payload(rng, report_id=None):
+    return {
+        "id": report_id or uuid.uuid4().hex,
+        "diseaseName": rng.choice(["Anthracnose", "Powdery Mildew", "Die Back", "Healthy"]),
+        "severity": rng.choice(["mild", "moderate", "severe"]),
+        "treeAge": rng.choice(["youngTree", "matureTree", "oldTree"]),
+        "location": rng.choice(["Addis Ababa", "Bahir Dar", "Hawassa", "Dire Dawa"]),
+        "coordinates": {"latitude": rng.uniform(3, 15), "longitude": rng.uniform(33, 48)},
+        "weather": "sunny",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+# -- scenarios -----------------------------------------------------------
+# Each takes (conn, stats, user) and issues one logical operation.
+
+async def scenario_profile(conn, stats, user):
+    await timed(conn, stats, "GET /api/users/profile", "GET", "/api/users/profile", headers=user["auth"])
+
+
+async def scenario_stats(conn, stats, user):
+    await timed(conn, stats, "GET /stats/summary", "GET", "/api/disease-reports/stats/summary",
+                headers=user["auth"])
+
+
+async def scenario_login(conn, stats, user):
+    await timed(conn, stats, "POST /api/auth/login", "POST", "/api/auth/login",
+                json_body={"email": user["email"], "password": PASSWORD})
+
+
+async def scenario_create(conn, stats, user):
+    rng = user["rng"]
+    body, content_type = encode_multipart(
+        {"report": json.dumps(report_payload(rng))},
+        {"image": ("leaf.jpg", rng.choice(user["images"]))},
+    )
+    await timed(conn, stats, "POST /api/disease-reports/", "POST", "/api/disease-reports/",
+                headers=dict(user["auth"], **{"Content-Type": content_type}), body=body)
+
+
+async def scenario_sync(conn, stats, user, batch=10):
+    rng = user["rng"]
+    reports = [report_payload(rng) for _ in range(batch)]
+    body, content_type = encode_multipart(
+        {"reports": json.dumps(reports)},
+        {f"image_{r['id']}": ("leaf.jpg", rng.choice(user["images"])) for r in reports},
+    )
+    await timed(conn, stats, "POST /api/disease-reports/sync", "POST", "/api/disease-reports/sync",
+                headers=dict(user["auth"], **{"Content-Type": content_type}), body=body)
+
+
+async def scenario_predict(conn, stats, user):
+    body, content_type = encode_multipart({}, {"image": ("leaf.jpg", user["rng"].choice(user["images"]))})
+    await timed(conn, stats, "POST /predict", "POST", "/predict",
+                headers={"Content-Type": content_type}, body=body)
+
+
+SCENARIOS = {
+    "profile": scenario_profile,
+    "stats": scenario_stats,
+    "login": scenario_login,
+    "create": scenario_create,
+    "sync": scenario_sync,
+    "predict": scenario_predict,
+}
+
+
+async def onboard(conn, stats, sink, user):
+    """signup -> OTP from the sink -> verify-otp; sets the user's auth header."""
+    status, _, body = await timed(conn, stats, "POST /api/auth/signup", "POST", "/api/auth/signup",
+                                  json_body={"email": user["email"], "password": PASSWORD})
+    if status != 201:
+        raise RuntimeError(f"signup failed with {status}: {body[:200]!r}")
+
+    otp = await asyncio.to_thread(sink.wait_for_otp, user["email"])
+    if otp is None:
+        raise RuntimeError(f"no OTP email reached the sink for {user['email']}")
+
+    status, _, body = await timed(conn, stats, "POST /api/auth/verify-otp", "POST", "/api/auth/verify-otp",
+                                  json_body={"email": user["email"], "otp": otp})
+    if status != 200:
+        raise RuntimeError(f"verify-otp failed with {status}: {body[:200]!r}")
+    user["auth"] = {"Authorization": f"Bearer {json.loads(body)['token']}"}
+
+
+def make_user_loop(sink, mix, images, seed):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    counter = iter(range(1_000_000))
+
+    async def user_loop(conn, stats, deadline):
+        n = next(counter)
+        user = {
+            "email": f"load-{seed}-{n}-{uuid.uuid4().hex[:8]}@example.com",
+            "rng": random.Random(seed * 100003 + n),
+            "images": images,
+        }
+        try:
+            await onboard(conn, stats, sink, user)
+        except RuntimeError as e:
+            print(f"user {n}: {e}")
+            return
+        while time.perf_counter() < deadline:
+            name = user["rng"].choices(names, weights)[0]
+            await SCENARIOS[name](conn, stats, user)
+
+    return user_loop
+
+
+def start_in_process_server(with_predict):
+    """Serve create_app() on a free port from a background thread; returns its URL."""
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    app = create_app()
+    if with_predict:
+        from app.services.inference import init_inference
+
+        init_inference(app, preload=True)
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="load-test-server", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def print_comparison(previous, current):
+    print(f"\n{'endpoint':<32}{'req/s':>10}{'Δ':>9}{'p99 ms':>10}{'Δ':>9}{'errors':>9}{'Δ':>9}")
+    for name, row in current["endpoints"].items():
+        old = previous["endpoints"].get(name)
+        if old is None:
+            print(f"{name:<32}{row['throughput_rps']:>10.1f}{'new':>9}")
+            continue
+
+        def change(new, before):
+            return f"{(new - before) / before:+.0%}" if before else "n/a"
+
+        print(f"{name:<32}{row['throughput_rps']:>10.1f}{change(row['throughput_rps'], old['throughput_rps']):>9}"
+              f"{row['p99_ms']:>10.1f}{change(row['p99_ms'], old['p99_ms']):>9}"
+              f"{row['error_rate']:>8.1%}{row['error_rate'] - old['error_rate']:>+8.1%}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="target server; default: create_app() in this process")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument("--images", help="directory of sample photos (default: synthetic JPEGs)")
+    parser.add_argument("--smtp-port", type=int, default=0, help="SMTP sink port (default: any free port)")
+    parser.add_argument("--mongo-uri", default="mongomock://localhost/mango_disease_db",
+                        help="MONGO_URI for the in-process app (default: in-memory mongomock)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the summary to this file")
+    parser.add_argument("--compare", help="summary JSON from an earlier run to diff against")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    sink = SmtpSink(port=args.smtp_port).start_in_thread()
+    print(f"SMTP sink listening on 127.0.0.1:{sink.port}")
+
+    url = args.url
+    if url is None:
+        os.environ.update({
+            "MONGO_URI": args.mongo_uri,
+            "MAIL_SERVER": "127.0.0.1",
+            "MAIL_PORT": str(sink.port),
+            "MAIL_USE_TLS": "False",
+            "MAIL_DEFAULT_SENDER": "load-test@example.com",
+            "EMAIL_CHECK_DELIVERABILITY": "False",
+        })
+        if mix.get("predict") and importlib.util.find_spec("tensorflow") is None:
+            # /predict needs TensorFlow; run the rest of the mix without it
+            print("TensorFlow is not installed; dropping predict from the mix")
+            mix.pop("predict")
+        url = start_in_process_server(with_predict="predict" in mix)
+        print(f"Serving create_app() in-process at {url} (MONGO_URI={args.mongo_uri})")
+
+    images = sample_images(args.images, seed=args.seed)
+    stats = await run_users(url, args.users, args.duration, make_user_loop(sink, mix, images, args.seed))
+    summary = stats.summary()
+    summary["config"] = {"url": args.url or "in-process", "users": args.users, "duration": args.duration,
+                         "mix": mix, "emails_received": sink.messages}
+    mix_label = ",".join(f"{name}={weight:g}" for name, weight in mix.items())
+    print(format_summary(f"{args.users} users, mix {mix_label}", summary))
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
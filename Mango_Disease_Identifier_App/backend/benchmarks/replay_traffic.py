@@ -0,0 +1,212 @@
+"""Replay captured production traffic and compare latency between builds.
+
+Reads the logs written by app/utils/traffic_capture.py (plain or gzipped
+NDJSON, plus the ``bodies/`` directory). Each request is sent again with
+its original method, path, headers and body, and latencies are grouped by
+route. Requests start at their original offsets, divided by --speed:
+--speed 2 replays twice as fast, and --speed 0 sends back to back with
+--concurrency connections. The schedule depends only on the capture, so
+two builds replayed from the same capture see the same traffic.
+
+Captured requests carry no credentials. Requests that were authenticated
+get --auth as their Authorization header, e.g. a token for a test user in
+a database restored from a snapshot:
+
+    python -m benchmarks.replay_traffic captures/ --url http://127.0.0.1:5000 \\
+        --auth "Bearer $TOKEN" --json before.json
+    python -m benchmarks.replay_traffic captures/ --url http://127.0.0.1:5000 \\
+        --auth "Bearer $TOKEN" --json after.json --compare before.json
+
+Without --url, create_app() is served in this process against mongomock, which
+is enough to check the capture itself but not to compare builds. --captured
+prints the latencies measured when the traffic was recorded.
+
+A request counts as an error when its status differs from the captured one.
+"""
+import argparse
+import asyncio
+import base64
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+
+from benchmarks.http_client import HttpConnection, LoadStats, format_summary
+
+
+def read_capture(paths):
+    """Captured records from files or capture directories, oldest first."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.startswith("capture-"))
+        else:
+            files.append(path)
+
+    records = []
+    for path in files:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    record = json.loads(line)
+                    record["_dir"] = os.path.dirname(path)
+                    records.append(record)
+    records.sort(key=lambda record: record["ts"])
+    return records
+
+
+def request_body(record):
+    if "body" in record:
+        return record["body"].encode("utf-8")
+    if "body_b64" in record:
+        return base64.b64decode(record["body_b64"])
+    if "body_digest" in record:
+        with open(os.path.join(record["_dir"], "bodies", record["body_digest"]), "rb") as f:
+            return f.read()
+    return b""
+
+
+def route_name(record):
+    return f"{record['method']} {record.get('route') or record['path']}"
+
+
+def captured_summary(records):
+    """The latencies seen in production, in the same shape as LoadStats.summary()."""
+    stats = LoadStats()
+    for record in records:
+        stats.record(route_name(record), record["duration_ms"] / 1000, record["status"] < 500)
+    if records:
+        stats.started, stats.finished = records[0]["ts"], max(records[-1]["ts"], records[0]["ts"] + 1e-3)
+    return stats.summary()
+
+
+async def replay(url, records, speed, concurrency, auth):
+    stats = LoadStats()
+    mismatches = defaultdict(lambda: defaultdict(int))
+    pool = asyncio.Queue()
+    for _ in range(concurrency):
+        pool.put_nowait(HttpConnection(url))
+    loop_start = time.perf_counter()
+    first_ts = records[0]["ts"] if records else 0.0
+
+    async def send(record):
+        if speed > 0:
+            delay = (record["ts"] - first_ts) / speed - (time.perf_counter() - loop_start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        headers = dict(record["headers"])
+        if record.get("auth") and auth:
+            headers["authorization"] = auth
+        path = record["path"] + (f"?{record['query']}" if record.get("query") else "")
+        body = None if record.get("body_omitted") else request_body(record)
+
+        conn = await pool.get()
+        name = route_name(record)
+        started = time.perf_counter()
+        try:
+            status, _, _ = await conn.request(record["method"], path, headers=headers, body=body)
+        except Exception:
+            status = 0
+        finally:
+            pool.put_nowait(conn)
+        stats.record(name, time.perf_counter() - started, status == record["status"])
+        if status != record["status"]:
+            mismatches[name][f"{record['status']}->{status}"] += 1
+
+    if speed > 0:
+        await asyncio.gather(*(send(record) for record in records))
+    else:
+        # Back to back: each connection takes the next request in capture order
+        queue = iter(records)
+
+        async def worker():
+            for record in queue:
+                await send(record)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    stats.finished = time.perf_counter()
+    while not pool.empty():
+        await pool.get_nowait().close()
+    return stats, {name: dict(counts) for name, counts in mismatches.items()}
+
+
+def print_latency_diff(previous, current):
+    """Per-route change in the latency distribution, worst p99 regressions first."""
+    def change(new, before):
+        return f"{(new - before) / before:+.0%}" if before else "n/a"
+
+    rows = []
+    for name, row in current["endpoints"].items():
+        old = previous["endpoints"].get(name)
+        if old is not None:
+            growth = (row["p99_ms"] - old["p99_ms"]) / old["p99_ms"] if old["p99_ms"] else 0.0
+            rows.append((growth, name, row, old))
+    print(f"\n{'route':<44}{'p50 ms':>9}{'Δ':>7}{'p95 ms':>9}{'Δ':>7}{'p99 ms':>9}{'Δ':>7}{'errors':>8}")
+    for _, name, row, old in sorted(rows, key=lambda item: item[0], reverse=True):
+        print(f"{name[:43]:<44}"
+              f"{row['p50_ms']:>9.1f}{change(row['p50_ms'], old['p50_ms']):>7}"
+              f"{row['p95_ms']:>9.1f}{change(row['p95_ms'], old['p95_ms']):>7}"
+              f"{row['p99_ms']:>9.1f}{change(row['p99_ms'], old['p99_ms']):>7}"
+              f"{row['error_rate']:>8.1%}")
+    for name in sorted(set(current["endpoints"]) - set(previous["endpoints"])):
+        print(f"{name[:43]:<44}{'new':>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", nargs="+", help="capture directories or log files")
+    parser.add_argument("--url", help="target server; default: create_app() in this process")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor; 0 = as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections to the target")
+    parser.add_argument("--auth", help="Authorization header for requests that were authenticated")
+    parser.add_argument("--route", action="append", help="only replay routes containing this text (repeatable)")
+    parser.add_argument("--limit", type=int, help="replay at most this many requests")
+    parser.add_argument("--captured", action="store_true", help="print the latencies recorded at capture time")
+    parser.add_argument("--json", help="write the summary to this file")
+    parser.add_argument("--compare", help="summary JSON from an earlier replay to diff against")
+    args = parser.parse_args()
+
+    records = read_capture(args.capture)
+    if args.route:
+        records = [record for record in records if any(part in route_name(record) for part in args.route)]
+    records = records[:args.limit] if args.limit else records
+    if not records:
+        raise SystemExit("No captured requests to replay")
+    print(f"{len(records)} captured requests spanning {records[-1]['ts'] - records[0]['ts']:.1f}s")
+
+    if args.captured:
+        print(format_summary("captured", captured_summary(records)))
+
+    url = args.url
+    if url is None:
+        os.environ.setdefault("MONGO_URI", "mongomock://localhost/mango_disease_db")
+        # Do not capture the replay itself
+        os.environ.pop("TRAFFIC_CAPTURE_DIR", None)
+        from benchmarks.load_test import start_in_process_server
+
+        url = start_in_process_server(with_predict=False)
+        print(f"Serving create_app() in-process at {url}")
+
+    stats, mismatches = asyncio.run(replay(url, records, args.speed, args.concurrency, args.auth))
+    summary = stats.summary()
+    summary["config"] = {"url": args.url or "in-process", "speed": args.speed, "concurrency": args.concurrency,
+                         "requests": len(records)}
+    summary["status_mismatches"] = mismatches
+    print(format_summary(f"replay at {args.speed:g}x" if args.speed > 0 else "replay, back to back", summary))
+    for name, counts in mismatches.items():
+        print(f"  status changed on {name}: " + ", ".join(f"{k} x{v}" for k, v in sorted(counts.items())))
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_latency_diff(json.load(f), summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Local SMTP sink for load tests.
+
+Accepts every message over plain SMTP, keeps the last one per recipient,
+and extracts the OTP code from verification emails. A load test can then
+complete signup/verify without a real mail server. It implements only the
+commands flask-mail and aiosmtplib send: no TLS and no AUTH.
+
+    python -m benchmarks.smtp_sink --port 2525     # standalone, prints each message
+"""
+import argparse
+import asyncio
+import re
+import threading
+from email import message_from_bytes
+
+_OTP_RE = re.compile(r'class="otp-code">\s*(\d{4,8})\s*<')
+
+
+class SmtpSink:
+    def __init__(self, host="127.0.0.1", port=0, verbose=False):
+        self.host = host
+        self.port = port
+        self.verbose = verbose
+        # Set to an SMTP reply such as "451 Try again later" to refuse every message
+        self.fail_with = None
+        self.messages = 0
+        self.otps = {}
+        self._otp_events = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    # -- protocol ------------------------------------------------------
+
+    async def _handle(self, reader, writer):
+        async def reply(line):
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        await reply("220 smtp-sink ready")
+        recipients = []
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("latin-1").strip()
+                verb = command[:4].upper()
+                if verb in ("HELO", "EHLO"):
+                    await reply("250 smtp-sink")
+                elif verb == "MAIL":
+                    recipients = []
+                    await reply(self.fail_with or "250 OK")
+                elif verb == "RCPT":
+                    recipients.append(command.partition(":")[2].strip().strip("<>").lower())
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = await reader.readuntil(b"\r\n.\r\n")
+                    self._deliver(recipients, data[:-5].replace(b"\r\n..", b"\r\n."))
+                    await reply("250 OK: queued")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                elif verb in ("RSET", "NOOP"):
+                    await reply("250 OK")
+                else:
+                    await reply("502 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _deliver(self, recipients, raw):
+        message = message_from_bytes(raw)
+        body = ""
+        for part in message.walk():
+            if part.get_content_maintype() == "text":
+                body += part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", "replace")
+        match = _OTP_RE.search(body)
+        with self._lock:
+            self.messages += 1
+            for recipient in recipients:
+                if match:
+                    self.otps[recipient] = match.group(1)
+                    self._event(recipient).set()
+        if self.verbose:
+            print(f"[smtp-sink] {message['Subject']!r} to {', '.join(recipients)}"
+                  + (f" (OTP {match.group(1)})" if match else ""))
+
+    def _event(self, recipient):
+        return self._otp_events.setdefault(recipient, threading.Event())
+
+    # -- API -------------------------------------------------------------
+
+    def wait_for_otp(self, recipient, timeout=10.0):
+        """Block until an OTP for ``recipient`` has arrived; returns it or None."""
+        recipient = recipient.lower()
+        with self._lock:
+            event = self._event(recipient)
+        if not event.wait(timeout):
+            return None
+        with self._lock:
+            event.clear()
+            return self.otps.get(recipient)
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    def start_in_thread(self):
+        """Run the sink on its own event loop thread; returns once it is listening."""
+        started = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, name="smtp-sink", daemon=True).start()
+        started.wait()
+        return self
+
+
+async def _serve(port):
+    sink = await SmtpSink(port=port, verbose=True).start()
+    print(f"SMTP sink listening on 127.0.0.1:{sink.port}")
+    await sink._server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=2525)
+    asyncio.run(_serve(parser.parse_args().port))
@@ -0,0 +1,110 @@
+"""Gunicorn configuration for the Mango Disease Identifier API.
+
+Usage:  gunicorn -c gunicorn.conf.py wsgi:app
+
+The app (TensorFlow, the model weights and the disease catalog) is loaded
+once in the master process and workers are forked from it, so the weights are
+shared copy-on-write instead of being loaded once per worker. The master never
+runs the model; each worker runs its warm-up prediction after the fork.
+
+Set MANGO_PROCESS_MODE=api to run auth/users/reports workers without
+TensorFlow, and MANGO_PROCESS_MODE=inference for a separate /predict pool.
+
+If model/inference_profile.json exists (see scripts/tune_inference.py), its
+worker count is the default and each worker is pinned to its own core set.
+
+Graceful operations:
+  kill -HUP  <master>   restart workers (config is re-read; preloaded code is kept)
+  kill -USR2 <master>   start a new master with new code, then -QUIT the old one
+  kill -TERM <master>   graceful shutdown, waiting up to graceful_timeout
+
+Workers are recycled after max_requests, or when their RSS passes
+WORKER_MAX_RSS_MB, without dropping in-flight requests.
+"""
+import gc
+import multiprocessing
+import os
+from app.services.inference_tuning import cpu_sets, load_profile, pin_to_cpus
+from app.services.memory_monitor import current_rss_bytes
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+# Worker count, thread pools and core pinning tuned by `python -m scripts.tune_inference`;
+# API-only processes never run TensorFlow, so the profile does not apply to them
+profile = load_profile() if os.getenv("MANGO_PROCESS_MODE", "all").lower() != "api" else None
+
+# Each worker runs TensorFlow inference across several cores, so default to
+# one worker per core rather than gunicorn's usual 2 * cores + 1
+workers = int(os.getenv("GUNICORN_WORKERS", (profile or {}).get("workers") or multiprocessing.cpu_count()))
+
+# Give each worker its own core set so TensorFlow thread pools do not contend
+pin_workers = bool(profile and profile.get("pin_workers")) and \
+    os.getenv("INFERENCE_PIN_WORKERS", "True").lower() == "true"
+
+# "sync" for inference-heavy boxes, "gthread" when most time is spent on Mongo/SMTP
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+threads = int(os.getenv("GUNICORN_THREADS", 4 if worker_class == "gthread" else 1))
+
+# Load the model weights in the master before forking; each worker warms it
+# up in post_fork, because TensorFlow's thread pools do not survive fork
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").lower() == "true"
+
+# Recycle workers periodically; jitter keeps them from restarting together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+# Also recycle a worker once its RSS passes this ceiling (0 = off). Like
+# max_requests, the worker stops accepting, finishes in-flight requests and
+# exits, and the master forks a fresh one from the preloaded image.
+max_worker_rss = int(os.getenv("WORKER_MAX_RSS_MB", 0)) * 1024 * 1024
+rss_check_every = int(os.getenv("WORKER_RSS_CHECK_EVERY", 10))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+# Keep-alive only applies to gthread/async workers. Keep it above typical
+# mobile request gaps, but below the load balancer's idle timeout.
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+
+def when_ready(server):
+    # Move everything allocated during preload into the permanent generation so
+    # the garbage collector never writes to (and un-shares) those pages
+    gc.freeze()
+    server.log.info("Preloaded app frozen for copy-on-write sharing; forking %s %s workers",
+                    workers, worker_class)
+
+
+def pre_fork(server, worker):
+    # Runs in the master: hand the new worker the lowest core-set slot not in use,
+    # so a restarted worker takes over the slot of the one it replaces
+    used = {getattr(w, "cpu_slot", None) for w in server.WORKERS.values()}
+    worker.cpu_slot = next(slot for slot in range(len(used) + 1) if slot not in used)
+
+
+def post_fork(server, worker):
+    import wsgi
+
+    wsgi.reconnect_after_fork()
+    server.log.info("Worker %s reconnected to MongoDB", worker.pid)
+    wsgi.start_background_workers()
+
+    if pin_workers:
+        sets = profile.get("cpu_sets") or cpu_sets(workers, profile.get("intra_op_threads", 1))
+        cpus = sets[worker.cpu_slot % len(sets)]
+        if pin_to_cpus(cpus):
+            server.log.info("Worker %s pinned to CPUs %s", worker.pid, cpus)
+
+
+def post_request(worker, req, environ, resp):
+    if not max_worker_rss or worker.nr % rss_check_every:
+        return
+    rss = current_rss_bytes()
+    if rss > max_worker_rss and worker.alive:
+        worker.log.warning("Worker %s RSS %.0f MB is over the %.0f MB ceiling after %s requests; recycling",
+                           worker.pid, rss / 1048576, max_worker_rss / 1048576, worker.nr)
+        # Same path as max_requests: stop accepting, drain, exit; the master replaces it
+        worker.alive = False
@@ -0,0 +1,60 @@
+"""Verify that every hot query is served by an index.
+
+Runs ``explain`` against the configured databases on the queries listed in
+app/utils/indexes.py, and on each filter/sort combination that GET
+/api/disease-reports/search can issue. Exits with status 1 if any winning
+plan contains COLLSCAN, or if a location search reads a text index that does
+not start with user, i.e. one that holds every user's entries. Run
+scripts.ensure_indexes first.
+
+    python -m scripts.check_query_plans
+"""
+import sys
+from bson.objectid import ObjectId
+from app.services.report_query import ReportQueryService
+from app.utils.db import connect_mongoengine
+from app.utils.indexes import get_collection, hot_queries
+from app.utils.query_plans import explain_find, winning_plan_stages, winning_plan_text_indexes
+
+SAMPLE = {
+    'q': 'Addis',
+    'disease': 'Anthracnose',
+    'severity': 'severe',
+    'tree_age': 'matureTree',
+    'from': '2024-01-01',
+    'to': '2024-12-31',
+}
+
+
+def queries():
+    yield from hot_queries()
+    user_id = str(ObjectId())
+    for params in ReportQueryService.query_shapes(SAMPLE):
+        query, sort, _, limit = ReportQueryService.build(user_id, params)
+        yield f"report search {params}", 'disease_reports', query, sort, limit
+
+
+def main():
+    connect_mongoengine()
+
+    failures = 0
+    checked = 0
+    for name, collection, query, sort, limit in queries():
+        explain = explain_find(get_collection(collection), query, sort, limit)
+        stages = winning_plan_stages(explain)
+        checked += 1
+        if 'COLLSCAN' in stages:
+            failures += 1
+            print(f"COLLSCAN  {collection}: {name}  ->  {' <- '.join(stages)}")
+        if '$text' in query:
+            patterns = winning_plan_text_indexes(explain)
+            if not patterns or any(next(iter(pattern)) != 'user' for pattern in patterns):
+                failures += 1
+                print(f"NO USER PREFIX  {collection}: {name}  ->  {patterns}")
+
+    print(f"Checked {checked} queries, {failures} failure(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
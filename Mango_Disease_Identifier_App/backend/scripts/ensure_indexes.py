@@ -0,0 +1,35 @@
+"""Create the indexes declared in app/utils/indexes.py; run at every deploy.
+
+Creating an index that already exists is a no-op, so this is safe to
+repeat. It exits with status 1 when an index could not be built, e.g.
+duplicate emails blocking the unique users index, or when an existing
+index conflicts with its declaration.
+
+    python -m scripts.ensure_indexes
+    python -m scripts.ensure_indexes --dry-run --collection users
+"""
+import argparse
+import sys
+from app.utils.db import connect_mongoengine, use_batch_mode
+from app.utils.indexes import ensure_indexes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", action="append", help="only this collection (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="report missing indexes without building them")
+    args = parser.parse_args()
+
+    use_batch_mode()
+    connect_mongoengine()
+    rows = ensure_indexes(args.collection, dry_run=args.dry_run)
+    for collection, name, status, detail in rows:
+        print(f"{collection:<20}{name:<48}{status:<12}{detail}")
+
+    failed = [row for row in rows if row[2] in ("conflict", "failed")]
+    print(f"{sum(row[2] == 'created' for row in rows)} created, {len(failed)} failed or conflicting")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Dump disease reports to NDJSON, CSV or Parquet.
+
+Streams straight from a MongoDB cursor, so memory stays flat for any number
+of reports. Use this for full dumps; the HTTP export endpoints are subject
+to the gunicorn request timeout.
+
+    python -m scripts.export_reports --format parquet -o reports.parquet
+    python -m scripts.export_reports --format csv --disease Anthracnose --from 2024-01-01 | gzip > a.csv.gz
+    python -m scripts.export_reports --user <user id> -o mine.ndjson
+
+Parquet needs ``pip install pyarrow``.
+"""
+import argparse
+import os
+import sys
+import time
+from app.services.report_export import ReportExportService, ExportUnavailable
+from app.services.report_query import InvalidQuery
+from app.models.disease_report import DiseaseReport
+from app.utils.db import connect_mongoengine, use_batch_mode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", default="ndjson", choices=["ndjson", "csv", "parquet"])
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--user", help="only this user's reports")
+    parser.add_argument("--disease")
+    parser.add_argument("--severity")
+    parser.add_argument("--tree-age")
+    parser.add_argument("--from", dest="from_", metavar="FROM", help="ISO date, inclusive")
+    parser.add_argument("--to", help="ISO date, inclusive")
+    parser.add_argument("--after", help="resume after this report id (full dumps only)")
+    parser.add_argument("--include-deleted", action="store_true")
+    parser.add_argument("--include-duplicates", action="store_true")
+    parser.add_argument("--batch-size", type=int, help="cursor batch size (default EXPORT_BATCH_SIZE or 2000)")
+    args = parser.parse_args()
+
+    if args.batch_size:
+        os.environ["EXPORT_BATCH_SIZE"] = str(args.batch_size)
+    params = {
+        "disease": args.disease, "severity": args.severity, "tree_age": args.tree_age,
+        "from": args.from_, "to": args.to, "after": args.after,
+        "include_deleted": str(args.include_deleted), "include_duplicates": str(args.include_duplicates),
+    }
+    try:
+        ReportExportService.check_format(args.format)
+        query, sort = ReportExportService.build_query({k: v for k, v in params.items() if v}, args.user)
+    except (InvalidQuery, ExportUnavailable) as e:
+        raise SystemExit(str(e))
+
+    use_batch_mode()
+    connect_mongoengine()
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    started = time.perf_counter()
+    written = 0
+    try:
+        for chunk in ReportExportService.export(DiseaseReport._get_collection(), args.format, query, sort):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {written / 1e6:.1f} MB in {elapsed:.1f}s ({written / 1e6 / max(elapsed, 1e-9):.1f} MB/s)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
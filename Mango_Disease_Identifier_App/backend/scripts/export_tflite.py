@@ -0,0 +1,127 @@
+"""Convert a registry version's Keras model into a memory-mappable .tflite artifact.
+
+The artifact has a single signature with two outputs: the class probabilities
+and the penultimate-layer embedding used by similar-case search. The output
+names are recorded in ``mango_classifier.tflite.json``. Before anything is
+written, both models classify the golden set (or random inputs when there is
+none) and the export is refused if they disagree on a class.
+
+    python -m scripts.export_tflite                     # the current version
+    python -m scripts.export_tflite --version v3 --float16
+
+--float16 halves the file, and the memory shared between workers. The
+interpreter dequantizes float16 weights to float32 at load, which makes them
+private again unless XNNPACK is also off, so measure with
+``python -m benchmarks.bench_model_memory`` before using it.
+
+Serve the artifact with MODEL_FORMAT=tflite (or auto).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+BATCH_SHAPE = (320, 320, 3)
+
+
+def convert(model, float16=False):
+    import tensorflow as tf
+    from app.services.model_cache import serving_module
+
+    module, has_embedding = serving_module(model)
+    converter = tf.lite.TFLiteConverter.from_concrete_functions(
+        [module.serve.get_concrete_function()], module)
+    if float16:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    return converter.convert(), has_embedding
+
+
+def verification_inputs(registry, count):
+    """Golden images as model input, else ``count`` random images."""
+    from app.services.image_service import ImageService
+
+    arrays = []
+    for _, path in registry._golden_images():
+        with open(path, "rb") as f:
+            _, img = ImageService.validate_image(f.read())
+        arrays.append(ImageService.to_model_input(img)[0])
+    if arrays:
+        return np.stack(arrays), "golden set"
+    rng = np.random.default_rng(0)
+    return (rng.random((count,) + BATCH_SHAPE, dtype=np.float32) * 255), "random inputs"
+
+
+def compare(reference, candidate, x, batch_size=16):
+    """Agreement of argmax and the largest absolute difference in probabilities."""
+    agree, max_diff = 0, 0.0
+    for start in range(0, len(x), batch_size):
+        batch = x[start:start + batch_size]
+        expected = reference.predict(batch)
+        actual = candidate.predict(batch)
+        agree += int((np.argmax(expected, axis=1) == np.argmax(actual, axis=1)).sum())
+        max_diff = max(max_diff, float(np.abs(expected - actual).max()))
+    return agree / len(x), max_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--version", help="registry version (default: the current pointer)")
+    parser.add_argument("--float16", action="store_true", help="store weights as float16")
+    parser.add_argument("--samples", type=int, default=32, help="random inputs when there is no golden set")
+    parser.add_argument("--min-agreement", type=float, default=1.0,
+                        help="fraction of inputs on which both models must pick the same class")
+    args = parser.parse_args()
+
+    os.environ["MODEL_FORMAT"] = "keras"
+    # Convert from the Keras model itself, not its cached SavedModel
+    os.environ["MODEL_CACHE"] = "False"
+    from app.services.disease_catalog import CATEGORIES
+    from app.services.inference import MODEL_DIR
+    from app.services.model_registry import ModelRegistry
+    from app.services.tflite_model import TFLiteModelVersion
+
+    registry = ModelRegistry(MODEL_DIR, CATEGORIES, poll_interval=0)
+    version = args.version or registry.current_pointer()
+    reference = registry.load_version(version)
+
+    started = time.perf_counter()
+    flatbuffer, has_embedding = convert(reference.model, args.float16)
+    print(f"Converted {version} in {time.perf_counter() - started:.1f}s: "
+          f"{len(flatbuffer) / 1024 / 1024:.1f} MB", file=sys.stderr)
+
+    path = registry.artifact_path(version, "tflite")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(flatbuffer)
+    signature = {
+        "outputs": {"probabilities": "probabilities", **({"embedding": "embedding"} if has_embedding else {})},
+        "input": "image",
+        "source": os.path.basename(reference.path),
+        "float16": args.float16,
+        "exported_at": time.time(),
+    }
+    with open(f"{tmp_path}.json", "w") as f:
+        json.dump(signature, f, indent=2)
+
+    candidate = TFLiteModelVersion(version, tmp_path, reference.categories)
+    x, source = verification_inputs(registry, args.samples)
+    agreement, max_diff = compare(reference, candidate, x)
+    print(f"{source}: {len(x)} images, argmax agreement {agreement:.2%}, "
+          f"max probability difference {max_diff:.2e}")
+    if agreement < args.min_agreement:
+        os.remove(tmp_path)
+        os.remove(f"{tmp_path}.json")
+        raise SystemExit(f"Not exported: agreement below {args.min_agreement:.2%}")
+
+    # The sidecar goes first so a reader of the new model always finds its signature
+    os.replace(f"{tmp_path}.json", f"{path}.json")
+    os.replace(tmp_path, path)
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Build and maintain the similar-case vector index for a model version.
+
+Embeds the photos of reports created since the last run and appends them to
+VECTOR_INDEX_DIR/<version>. With --follow it keeps polling, so reports are
+searchable soon after they sync. Run a single indexer per model version;
+serving processes only read the index.
+
+    python -m scripts.index_embeddings                  # index new reports once
+    python -m scripts.index_embeddings --follow         # keep indexing as reports sync
+    python -m scripts.index_embeddings --train          # train IVF-PQ for fast search
+
+Until --train has run, searches scan every vector. Retrain after the index
+has grown several-fold; vectors added after training are encoded with the
+existing centroids.
+"""
+import argparse
+import time
+from app.services.disease_catalog import CATEGORIES
+from app.services.inference import MODEL_DIR
+from app.services.model_registry import ModelRegistry
+from app.services.similar_cases import SimilarCaseService
+from app.utils.db import connect_mongoengine, use_batch_mode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--version", help="model version (default: registry CURRENT)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--follow", action="store_true", help="keep polling for new reports")
+    parser.add_argument("--interval", type=float, default=10, help="seconds between polls with --follow")
+    parser.add_argument("--train", action="store_true", help="train IVF-PQ on the indexed vectors")
+    parser.add_argument("--nlist", type=int, help="IVF lists (default 4 * sqrt(count))")
+    parser.add_argument("--m", type=int, help="PQ subquantizers; must divide the embedding size")
+    parser.add_argument("--nprobe", type=int, default=16, help="lists searched per query")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(MODEL_DIR, CATEGORIES, poll_interval=0)
+    version = args.version or registry.current_pointer()
+
+    if args.train:
+        index = SimilarCaseService.get_index(version)
+        started = time.perf_counter()
+        index.train(nlist=args.nlist, m=args.m, nprobe=args.nprobe)
+        print(f"Trained {index.stats()} in {time.perf_counter() - started:.1f}s")
+        return
+
+    use_batch_mode()
+    connect_mongoengine()
+    model_version = registry.load_version(version)
+    print(f"Indexing report photos with model {version} into {SimilarCaseService.index_dir(version)}")
+
+    while True:
+        scanned, added = SimilarCaseService.index_new_reports(model_version, args.batch_size)
+        if scanned:
+            print(f"Scanned {scanned} reports, indexed {added} new photos")
+        if scanned == args.batch_size:
+            continue
+        if not args.follow:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
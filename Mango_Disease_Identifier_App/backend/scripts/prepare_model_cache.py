@@ -0,0 +1,88 @@
+"""Build the precompiled cache entries the server loads instead of .keras files.
+
+Run it where the server will run, with the same TensorFlow, e.g. as a step
+of the image build or of a deploy. A server that finds no entry still starts
+from the .keras file and builds the entry in the background, but its first
+start pays the full cost. Each entry is loaded back and checked against the
+Keras model on the golden set (or random inputs when there is none) and
+discarded if they disagree on a class. Other entries beyond the newest
+MODEL_CACHE_KEEP (default 3) are then pruned.
+
+    python -m scripts.prepare_model_cache                 # the current version
+    python -m scripts.prepare_model_cache --all --force
+
+See app/services/model_cache.py for the cache layout.
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--version", action="append", help="registry version (repeatable; default: the current pointer)")
+    parser.add_argument("--all", action="store_true", help="every version in the registry")
+    parser.add_argument("--force", action="store_true", help="rebuild entries that already exist")
+    parser.add_argument("--samples", type=int, default=32, help="random inputs when there is no golden set")
+    parser.add_argument("--min-agreement", type=float, default=1.0,
+                        help="fraction of inputs on which both models must pick the same class")
+    parser.add_argument("--keep", type=int, default=int(os.getenv("MODEL_CACHE_KEEP", 3)),
+                        help="cache entries to keep after pruning (0 keeps all)")
+    args = parser.parse_args()
+
+    os.environ["MODEL_FORMAT"] = "keras"
+    # The reference is always the Keras model, never an existing entry
+    os.environ["MODEL_CACHE"] = "False"
+    from app.services.disease_catalog import CATEGORIES
+    from app.services.inference import MODEL_DIR
+    from app.services.model_cache import ModelCache
+    from app.services.model_registry import ModelRegistry
+    from scripts.export_tflite import compare, verification_inputs
+
+    registry = ModelRegistry(MODEL_DIR, CATEGORIES, poll_interval=0)
+    cache = ModelCache()
+    if args.all:
+        versions = [v for v in registry.available_versions() if os.path.isfile(registry.artifact_path(v))]
+    else:
+        versions = args.version or [registry.current_pointer()]
+    x, source = verification_inputs(registry, args.samples)
+
+    failed, prepared = False, []
+    for version in versions:
+        reference = registry.load_version(version)
+        started = time.perf_counter()
+        entry = cache.build(reference.model, reference.path, force=args.force)
+        if entry is None:
+            print(f"{version}: skipped, another process is building its entry", file=sys.stderr)
+            continue
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        candidate = cache.load(version, reference.path, reference.categories)
+        if candidate is None:
+            print(f"{version}: FAIL, the new entry {entry} could not be loaded")
+            failed = True
+            continue
+        load_seconds = time.perf_counter() - started
+
+        agreement, max_diff = compare(reference, candidate, x)
+        print(f"{version}: {entry} (built in {build_seconds:.1f}s, loads in {load_seconds:.1f}s); "
+              f"{source}: {len(x)} images, argmax agreement {agreement:.2%}, "
+              f"max probability difference {max_diff:.2e}")
+        if agreement < args.min_agreement:
+            shutil.rmtree(entry, ignore_errors=True)
+            print(f"{version}: FAIL, entry removed, agreement below {args.min_agreement:.2%}")
+            failed = True
+            continue
+        prepared.append(entry)
+
+    if args.keep > 0:
+        for path in cache.prune(args.keep, protect=prepared):
+            print(f"Pruned {path}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
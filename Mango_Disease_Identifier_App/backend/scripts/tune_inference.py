@@ -0,0 +1,175 @@
+"""Find the fastest TensorFlow threading setup for the classifier on this host.
+
+Sweeps worker count, intra-op and inter-op threads, oneDNN on/off, batch
+size and CPU pinning. Each candidate runs as real worker processes, since
+thread pools cannot be resized once TensorFlow has started. They classify
+for a few seconds at the same time, and the candidate with the highest
+throughput whose p99 batch latency fits the budget is written to the
+inference profile (model/inference_profile.json, or INFERENCE_PROFILE).
+
+    python -m scripts.tune_inference                        # full sweep
+    python -m scripts.tune_inference --quick --max-p99-ms 300
+    python -m scripts.tune_inference --dry-run              # list the candidates only
+
+The server applies the profile at startup (see app/services/inference_tuning.py).
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, os, sys, time
+config = json.loads(sys.argv[1])
+
+from app.services import inference_tuning
+if config["cpus"]:
+    inference_tuning.pin_to_cpus(config["cpus"])
+inference_tuning.apply_environment(config)
+
+import numpy as np
+from app.services.disease_catalog import CATEGORIES
+from app.services.inference import MODEL_DIR
+from app.services.model_registry import ModelRegistry
+
+registry = ModelRegistry(MODEL_DIR, CATEGORIES, poll_interval=0, thread_profile=config)
+model = registry.load_version(config["version"] or registry.current_pointer())
+
+x = np.random.default_rng(0).random((config["batch_size"], 320, 320, 3), dtype=np.float32) * 255
+model.predict(x)
+
+# Start together so the workers really compete for the cores
+while time.time() < config["start_at"]:
+    time.sleep(0.001)
+
+latencies = []
+deadline = time.perf_counter() + config["duration"]
+while time.perf_counter() < deadline:
+    started = time.perf_counter()
+    model.predict(x)
+    latencies.append(time.perf_counter() - started)
+
+print(json.dumps({"batches": len(latencies), "latencies": latencies}))
+"""
+
+
+def powers_of_two(limit):
+    value = 1
+    while value <= limit:
+        yield value
+        value *= 2
+
+
+def candidates(cpus, quick):
+    n = len(cpus)
+    batch_sizes = [1, 8] if quick else [1, 4, 8, 16]
+    inter_ops = [1] if quick else [1, 2]
+    onednn = [True] if quick else [True, False]
+    for workers in powers_of_two(n):
+        per_worker = max(1, n // workers)
+        intra_ops = sorted({per_worker, max(1, per_worker // 2)})
+        pinning = [False] if workers == 1 else [True, False]
+        for intra, inter, batch, use_onednn, pin in itertools.product(
+            intra_ops, inter_ops, batch_sizes, onednn, pinning
+        ):
+            yield {
+                "workers": workers,
+                "intra_op_threads": intra,
+                "inter_op_threads": inter,
+                "batch_size": batch,
+                "onednn": use_onednn,
+                "pin_workers": pin,
+            }
+
+
+def run_candidate(candidate, version, duration, cpus):
+    from app.services.inference_tuning import cpu_sets
+
+    sets = cpu_sets(candidate["workers"], candidate["intra_op_threads"], cpus)
+    start_at = time.time() + 20  # leaves time for every worker to import TF and load the model
+    procs = []
+    for slot in range(candidate["workers"]):
+        config = dict(candidate, version=version, duration=duration, start_at=start_at,
+                      cpus=sets[slot] if candidate["pin_workers"] else None)
+        procs.append(subprocess.Popen(
+            [sys.executable, "-c", PROBE, json.dumps(config)],
+            cwd=BACKEND_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            env=dict(os.environ, TF_CPP_MIN_LOG_LEVEL="3"),
+        ))
+
+    latencies, batches = [], 0
+    for proc in procs:
+        out, _ = proc.communicate()
+        if proc.returncode != 0:
+            return None
+        result = json.loads(out.decode().strip().splitlines()[-1])
+        batches += result["batches"]
+        latencies.extend(result["latencies"])
+
+    latencies.sort()
+    return {
+        "images_per_s": batches * candidate["batch_size"] / duration,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "cpu_sets": sets if candidate["pin_workers"] else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--version", help="model version (default: registry CURRENT)")
+    parser.add_argument("--duration", type=float, default=5.0, help="measured seconds per candidate")
+    parser.add_argument("--max-p99-ms", type=float, help="latency budget per batch")
+    parser.add_argument("--quick", action="store_true", help="smaller grid")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--output", help="profile path (default: INFERENCE_PROFILE or model/inference_profile.json)")
+    args = parser.parse_args()
+
+    from app.services.inference_tuning import available_cpus, save_profile
+
+    cpus = available_cpus()
+    grid = list(candidates(cpus, args.quick))
+    print(f"{len(grid)} candidates on {len(cpus)} CPUs")
+    if args.dry_run:
+        for candidate in grid:
+            print(candidate)
+        return
+
+    results = []
+    print(f"{'workers':>8}{'intra':>7}{'inter':>7}{'batch':>7}{'onednn':>8}{'pin':>5}{'img/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for candidate in grid:
+        measured = run_candidate(candidate, args.version, args.duration, cpus)
+        if measured is None:
+            print(f"  failed: {candidate}")
+            continue
+        results.append((candidate, measured))
+        print(f"{candidate['workers']:>8}{candidate['intra_op_threads']:>7}{candidate['inter_op_threads']:>7}"
+              f"{candidate['batch_size']:>7}{str(candidate['onednn']):>8}{'y' if candidate['pin_workers'] else 'n':>5}"
+              f"{measured['images_per_s']:>10.1f}{measured['p50_ms']:>10.1f}{measured['p99_ms']:>10.1f}")
+
+    within_budget = [r for r in results if args.max_p99_ms is None or r[1]["p99_ms"] <= args.max_p99_ms]
+    if not within_budget:
+        raise SystemExit("No candidate met the latency budget; nothing written")
+    best, measured = max(within_budget, key=lambda r: r[1]["images_per_s"])
+
+    profile = dict(best, cpu_sets=measured.pop("cpu_sets"), measured=measured, host={
+        "cpus": len(cpus),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "python": platform.python_version(),
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "max_p99_ms": args.max_p99_ms,
+    })
+    save_profile(profile, args.output)
+    print(f"Best: {json.dumps(best)} -> {measured['images_per_s']:.1f} img/s, p99 {measured['p99_ms']:.1f} ms")
+    print(f"Wrote {args.output or 'inference profile'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""WSGI entry point for production servers.
+
+Run with:  gunicorn -c gunicorn.conf.py wsgi:app
+
+MANGO_PROCESS_MODE selects what this process serves:
+  all        auth, users, reports and /predict (default)
+  api        auth, users and reports only; TensorFlow is never imported
+  inference  /predict only
+
+PRELOAD_MODEL (default True) loads the model while the app is built, which
+under gunicorn's preload_app happens once in the master before forking.
+Otherwise the model is loaded on the first prediction. The master only loads
+the weights; running the graph would start TensorFlow thread pools that do
+not survive fork, so each worker warms the model up in post_fork.
+"""
+import os
+from app import create_app
+
+MODE = os.getenv("MANGO_PROCESS_MODE", "all").lower()
+if MODE not in ("all", "api", "inference"):
+    raise ValueError(f"Unknown MANGO_PROCESS_MODE: {MODE}")
+
+app = create_app(with_api=MODE != "inference")
+
+if MODE != "api":
+    from app.services.inference import init_inference
+
+    init_inference(app, preload=os.getenv("PRELOAD_MODEL", "True").lower() == "true", warm_up=False)
+
+
+def reconnect_after_fork():
+    """Open fresh MongoDB connections in a newly forked worker."""
+    from app.utils.db import reset_connections
+
+    reset_connections()
+
+
+def start_background_workers():
+    """Start per-process threads that must not run in the preloading master."""
+    from app.services.memory_monitor import memory_monitor
+
+    memory_monitor.ensure_running()
+    registry = app.extensions.get("model_registry")
+    if registry is not None:
+        # Before the worker accepts requests, so none of them pays for tracing
+        registry.warm_up()
+    scheduler = app.extensions.get("prediction_jobs")
+    if scheduler is not None:
+        scheduler.ensure_running()
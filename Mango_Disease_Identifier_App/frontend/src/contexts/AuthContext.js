@@ -22,6 +22,7 @@ export const AuthProvider = ({ children }) => {
           await AsyncStorage.multiRemove([
             "userData",
             "auth_token",
+            "refresh_token",
             "justVerified",
           ]);
           setIsLoading(false);
@@ -55,6 +56,7 @@ export const AuthProvider = ({ children }) => {
             setCurrentUser(null);
             await AsyncStorage.removeItem("userData");
             await AsyncStorage.removeItem("auth_token");
+            await AsyncStorage.removeItem("refresh_token");
             console.error("Failed to refresh user data:", error);
           }
         } else {
@@ -62,6 +64,7 @@ export const AuthProvider = ({ children }) => {
           setCurrentUser(null);
           await AsyncStorage.removeItem("userData");
           await AsyncStorage.removeItem("auth_token");
+          await AsyncStorage.removeItem("refresh_token");
         }
       } catch (error) {
         console.error("Failed to load user data:", error);
@@ -69,6 +72,7 @@ export const AuthProvider = ({ children }) => {
         setCurrentUser(null);
         await AsyncStorage.removeItem("userData");
         await AsyncStorage.removeItem("auth_token");
+        await AsyncStorage.removeItem("refresh_token");
       } finally {
         setIsLoading(false);
       }
@@ -114,12 +118,30 @@ export const AuthProvider = ({ children }) => {
       if (response.success) {
         console.log("AuthContext: OTP verification successful");
 
-        if (!isPasswordReset) {
-          // For account verification, clear auth data
+        if (!isPasswordReset && response.token) {
+          // Verification signed the user in; AuthService stored the session
+          await AsyncStorage.multiRemove([
+            "pendingOtpEmail",
+            "pendingOtpTimestamp",
+            "justVerified",
+            "fromLogout",
+          ]);
+          setCurrentUser({
+            id: response.user.id,
+            email: response.user.email,
+            name: response.user.name,
+            isAuthenticated: true,
+          });
+          setTimeout(() => {
+            NavigationService.resetToMain();
+          }, 100);
+        } else if (!isPasswordReset) {
+          // No session came back, so the user signs in next
           setCurrentUser(null);
           await AsyncStorage.multiRemove([
             "userData",
             "auth_token",
+            "refresh_token",
             "pendingOtpEmail",
             "pendingOtpTimestamp",
           ]);
@@ -141,6 +163,7 @@ export const AuthProvider = ({ children }) => {
         success: response.success,
         message: response.message,
         user: response.user,
+        signedIn: Boolean(response.success && response.token),
       };
     } catch (error) {
       console.error("AuthContext: OTP verification failed:", error);
@@ -211,9 +234,13 @@ export const AuthProvider = ({ children }) => {
       await AsyncStorage.setItem("fromLogout", "true");
       console.log("AuthContext: Set fromLogout flag");
       
+      // Revoke the refresh token on the server before dropping it
+      await AuthService.revokeSession();
+      
       // Second - clean up all auth and OTP related data in storage
       await AsyncStorage.multiRemove([
         "auth_token",
+        "refresh_token",
         "userData",
         "pendingOtpEmail",
         "pendingOtpTimestamp",
@@ -245,13 +245,17 @@ const OTPScreen = ({ route, navigation }) => {
         const result = await verifyOTP(email, otp);
         console.log("OTP verification result:", result);
 
-        if (result.success) {
+        if (result.signedIn) {
+          // AuthContext kept the session and navigates to the main screen
+          Alert.alert("Success", "Account verified successfully!");
+        } else if (result.success) {
           try {
             // First clear all auth and verification data
             await AsyncStorage.multiRemove([
               "pendingOtpEmail",
               "pendingOtpTimestamp",
               "auth_token",
+              "refresh_token",
               "userData",
             ]);
             
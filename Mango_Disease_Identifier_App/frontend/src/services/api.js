@@ -61,6 +61,77 @@ api.interceptors.request.use(
   }
 );
 
+// Access tokens are short-lived; a refresh token (rotated on every use)
+// renews them without asking the user to sign in again
+const AUTH_KEYS = ["auth_token", "refresh_token", "userData"];
+
+export const storeSession = async (data) => {
+  await AsyncStorage.setItem("auth_token", data.token);
+  if (data.refresh_token) {
+    await AsyncStorage.setItem("refresh_token", data.refresh_token);
+  }
+};
+
+// Concurrent 401s share one refresh: the server revokes a refresh token on
+// first use, so sending it twice would sign the user out
+let refreshPromise = null;
+
+const refreshSession = () => {
+  if (!refreshPromise) {
+    refreshPromise = (async () => {
+      const refreshToken = await AsyncStorage.getItem("refresh_token");
+      if (!refreshToken) {
+        throw new Error("No refresh token");
+      }
+      // Plain axios so this request does not pass through the interceptors
+      const response = await axios.post(
+        `${BASE_URL}/auth/refresh`,
+        { refresh_token: refreshToken },
+        { timeout: 30000 }
+      );
+      await storeSession(response.data);
+      return response.data.token;
+    })().finally(() => {
+      refreshPromise = null;
+    });
+  }
+  return refreshPromise;
+};
+
+// A new access token, or null after clearing the session when the refresh
+// token was rejected and the user has to sign in again
+const renewAccessToken = async () => {
+  try {
+    return await refreshSession();
+  } catch (refreshError) {
+    console.error("API: Session refresh failed:", refreshError.message);
+    if (!refreshError.response || refreshError.response.status === 401) {
+      await AsyncStorage.multiRemove(AUTH_KEYS);
+    }
+    return null;
+  }
+};
+
+// fetch() with the stored access token, refreshed once on a 401
+const authorizedFetch = async (url, options = {}) => {
+  const token = await AsyncStorage.getItem("auth_token");
+  if (!token) {
+    throw new Error('No authentication token found');
+  }
+  const send = (accessToken) =>
+    fetch(url, {
+      ...options,
+      headers: { ...options.headers, Authorization: `Bearer ${accessToken}` },
+    });
+
+  const response = await send(token);
+  if (response.status !== 401) {
+    return response;
+  }
+  const newToken = await renewAccessToken();
+  return newToken ? send(newToken) : response;
+};
+
 // Handle token expiration
 api.interceptors.response.use(
   (response) => {
@@ -78,11 +149,16 @@ api.interceptors.response.use(
     if (
       error.response &&
       error.response.status === 401 &&
-      !originalRequest._retry
+      !originalRequest._retry &&
+      originalRequest.headers?.Authorization
     ) {
+      // Renew the access token and retry once instead of signing in again
       originalRequest._retry = true;
-      await AsyncStorage.removeItem("auth_token");
-      await AsyncStorage.removeItem("userData");
+      const token = await renewAccessToken();
+      if (token) {
+        originalRequest.headers.Authorization = `Bearer ${token}`;
+        return api(originalRequest);
+      }
       // Redirect to login (You might need to use a navigation ref here)
       return Promise.reject(error);
     }
@@ -114,9 +190,21 @@ export const AuthService = {
       const response = await api.post("/auth/verify-otp", { email, otp });
       console.log("API: OTP verification response:", response.data);
 
-      // Ensure we don't store any auth data here
-      // Remove any existing auth data
-      await AsyncStorage.multiRemove(["auth_token", "userData"]);
+      // Drop any previous session, then keep the new one the way login does;
+      // otherwise the refresh token issued for it would be lost
+      await AsyncStorage.multiRemove(AUTH_KEYS);
+      if (response.data.success && response.data.token) {
+        await storeSession(response.data);
+        await AsyncStorage.setItem(
+          "userData",
+          JSON.stringify({
+            id: response.data.user.id,
+            email: response.data.user.email,
+            name: response.data.user.name,
+            isAuthenticated: true,
+          })
+        );
+      }
 
       return response.data;
     } catch (error) {
@@ -131,9 +219,9 @@ export const AuthService = {
       const response = await api.post("/auth/login", { email, password });
       console.log("API: Login response:", response.data);
 
-      // Only store auth token if login is successful and account is verified
+      // Only store auth tokens if login is successful and account is verified
       if (response.data.success && response.data.token) {
-        await AsyncStorage.setItem("auth_token", response.data.token);
+        await storeSession(response.data);
         await AsyncStorage.setItem(
           "userData",
           JSON.stringify({
@@ -197,10 +285,10 @@ export const AuthService = {
   logout: async () => {
     try {
       console.log("API: Logging out user");
+      await AuthService.revokeSession();
       // Clear all authentication and session data
       await AsyncStorage.multiRemove([
-        "auth_token", 
-        "userData", 
+        ...AUTH_KEYS,
         "pendingOtpEmail",
         "pendingOtpTimestamp",
         "pendingPasswordReset",
@@ -218,6 +306,19 @@ export const AuthService = {
     }
   },
 
+  // Revoke the stored refresh token on the server; best effort, since
+  // signing out locally must work offline too
+  revokeSession: async () => {
+    try {
+      const refreshToken = await AsyncStorage.getItem("refresh_token");
+      if (refreshToken) {
+        await axios.post(`${BASE_URL}/auth/logout`, { refresh_token: refreshToken }, { timeout: 5000 });
+      }
+    } catch (error) {
+      console.error("API: Could not revoke session:", error.message);
+    }
+  },
+
   getCurrentUser: async () => {
     try {
       const response = await api.get("/auth/me");
@@ -279,6 +380,10 @@ export const UserService = {
         current_password: currentPassword,
         new_password: newPassword,
       });
+      // Other devices are signed out; this one gets a new session
+      if (response.data.success && response.data.token) {
+        await storeSession(response.data);
+      }
       return response.data;
     } catch (error) {
       throw error.response ? error.response.data : { message: "Network error" };
@@ -368,16 +473,10 @@ export const DiseaseReportService = {
     try {
       console.log('Submitting report to server:', report);
       
-      const token = await AsyncStorage.getItem("auth_token");
-      if (!token) {
-        throw new Error('No authentication token found');
-      }
-
-      const response = await fetch(`${BASE_URL}/disease-reports`, {
+      const response = await authorizedFetch(`${BASE_URL}/disease-reports`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
-          'Authorization': `Bearer ${token}`,
         },
         body: JSON.stringify(report),
       });
@@ -400,16 +499,7 @@ export const DiseaseReportService = {
   // Get all reports
   getReports: async () => {
     try {
-      const token = await AsyncStorage.getItem("auth_token");
-      if (!token) {
-        throw new Error('No authentication token found');
-      }
-
-      const response = await fetch(`${BASE_URL}/disease-reports`, {
-        headers: {
-          'Authorization': `Bearer ${token}`,
-        },
-      });
+      const response = await authorizedFetch(`${BASE_URL}/disease-reports`);
 
       if (!response.ok) {
         const errorData = await response.text();
@@ -427,16 +517,27 @@ export const DiseaseReportService = {
   // Get a single report by ID
   getReportById: async (reportId) => {
     try {
-      const token = await AsyncStorage.getItem("auth_token");
-      if (!token) {
-        throw new Error('No authentication token found');
+      const response = await authorizedFetch(`${BASE_URL}/disease-reports/${reportId}`);
+
+      if (!response.ok) {
+        const errorData = await response.text();
+        console.error('Server response:', response.status, errorData);
+        throw new Error(`Server responded with ${response.status}: ${errorData}`);
       }
 
-      const response = await fetch(`${BASE_URL}/disease-reports/${reportId}`, {
-        headers: {
-          'Authorization': `Bearer ${token}`,
-        },
-      });
+      return await response.json();
+    } catch (error) {
+      console.error('Error fetching report:', error);
+      throw error;
+    }
+  },
+
+  // Fetch only the reports changed since the last sync token.
+  // Pass null for a first sync; store the returned syncToken for next time.
+  getReportChanges: async (syncToken = null) => {
+    try {
+      const query = syncToken ? `?since=${encodeURIComponent(syncToken)}` : '';
+      const response = await authorizedFetch(`${BASE_URL}/disease-reports/changes${query}`);
 
       if (!response.ok) {
         const errorData = await response.text();
@@ -444,9 +545,10 @@ export const DiseaseReportService = {
         throw new Error(`Server responded with ${response.status}: ${errorData}`);
       }
 
+      // { reports, deleted, syncToken, hasMore }
       return await response.json();
     } catch (error) {
-      console.error('Error fetching report:', error);
+      console.error('Error fetching report changes:', error);
       throw error;
     }
   },
@@ -454,18 +556,12 @@ export const DiseaseReportService = {
   // Sync local reports with server
   syncReports: async (localReports) => {
     try {
-      const token = await AsyncStorage.getItem("auth_token");
-      if (!token) {
-        throw new Error('No authentication token found');
-      }
-
       console.log('Syncing reports with server:', localReports);
 
-      const response = await fetch(`${BASE_URL}/disease-reports/sync`, {
+      const response = await authorizedFetch(`${BASE_URL}/disease-reports/sync`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
-          'Authorization': `Bearer ${token}`,
         },
         body: JSON.stringify(localReports),
       });